@@ -1,46 +1,267 @@
-from .data import Instance, SpatialDataset, load_csv, save_csv
-from .neighborhood import materialize_neighborhoods, NeighborhoodList
-from .ids import mine_cliques_ids
-from .nds import mine_cliques_nds
-from .chash import CHash
-from .prevalence import mine_prevalent_patterns
-from .generator import GeneratorParams, generate_synthetic
+from contextlib import nullcontext
+from functools import partial
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from .data import (
+    ColumnarDataset, Dataset, Instance, SpatialDataset,
+    csv_to_npy, iter_csv_chunks, load_csv, load_npy, save_csv, save_npy,
+)
+from .neighborhood import (
+    CellCosts, PairPruning, PairSet, materialize_neighborhoods, materialize_pairs, NeighborhoodList,
+    cell_costs, prune_feature_pairs,
+)
+from .ids import iter_cliques_ids, mine_cliques_ids
+from .nds import iter_cliques_nds, mine_cliques_nds
+from .chash import CHash, CompactCHash
+from .prevalence import (
+    LevelStats, MaximalPatterns, PICache, PILattice,
+    mine_maximal_patterns, mine_prevalent_patterns, mine_top_k_patterns, sweep_min_prev,
+)
+from .stats import PipelineStats, StageStats
+from .generator import GeneratorParams, generate_synthetic, write_synthetic
+from .tiling import Tile, clique_miner, iter_tiles, mine_tiled
+from .cache import PipelineCache, dataset_fingerprint
+from .incremental import IncrementalPipeline
 
 __all__ = [
     "Instance",
     "SpatialDataset",
+    "ColumnarDataset",
     "load_csv",
     "save_csv",
+    "iter_csv_chunks",
+    "load_npy",
+    "save_npy",
+    "csv_to_npy",
     "materialize_neighborhoods",
     "NeighborhoodList",
+    "cell_costs",
+    "CellCosts",
+    "materialize_pairs",
+    "PairSet",
+    "prune_feature_pairs",
+    "PairPruning",
     "mine_cliques_ids",
     "mine_cliques_nds",
+    "iter_cliques_ids",
+    "iter_cliques_nds",
     "CHash",
+    "CompactCHash",
     "mine_prevalent_patterns",
+    "mine_maximal_patterns",
+    "MaximalPatterns",
+    "mine_top_k_patterns",
+    "sweep_min_prev",
+    "PILattice",
     "GeneratorParams",
     "generate_synthetic",
+    "write_synthetic",
+    "Tile",
+    "iter_tiles",
+    "mine_tiled",
+    "PipelineCache",
+    "dataset_fingerprint",
+    "sweep_min_dist",
+    "IncrementalPipeline",
+    "PipelineStats",
+    "StageStats",
 ]
 
 
 def run_pipeline(
-    dataset: SpatialDataset,
+    dataset: Dataset,
     min_dist: float,
     min_prev: float,
-    schema: str = "nds",  # "ids" or "nds"
+    schema: str = "nds",  # "ids", "nds" or "nds-pivot"
+    workers: int = 1,     # >1: NDS, lọc prevalence (và neighborhood grid khi không có scipy) chạy song song
+    stream: bool = False,
+    compact: bool = False,
+    tile_size: Optional[float] = None,
+    cache: Optional[PipelineCache] = None,
+    stats: Optional[PipelineStats] = None,
+    prune_pairs: bool = False,
+    maximal: bool = False,
+    top_k: Optional[int] = None,
+    min_size: int = 2,
 ):
     """
     Hàm tiện dụng: chạy toàn bộ Fig.2(c) với IDS hoặc NDS.
+
+    Với ColumnarDataset, clique là tuple instance id và C-Hash lưu id;
+    dùng dataset.instance(i) khi cần Instance.
+
+    stream=True: clique đi thẳng từ miner vào C-Hash, không giữ danh sách
+    clique (peak memory theo kích thước C-Hash); khi đó cliques trả về là None.
+
+    compact=True: dùng CompactCHash (key bitmask, mảng id) – chỉ cho ColumnarDataset.
+
+    tile_size: chạy theo tile (xem tiling.mine_tiled) – NeighborhoodList và
+    clique chỉ giữ cho một tile kèm halo min_dist; C-Hash partial của từng
+    tile được merge trước khi lọc prevalence. Cùng C-Hash/pattern như chạy
+    một lần, danh sách clique xếp theo tile. Giới hạn: chỉ khi stream=True
+    thì clique mới không bị giữ lại – với stream=False mọi clique vẫn được
+    gom vào danh sách trả về; SpatialDataset được chép sang dạng cột một
+    lần, nên toạ độ của toàn bộ dataset vẫn nằm trong RAM (ColumnarDataset,
+    vd. load_npy với mmap, thì không bị chép).
+
+    cache: PipelineCache – nếu đã có C-Hash cho (dataset, min_dist, schema,
+    compact) thì chỉ chạy lại bước lọc prevalence; khi đó cliques trả về là
+    None (clique không được lưu trong cache). C-Hash miss nhưng đã có
+    NeighborhoodList cho (dataset, min_dist) thì bỏ qua bước neighborhood.
+
+    stats: PipelineStats – nếu có, ghi thời gian/peak bộ nhớ theo stage và
+    các counter/histogram (xem stats.PipelineStats); mặc định không đo gì.
+
+    prune_pairs=True: trước khi khai phá clique, bỏ cạnh giữa các cặp feature
+    có PI < min_prev (xem neighborhood.prune_feature_pairs). Pattern giữ
+    nguyên, clique là clique của đồ thị đã cắt. C-Hash khi đó phụ thuộc
+    min_prev nên không dùng cùng cache; cũng không dùng cùng tile_size (PI
+    của cặp cần NeighborhoodList toàn cục).
+
+    maximal=True: patterns là MaximalPatterns (xem mine_maximal_patterns) –
+    chỉ tính PI cho các pattern prevalent tối đại, PI của subset tính khi hỏi.
+
+    top_k: chỉ trả về top_k pattern có PI cao nhất với size >= min_size (xem
+    mine_top_k_patterns); min_prev khi đó chỉ là ngưỡng sàn (0 = không có).
     """
-    nbs = materialize_neighborhoods(dataset, min_dist)
+    columnar = isinstance(dataset, ColumnarDataset)
+    if compact and not columnar:
+        raise ValueError("compact=True cần ColumnarDataset")
+    if prune_pairs and (cache is not None or tile_size is not None):
+        raise ValueError("prune_pairs không dùng cùng cache hoặc tile_size")
+    if maximal and top_k is not None:
+        raise ValueError("maximal và top_k không dùng cùng nhau")
+
+    def new_chash():
+        if compact:
+            return CompactCHash(dataset)
+        return CHash(dataset=dataset if columnar else None)
+
+    def stage(name: str):
+        return nullcontext() if stats is None else stats.stage(name)
 
-    if schema.lower() == "ids":
-        cliques = mine_cliques_ids(dataset, nbs)
-    else:
-        cliques = mine_cliques_nds(dataset, nbs)
+    try:
+        fingerprint = None
+        chash = None
+        cached_nbs = None
+        if cache is not None:
+            with stage("cache_load"):
+                fingerprint = dataset_fingerprint(dataset)
+                hit = cache.load(dataset, min_dist, schema, compact, fingerprint=fingerprint)
+                if hit is None and tile_size is None:
+                    # C-Hash miss: NeighborhoodList có thể đã có từ schema / C-Hash khác
+                    cached_nbs = cache.load_neighborhoods(dataset, min_dist, fingerprint=fingerprint)
+            if hit is not None:
+                chash, cliques = hit.chash, None
+
+        if chash is None:
+            miner = clique_miner(schema, workers, stats)
+
+            nbs = None
+            if tile_size is not None:
+                with stage("tiles"):
+                    cliques, chash = mine_tiled(dataset, min_dist, tile_size, miner, new_chash,
+                                                keep_cliques=not stream, stats=stats)
+            else:
+                if cached_nbs is not None:
+                    nbs = cached_nbs
+                else:
+                    with stage("neighborhoods"):
+                        nbs = materialize_neighborhoods(dataset, min_dist, workers=workers)
+                if stats is not None:
+                    stats.add("neighbor_pairs", nbs.num_pairs)
+                if prune_pairs:
+                    with stage("prune_pairs"):
+                        nbs, pruning = prune_feature_pairs(nbs, min_prev)
+                    if stats is not None:
+                        stats.add("pruned_feature_pairs", len(pruning.pruned))
+                        stats.add("pruned_edges", pruning.edges_before - pruning.edges_after)
+                        stats.add("search_pairs_before", pruning.search_before)
+                        stats.add("search_pairs_after", pruning.search_after)
+                if stats is not None:
+                    stats.observe_counts("bns_size", np.bincount(nbs.indptr[1:] - nbs.split))
+
+                cliques = miner(dataset, nbs)
+                if stats is not None:
+                    cliques = stats.observe_cliques(cliques)
+                chash = new_chash()
+                if stream:
+                    # mining và chèn C-Hash đan xen, đo chung một stage
+                    with stage("cliques+chash"):
+                        chash.add_cliques(cliques)
+                else:
+                    with stage("cliques"):
+                        cliques = list(cliques)
+                    with stage("chash"):
+                        chash.add_cliques(cliques)
+
+            if cache is not None:
+                with stage("cache_store"):
+                    cache.store(dataset, min_dist, schema, chash, nbs, fingerprint=fingerprint)
+
+        if top_k is not None:
+            def mine(dataset, chash, min_prev, pi_cache=None, level_stats=None):
+                return mine_top_k_patterns(dataset, chash, top_k, min_size, min_prev, pi_cache=pi_cache)
+        else:
+            mine = partial(mine_maximal_patterns if maximal else mine_prevalent_patterns, workers=workers)
+        if stats is None:
+            patterns = mine(dataset, chash, min_prev)
+        else:
+            stats.add("chash_keys", len(chash.candidates))
+            pi_cache = PICache(chash, dataset.feature_counts())
+            levels: Dict[int, LevelStats] = {}
+            with stage("prevalence"):
+                patterns = mine(dataset, chash, min_prev, pi_cache=pi_cache, level_stats=levels)
+            stats.add("pi_calls", pi_cache.calls)
+            stats.add("pi_cache_hits", pi_cache.hits)
+            stats.add("pi_cache_misses", pi_cache.misses)
+            if maximal:
+                stats.add("maximal_patterns", len(patterns.maximal))
+            else:
+                stats.add("patterns", len(patterns))
+            for size, ls in levels.items():
+                stats.observe("prevalent_by_size", size, ls.prevalent)
+                stats.observe("pruned_by_size", size, ls.pruned)
+    finally:
+        if stats is not None:
+            # dừng tracemalloc cả khi một stage lỗi
+            stats.finish()
+    return (None if stream else cliques), chash, patterns
+
+
+def sweep_min_dist(
+    dataset: Dataset,
+    distances: Iterable[float],
+    min_prev: float,
+    schema: str = "nds",
+    workers: int = 1,
+    compact: bool = False,
+):
+    """
+    Chạy pipeline cho nhiều min_dist: tìm cặp láng giềng một lần ở khoảng
+    cách lớn nhất (materialize_pairs), NeighborhoodList của từng min_dist
+    chỉ là lọc mảng cặp theo khoảng cách; clique mining và lọc prevalence
+    chạy riêng cho từng khoảng cách.
+
+    Trả về dict min_dist -> (chash, patterns), cùng kết quả với
+    run_pipeline(dataset, min_dist, min_prev, ...) cho từng khoảng cách.
+    """
+    distances = sorted(distances)
+    if not distances:
+        raise ValueError("distances rỗng")
+    columnar = isinstance(dataset, ColumnarDataset)
+    if compact and not columnar:
+        raise ValueError("compact=True cần ColumnarDataset")
 
-    chash = CHash()
-    for cl in cliques:
-        chash.add_clique(cl)
+    pairs = materialize_pairs(dataset, distances[-1])
+    miner = clique_miner(schema, workers)
 
-    patterns = mine_prevalent_patterns(dataset, chash, min_prev)
-    return cliques, chash, patterns
+    results = {}
+    for d in distances:
+        nbs = pairs.neighborhoods(d)
+        chash = CompactCHash(dataset) if compact else CHash(dataset=dataset if columnar else None)
+        chash.add_cliques(miner(dataset, nbs))
+        results[d] = (chash, mine_prevalent_patterns(dataset, chash, min_prev))
+    return results
@@ -0,0 +1,261 @@
+"""
+Benchmark harness: quét GeneratorParams, chạy IDS và NDS với seed cố định,
+ghi thời gian/bộ nhớ theo stage ra JSON/CSV và so với baseline.
+
+    python -m cliquecoloc.bench --out bench.json --csv bench.csv --trace-memory
+    python -m cliquecoloc.bench --out new.json --baseline bench.json --time-threshold 0.2
+"""
+from __future__ import annotations
+from dataclasses import asdict, dataclass, replace
+from itertools import product
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import argparse
+import csv
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from ._init_ import run_pipeline
+from .generator import GeneratorParams, generate_synthetic
+from .stats import PipelineStats
+
+# case gốc; mỗi trục quét thay một tham số quanh case này
+BASE_PARAMS = GeneratorParams(P=10, I=20, D=2000, F=10, Q=4, m=3000, min_dist=40, clumpy=1)
+
+DEFAULT_AXES: Dict[str, List] = {
+    "m": [2000, 6000],
+    "F": [8, 16],
+    "Q": [3, 5],
+    "I": [10, 40],
+    "min_dist": [30, 60],
+    "clumpy": [1, 3],
+}
+
+DEFAULT_SCHEMAS = ("ids", "nds")
+
+
+def param_grid(
+    base: GeneratorParams = BASE_PARAMS,
+    axes: Optional[Dict[str, Sequence]] = None,
+    full: bool = False,
+) -> List[GeneratorParams]:
+    """
+    full=False: case gốc + đổi từng trục một (số case tăng tuyến tính).
+    full=True: tích Descartes của mọi trục.
+    """
+    axes = DEFAULT_AXES if axes is None else axes
+    if full:
+        names = list(axes)
+        return [replace(base, **dict(zip(names, vals))) for vals in product(*axes.values())]
+
+    cases = [base]
+    for name, values in axes.items():
+        for v in values:
+            p = replace(base, **{name: v})
+            if p not in cases:
+                cases.append(p)
+    return cases
+
+
+def case_id(params: GeneratorParams, seed: int) -> str:
+    return ",".join(f"{k}={v}" for k, v in asdict(params).items()) + f",seed={seed}"
+
+
+def run_case(
+    params: GeneratorParams,
+    seed: int,
+    schema: str,
+    min_prev: float = 0.2,
+    columnar: bool = True,
+    trace_memory: bool = False,
+) -> dict:
+    """
+    Một lần chạy run_pipeline với PipelineStats; trả về một dòng kết quả.
+
+    Clique và C-Hash được đo thành hai stage riêng (stream=False) để so
+    thời gian khai phá clique của IDS và NDS. Thời gian đo khi không bật
+    tracemalloc; trace_memory=True chạy thêm một lượt có tracemalloc chỉ
+    để lấy peak bộ nhớ (*_peak_bytes, peak_bytes).
+    """
+    dataset = generate_synthetic(params, seed=seed, columnar=columnar)
+    stats = PipelineStats()
+    t0 = time.perf_counter()
+    run_pipeline(dataset, params.min_dist, min_prev, schema=schema, stats=stats)
+    total = time.perf_counter() - t0
+
+    row = {"case": case_id(params, seed), "schema": schema, "seed": seed, "min_prev": min_prev}
+    row.update(asdict(params))
+    row["n"] = len(dataset)
+    row["total_s"] = total
+    for name, st in stats.stages.items():
+        row[f"{name}_s"] = st.wall
+
+    row["peak_bytes"] = None
+    if trace_memory:
+        traced = PipelineStats(trace_memory=True)
+        run_pipeline(dataset, params.min_dist, min_prev, schema=schema, stats=traced)
+        peaks = []
+        for name, st in traced.stages.items():
+            row[f"{name}_peak_bytes"] = st.peak_traced
+            peaks.append(st.peak_traced)
+        row["peak_bytes"] = max(peaks) if peaks else None
+    row["rss_high_water_bytes"] = stats.rss_high_water
+    for k in ("neighbor_pairs", "cliques", "chash_keys", "pi_calls", "patterns"):
+        row[k] = stats.counters.get(k, 0)
+    return row
+
+
+def run_benchmarks(
+    cases: Iterable[GeneratorParams],
+    seeds: Sequence[int] = (0,),
+    schemas: Sequence[str] = DEFAULT_SCHEMAS,
+    min_prev: float = 0.2,
+    columnar: bool = True,
+    trace_memory: bool = False,
+    log=None,
+) -> List[dict]:
+    rows = []
+    for params in cases:
+        for seed in seeds:
+            for schema in schemas:
+                row = run_case(params, seed, schema, min_prev, columnar, trace_memory)
+                rows.append(row)
+                if log is not None:
+                    log(f"{row['case']} {schema}: {row['total_s']:.3f}s "
+                        f"cliques={row['cliques']} patterns={row['patterns']}")
+    return rows
+
+
+# -------------------- ghi / đọc kết quả --------------------
+
+
+def _meta() -> dict:
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def write_json(rows: List[dict], path) -> None:
+    Path(path).write_text(json.dumps({"meta": _meta(), "results": rows}, indent=2))
+
+
+def read_json(path) -> List[dict]:
+    return json.loads(Path(path).read_text())["results"]
+
+
+def write_csv(rows: List[dict], path) -> None:
+    cols: List[str] = []
+    for row in rows:
+        cols.extend(k for k in row if k not in cols)
+    with Path(path).open("w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=cols)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# -------------------- so với baseline --------------------
+
+
+@dataclass
+class Regression:
+    case: str
+    schema: str
+    metric: str
+    baseline: float
+    current: float
+
+    def __str__(self) -> str:
+        if self.metric in ("cliques", "patterns"):
+            return f"{self.case} {self.schema}: {self.metric} {self.baseline} -> {self.current} (kết quả khác)"
+        ratio = self.current / self.baseline if self.baseline else float("inf")
+        return f"{self.case} {self.schema}: {self.metric} {self.baseline:.4g} -> {self.current:.4g} (x{ratio:.2f})"
+
+
+def compare(
+    baseline: List[dict],
+    current: List[dict],
+    time_threshold: float = 0.2,
+    mem_threshold: float = 0.2,
+    min_seconds: float = 0.05,
+) -> List[Regression]:
+    """
+    So từng (case, schema) có trong cả hai bên.
+
+    - thời gian (total_s và *_s từng stage) chậm hơn (1 + time_threshold)
+      lần và chậm thêm ít nhất min_seconds (bỏ qua nhiễu của stage rất ngắn);
+    - peak_bytes lớn hơn (1 + mem_threshold) lần;
+    - số cliques / patterns khác nhau (kết quả sai) luôn bị báo.
+    """
+    base = {(r["case"], r["schema"]): r for r in baseline}
+    out: List[Regression] = []
+    for row in current:
+        ref = base.get((row["case"], row["schema"]))
+        if ref is None:
+            continue
+        for k in ("cliques", "patterns"):
+            if row.get(k) != ref.get(k):
+                out.append(Regression(row["case"], row["schema"], k, ref.get(k), row.get(k)))
+        for k, v in row.items():
+            b = ref.get(k)
+            if b is None or v is None:
+                continue
+            if k.endswith("_s"):
+                if v > b * (1 + time_threshold) and v - b >= min_seconds:
+                    out.append(Regression(row["case"], row["schema"], k, b, v))
+            elif k == "peak_bytes":
+                if v > b * (1 + mem_threshold):
+                    out.append(Regression(row["case"], row["schema"], k, b, v))
+    return out
+
+
+# -------------------- CLI --------------------
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark IDS/NDS trên dữ liệu synthetic")
+    ap.add_argument("--out", default="bench.json", help="file JSON kết quả")
+    ap.add_argument("--csv", help="ghi thêm kết quả dạng CSV")
+    ap.add_argument("--baseline", help="JSON baseline để so sánh")
+    ap.add_argument("--time-threshold", type=float, default=0.2)
+    ap.add_argument("--mem-threshold", type=float, default=0.2)
+    ap.add_argument("--min-seconds", type=float, default=0.05)
+    ap.add_argument("--seeds", type=int, nargs="+", default=[0])
+    ap.add_argument("--schemas", nargs="+", default=list(DEFAULT_SCHEMAS))
+    ap.add_argument("--min-prev", type=float, default=0.2)
+    ap.add_argument("--full", action="store_true", help="tích Descartes mọi trục")
+    ap.add_argument("--trace-memory", action="store_true",
+                    help="chạy thêm một lượt có tracemalloc để đo peak bộ nhớ (không ảnh hưởng thời gian)")
+    args = ap.parse_args(argv)
+
+    rows = run_benchmarks(
+        param_grid(full=args.full),
+        seeds=args.seeds,
+        schemas=args.schemas,
+        min_prev=args.min_prev,
+        trace_memory=args.trace_memory,
+        log=print,
+    )
+    write_json(rows, args.out)
+    if args.csv:
+        write_csv(rows, args.csv)
+
+    if args.baseline:
+        regressions = compare(read_json(args.baseline), rows, args.time_threshold,
+                              args.mem_threshold, args.min_seconds)
+        for r in regressions:
+            print("REGRESSION", r)
+        if regressions:
+            return 1
+        print("Không có regression so với", args.baseline)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,269 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Union
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
+from .data import ColumnarDataset, Dataset
+from .neighborhood import NeighborhoodList
+from .chash import CHash, CompactCHash
+
+# Tăng khi đổi định dạng trên đĩa hoặc đổi kết quả của bước neighborhood /
+# clique mining -> mọi entry cũ tự thành không hợp lệ.
+CACHE_VERSION = 2
+
+AnyCHash = Union[CHash, CompactCHash]
+
+
+def dataset_fingerprint(dataset: Dataset) -> str:
+    """
+    SHA-256 nội dung dataset (tên feature + các cột đã sort), không phụ
+    thuộc dataset được đọc từ CSV, .npy hay tạo trong bộ nhớ.
+    """
+    cols = dataset if isinstance(dataset, ColumnarDataset) else dataset.to_columnar()
+    h = hashlib.sha256()
+    h.update(json.dumps(cols.feature_names).encode())
+    for arr, dtype in ((cols.feature, np.int32), (cols.idx, np.int64),
+                       (cols.x, np.float64), (cols.y, np.float64)):
+        h.update(np.ascontiguousarray(arr, dtype=dtype).tobytes())
+    return h.hexdigest()
+
+
+@dataclass
+class CacheEntry:
+    """
+    Kết quả đọc C-Hash từ cache.
+    """
+    key: str
+    chash: AnyCHash
+
+
+class PipelineCache:
+    """
+    Cache trên đĩa cho NeighborhoodList + C-Hash của run_pipeline – hai
+    bước tốn kém và không phụ thuộc min_prev.
+
+    Key = SHA-256 của (CACHE_VERSION, dataset_fingerprint, min_dist, schema,
+    loại C-Hash – CompactCHash, CHash theo id hoặc theo Instance). Quy tắc invalidation: entry chỉ được dùng khi key khớp
+    hoàn toàn, nên đổi nội dung dataset, min_dist, schema hoặc CACHE_VERSION
+    đều dẫn tới miss; entry cũ không còn được đọc và sẽ bị LRU bỏ dần.
+    Entry hỏng (thiếu file, meta không khớp) bị xoá khi đọc.
+
+    Mỗi entry là một thư mục <cache_dir>/<key>/ gồm meta.json và
+    chash.pkl. NeighborhoodList chỉ phụ thuộc (dataset, min_dist) nên được
+    lưu thành entry riêng (meta.json, nbs.npz) với key không gồm schema /
+    loại C-Hash: khi C-Hash miss (vd. đổi schema hoặc compact), run_pipeline
+    đọc lại NeighborhoodList thay vì materialize lại.
+    Tổng dung lượng giữ <= max_bytes bằng cách xoá entry dùng lâu nhất
+    (theo mtime của meta.json, được cập nhật mỗi lần hit).
+
+    Bảo mật: chash.pkl được đọc bằng pickle.load, mà unpickle có thể chạy
+    code tuỳ ý. Chỉ dùng cache_dir mà mình tin tưởng và chỉ mình ghi được
+    (không dùng thư mục chung như /tmp hay thư mục tải về); meta.json và
+    key không bảo vệ gì trước một file pickle bị sửa có chủ đích.
+    """
+
+    def __init__(self, cache_dir: Union[str, Path], max_bytes: int = 1 << 30) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    # ---- key ----
+
+    @staticmethod
+    def _meta(dataset: Dataset, fingerprint: str, min_dist: float, schema: str, compact: bool) -> dict:
+        # CHash của SpatialDataset lưu Instance, của ColumnarDataset lưu id
+        if compact:
+            kind = "compact"
+        elif isinstance(dataset, ColumnarDataset):
+            kind = "chash-ids"
+        else:
+            kind = "chash-instances"
+        return {
+            "version": CACHE_VERSION,
+            "dataset": fingerprint,
+            "min_dist": repr(float(min_dist)),
+            "schema": schema.lower(),
+            "chash": kind,
+        }
+
+    @staticmethod
+    def _nbs_meta(fingerprint: str, min_dist: float) -> dict:
+        return {
+            "version": CACHE_VERSION,
+            "dataset": fingerprint,
+            "min_dist": repr(float(min_dist)),
+            "kind": "nbs",
+        }
+
+    @staticmethod
+    def _key(meta: dict) -> str:
+        return hashlib.sha256(json.dumps(meta, sort_keys=True).encode()).hexdigest()
+
+    def key(self, dataset: Dataset, min_dist: float, schema: str, compact: bool = False) -> str:
+        return self._key(self._meta(dataset, dataset_fingerprint(dataset), min_dist, schema, compact))
+
+    # ---- đọc / ghi ----
+
+    def load(
+        self,
+        dataset: Dataset,
+        min_dist: float,
+        schema: str,
+        compact: bool = False,
+        fingerprint: Optional[str] = None,
+    ) -> Optional[CacheEntry]:
+        """
+        Trả về CacheEntry nếu hit, None nếu miss. fingerprint: truyền lại
+        dataset_fingerprint đã tính để không phải hash dataset lần nữa.
+        """
+        if fingerprint is None:
+            fingerprint = dataset_fingerprint(dataset)
+        meta = self._meta(dataset, fingerprint, min_dist, schema, compact)
+        key = self._key(meta)
+        entry = self.cache_dir / key
+
+        def read(entry: Path):
+            with (entry / "chash.pkl").open("rb") as f:
+                return pickle.load(f)
+
+        table = self._read(entry, key, read)
+        if table is None:
+            return None
+        if meta["chash"] == "compact":
+            chash: AnyCHash = CompactCHash(dataset, table=table)
+        else:
+            chash = CHash(table=table, dataset=dataset if meta["chash"] == "chash-ids" else None)
+        return CacheEntry(key, chash)
+
+    def load_neighborhoods(
+        self,
+        dataset: Dataset,
+        min_dist: float,
+        fingerprint: Optional[str] = None,
+    ) -> Optional[NeighborhoodList]:
+        """
+        NeighborhoodList của (dataset, min_dist) nếu đã có (từ bất kỳ
+        schema / loại C-Hash nào), None nếu miss.
+        """
+        if fingerprint is None:
+            fingerprint = dataset_fingerprint(dataset)
+        key = self._key(self._nbs_meta(fingerprint, min_dist))
+
+        def read(entry: Path):
+            with np.load(entry / "nbs.npz") as z:
+                return NeighborhoodList(dataset, z["indptr"], z["indices"], z["split"])
+
+        return self._read(self.cache_dir / key, key, read)
+
+    def _read(self, entry: Path, key: str, read):
+        """
+        Kiểm tra meta.json khớp key rồi đọc entry; entry hỏng bị xoá. Hit
+        thì cập nhật mtime của meta.json (LRU).
+        """
+        meta_path = entry / "meta.json"
+        if not meta_path.exists():
+            return None
+        try:
+            if self._key(json.loads(meta_path.read_text())) != key:
+                raise ValueError("meta không khớp key")
+            out = read(entry)
+        except (OSError, KeyError, ValueError, pickle.UnpicklingError, EOFError):
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        os.utime(meta_path)
+        return out
+
+    def store(
+        self,
+        dataset: Dataset,
+        min_dist: float,
+        schema: str,
+        chash: AnyCHash,
+        nbs: Optional[NeighborhoodList] = None,
+        fingerprint: Optional[str] = None,
+    ) -> str:
+        """
+        Ghi entry C-Hash, và entry NeighborhoodList nếu truyền nbs mà chưa
+        có (ghi vào thư mục tạm rồi đổi tên, nên không có entry dở dang),
+        sau đó bỏ bớt entry cũ theo LRU. Trả về key của entry C-Hash.
+        """
+        compact = isinstance(chash, CompactCHash)
+        if fingerprint is None:
+            fingerprint = dataset_fingerprint(dataset)
+        meta = self._meta(dataset, fingerprint, min_dist, schema, compact)
+        key = self._key(meta)
+        chash.flush()
+
+        def write_chash(tmp: Path) -> None:
+            with (tmp / "chash.pkl").open("wb") as f:
+                pickle.dump(chash.table, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._write(key, meta, write_chash)
+        keep = [key]
+
+        if nbs is not None:
+            nbs_meta = self._nbs_meta(fingerprint, min_dist)
+            nbs_key = self._key(nbs_meta)
+            if not (self.cache_dir / nbs_key / "meta.json").exists():
+                self._write(nbs_key, nbs_meta, lambda tmp: np.savez(
+                    tmp / "nbs.npz", indptr=nbs.indptr, indices=nbs.indices, split=nbs.split))
+            keep.append(nbs_key)
+
+        self.evict(keep=keep)
+        return key
+
+    def _write(self, key: str, meta: dict, write) -> None:
+        tmp = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-"))
+        try:
+            write(tmp)
+            (tmp / "meta.json").write_text(json.dumps(meta))
+            target = self.cache_dir / key
+            shutil.rmtree(target, ignore_errors=True)
+            os.replace(tmp, target)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    # ---- LRU ----
+
+    def _entries(self) -> List[Path]:
+        return [p for p in self.cache_dir.iterdir() if p.is_dir() and not p.name.startswith(".")]
+
+    @staticmethod
+    def _size(entry: Path) -> int:
+        return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+    def size(self) -> int:
+        return sum(self._size(e) for e in self._entries())
+
+    def evict(self, keep: Iterable[str] = ()) -> None:
+        """
+        Xoá entry dùng lâu nhất cho tới khi tổng dung lượng <= max_bytes
+        (không xoá các entry keep vừa ghi).
+        """
+        keep = {keep} if isinstance(keep, str) else set(keep)
+        entries = []
+        for e in self._entries():
+            try:
+                entries.append(((e / "meta.json").stat().st_mtime, self._size(e), e))
+            except OSError:
+                shutil.rmtree(e, ignore_errors=True)
+        total = sum(size for _, size, _ in entries)
+        for _, size, e in sorted(entries, key=lambda t: t[0]):
+            if total <= self.max_bytes:
+                break
+            if e.name in keep:
+                continue
+            shutil.rmtree(e, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        for e in self._entries():
+            shutil.rmtree(e, ignore_errors=True)
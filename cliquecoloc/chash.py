@@ -1,10 +1,113 @@
 # cliquecoloc/chash.py
 from __future__ import annotations
 
+from array import array
+from bisect import bisect_right
 from dataclasses import dataclass, field
-from typing import Dict, FrozenSet, Iterable, List, Set
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Set
 
-from .data import Instance
+import numpy as np
+
+from .data import ColumnarDataset, Instance
+from .utils import _iter_bits, _to_bitset
+
+
+# dồn slot khi số slot chết > _COMPACT_FRACTION tổng số slot (và ít nhất _COMPACT_MIN_DEAD)
+_COMPACT_FRACTION = 0.5
+_COMPACT_MIN_DEAD = 64
+
+
+class _SupersetIndex:
+    """
+    Inverted index feature -> các key chứa feature đó, để tìm superset của
+    một co-location mà không quét mọi key.
+
+    Mỗi key có một slot (theo thứ tự thêm vào). Với mỗi feature giữ danh
+    sách slot; bitmask slot (Python int) được dựng lại lười khi có truy vấn,
+    nên thêm key là O(|key|). supersets(cp) = AND bitmask của các feature trong cp.
+
+    Key bị xoá được đánh dấu slot chết (bitmask _dead); khi số slot chết
+    vượt _COMPACT_FRACTION tổng số slot thì đánh số lại các slot còn sống
+    (giữ thứ tự), để index không phình mãi khi thêm/xoá liên tục
+    (IncrementalPipeline). Bitmask slot cũ không còn đúng sau khi dồn.
+    """
+
+    def __init__(self) -> None:
+        self._keys: List[Hashable] = []
+        self._slot: Dict[Hashable, int] = {}
+        self._members: Dict[Hashable, List[int]] = {}
+        self._masks: Dict[Hashable, int] = {}
+        self._dead = 0
+        self._n_dead = 0
+
+    def add(self, key: Hashable, features: Iterable[Hashable]) -> None:
+        if key in self._slot:
+            return
+        slot = len(self._keys)
+        self._slot[key] = slot
+        self._keys.append(key)
+        for f in features:
+            self._members.setdefault(f, []).append(slot)
+            self._masks.pop(f, None)
+
+    def remove(self, key: Hashable) -> None:
+        slot = self._slot.pop(key, None)
+        if slot is None:
+            return
+        self._keys[slot] = None
+        self._dead |= 1 << slot
+        self._n_dead += 1
+        if self._n_dead >= _COMPACT_MIN_DEAD and self._n_dead > _COMPACT_FRACTION * len(self._keys):
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Đánh số lại slot: bỏ slot chết, slot còn sống giữ thứ tự cũ.
+        """
+        new_slot = [-1] * len(self._keys)
+        keys: List[Hashable] = []
+        for old, key in enumerate(self._keys):
+            if key is not None:
+                new_slot[old] = len(keys)
+                keys.append(key)
+        self._keys = keys
+        self._slot = {key: i for i, key in enumerate(keys)}
+        members: Dict[Hashable, List[int]] = {}
+        for f, slots in self._members.items():
+            live = [new_slot[i] for i in slots if new_slot[i] >= 0]
+            if live:
+                members[f] = live
+        self._members = members
+        self._masks.clear()
+        self._dead = 0
+        self._n_dead = 0
+
+    def _mask(self, f: Hashable) -> int:
+        m = self._masks.get(f)
+        if m is None:
+            slots = self._members.get(f)
+            if not slots:
+                return 0
+            m = self._masks[f] = _to_bitset(slots, len(self._keys))
+        return m
+
+    def slots(self, features: Iterable[Hashable]) -> int:
+        """
+        Bitmask slot của các key chứa mọi feature cho trước.
+        """
+        m = ((1 << len(self._keys)) - 1) & ~self._dead
+        for f in features:
+            m &= self._mask(f)
+            if not m:
+                break
+        return m
+
+    def keys_at(self, slots: int) -> List[Hashable]:
+        keys = self._keys
+        return [keys[i] for i in _bit_positions(slots)]
+
+    def supersets(self, features: Iterable[Hashable]) -> List[Hashable]:
+        return self.keys_at(self.slots(features))
 
 
 @dataclass
@@ -14,8 +117,34 @@ class CHash:
 
     - Key  : frozenset of feature names (colocation type), ví dụ: frozenset({"A", "B", "C"})
     - Value: dict[feature_name] -> set[Instance] xuất hiện trong các clique thuộc type đó.
+
+    Nếu truyền dataset (ColumnarDataset), clique là tuple instance id và
+    value là set[int]; feature của mỗi id tra trong dataset.
+
+    track_refs=True: đếm số clique chứa mỗi instance trong từng type
+    (reference count) để remove_clique bỏ instance khi không còn clique
+    nào chứa nó. Instance có sẵn trong table lúc tạo được tính count 1.
     """
     table: Dict[FrozenSet[str], Dict[str, Set[Instance]]] = field(default_factory=dict)
+    dataset: Optional[ColumnarDataset] = field(default=None, repr=False)
+    track_refs: bool = field(default=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._index = _SupersetIndex()
+        for key in self.table:
+            self._index.add(key, key)
+        # _refs[key][s]: số clique type key chứa instance s
+        self._refs: Optional[Dict[FrozenSet[str], Dict[Instance, int]]] = None
+        if self.track_refs:
+            self._refs = {
+                key: {s: 1 for v in bucket.values() for s in v}
+                for key, bucket in self.table.items()
+            }
+
+    def _feature_of(self, s) -> str:
+        if self.dataset is not None:
+            return self.dataset.feature_of(s)
+        return s.feature
 
     def add_clique(self, clique: Iterable[Instance]) -> None:
         """
@@ -32,7 +161,8 @@ class CHash:
             return
 
         # Type = tập feature của clique
-        key: FrozenSet[str] = frozenset(s.feature for s in cl_list)
+        feats = [self._feature_of(s) for s in cl_list]
+        key: FrozenSet[str] = frozenset(feats)
 
         # Nếu chỉ có 1 feature thì không phải colocation
         if len(key) < 2:
@@ -46,10 +176,79 @@ class CHash:
         if bucket is None:
             bucket = {f: set() for f in key}
             self.table[key] = bucket
+            self._index.add(key, key)
 
         # Gom instance theo feature
-        for s in cl_list:
-            bucket[s.feature].add(s)
+        for s, f in zip(cl_list, feats):
+            bucket[f].add(s)
+
+        if self._refs is not None:
+            refs = self._refs.setdefault(key, {})
+            for s in cl_list:
+                refs[s] = refs.get(s, 0) + 1
+
+    def remove_clique(self, clique: Iterable[Instance]) -> Optional[FrozenSet[str]]:
+        """
+        Bỏ một clique đã add_clique trước đó (cần track_refs=True): giảm
+        reference count, instance về 0 thì bỏ khỏi bucket, type không còn
+        instance thì bỏ key. Trả về key của clique (None nếu không phải colocation).
+        """
+        if self._refs is None:
+            raise ValueError("remove_clique cần CHash(track_refs=True)")
+        cl_list = list(clique)
+        if len(cl_list) < 2:
+            return None
+        feats = [self._feature_of(s) for s in cl_list]
+        key: FrozenSet[str] = frozenset(feats)
+        if len(key) < 2:
+            return None
+
+        refs = self._refs[key]
+        bucket = self.table[key]
+        for s, f in zip(cl_list, feats):
+            n = refs[s] - 1
+            if n:
+                refs[s] = n
+            else:
+                del refs[s]
+                bucket[f].discard(s)
+
+        if not refs:
+            del self._refs[key]
+            del self.table[key]
+            self._index.remove(key)
+        return key
+
+    def add_cliques(self, cliques: Iterable[Iterable[Instance]]) -> None:
+        for cl in cliques:
+            self.add_clique(cl)
+
+    def merge(self, other: "CHash") -> None:
+        """
+        Hợp một C-Hash khác (vd. partial của một tile) vào C-Hash này:
+        cùng key thì hợp instance theo từng feature.
+        """
+        for key, bucket in other.table.items():
+            mine = self.table.get(key)
+            if mine is None:
+                self.table[key] = {f: set(v) for f, v in bucket.items()}
+                self._index.add(key, key)
+            else:
+                for f, v in bucket.items():
+                    mine[f].update(v)
+
+            if self._refs is not None:
+                # partial không đếm thì mỗi instance tính 1 clique
+                counts = other._refs[key] if other._refs is not None else \
+                    {s: 1 for v in bucket.values() for s in v}
+                refs = self._refs.setdefault(key, {})
+                for s, n in counts.items():
+                    refs[s] = refs.get(s, 0) + n
+
+    def flush(self) -> None:
+        """
+        Không làm gì: CHash ghi thẳng vào table (cùng API với CompactCHash.flush).
+        """
 
     @property
     def candidates(self) -> List[FrozenSet[str]]:
@@ -68,3 +267,254 @@ class CHash:
             -> trả về tất cả instance A thuộc các clique có type {A,B}.
         """
         return self.table[key][feature]
+
+    def supersets(self, cp: FrozenSet[str]) -> List[FrozenSet[str]]:
+        """
+        Các key trong C-Hash chứa cp (dùng cho Algorithm 6), tra qua superset index.
+        """
+        return self._index.supersets(cp)
+
+    def superset_slots(self, cp: FrozenSet[str]) -> int:
+        """
+        Như supersets nhưng trả về bitmask slot (dùng keys_at để lấy key).
+        """
+        return self._index.slots(cp)
+
+    def keys_at(self, slots: int) -> List[FrozenSet[str]]:
+        return self._index.keys_at(slots)
+
+    def union(
+        self,
+        keys: Iterable[FrozenSet[str]],
+        feature: str,
+        base: Optional[Set[Instance]] = None,
+    ) -> Set[Instance]:
+        """
+        ⋃ key[feature] trên các key cho trước (hợp thêm base nếu có).
+        """
+        out: Set[Instance] = set() if base is None else set(base)
+        for key in keys:
+            out.update(self.table[key][feature])
+        return out
+
+
+# flush buffer khi tổng số id đang chờ vượt ngưỡng này
+_FLUSH_IDS = 1 << 20
+
+
+@dataclass
+class CompactCHash:
+    """
+    C-Hash gọn cho ColumnarDataset.
+
+    - Key  : bitmask (Python int) trên feature code: bit c bật <=> feature code c thuộc type.
+    - Value: một mảng instance id (int32) đã sort, không trùng, chứa mọi
+      instance của type. Vì id sort theo (feature, idx), instance của feature
+      code c là một đoạn liên tiếp, tìm bằng searchsorted với
+      dataset.feature_offsets.
+
+    Clique (tuple instance id) được gom vào buffer array('i') theo key rồi
+    mới gộp thành mảng sort theo lô, nên add_clique/add_cliques không tạo
+    frozenset hay set cho từng clique.
+
+    candidates/instances_for trả về cùng kiểu như CHash (frozenset tên
+    feature, set instance id).
+    """
+    dataset: ColumnarDataset = field(repr=False)
+    table: Dict[int, np.ndarray] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        # feature code của id s = vị trí của s trong feature_offsets (id sort
+        # theo feature) – chỉ cần mảng cỡ số feature, không phải cỡ n
+        self._offsets: List[int] = self.dataset.feature_offsets.tolist()
+        self._bit_of_code: List[int] = [1 << c for c in range(len(self.dataset.feature_names))]
+        self._code_of: Dict[str, int] = {f: c for c, f in enumerate(self.dataset.feature_names)}
+        self._pending: Dict[int, array] = {}
+        self._pending_ids = 0
+        self._names: Dict[int, FrozenSet[str]] = {}
+        self._index = _SupersetIndex()
+        for key in self.table:
+            self._index.add(key, _iter_bits(key))
+
+    # ---- thêm clique ----
+
+    def add_clique(self, clique: Iterable[int]) -> None:
+        """
+        Thêm một clique (tuple instance id); bỏ clique size < 2 hoặc chỉ có 1 feature.
+        """
+        cl = tuple(clique)
+        if len(cl) < 2:
+            return
+
+        offsets, bits = self._offsets, self._bit_of_code
+        key = 0
+        for s in cl:
+            key |= bits[bisect_right(offsets, s) - 1]
+        # chỉ 1 feature -> không phải colocation
+        if key & (key - 1) == 0:
+            return
+
+        buf = self._pending.get(key)
+        if buf is None:
+            buf = self._pending[key] = array("i")
+        buf.extend(cl)
+        self._pending_ids += len(cl)
+        if self._pending_ids >= _FLUSH_IDS:
+            self.flush()
+
+    def add_cliques(self, cliques: Iterable[Iterable[int]]) -> None:
+        """
+        Thêm nhiều clique một lần (có thể là generator).
+        """
+        add = self.add_clique
+        for cl in cliques:
+            add(cl)
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Gộp mọi buffer vào table trong một lượt: sort (key, id), bỏ trùng,
+        cắt theo key rồi hợp với mảng cũ. Gọi trước khi đọc thẳng table
+        hoặc gửi C-Hash sang process khác (pickle / process pool).
+        """
+        if not self._pending:
+            return
+        keys = list(self._pending)
+        bufs = [np.frombuffer(self._pending[k], dtype=np.int32) for k in keys]
+        ids = np.concatenate(bufs)
+        kidx = np.repeat(np.arange(len(keys)), [len(b) for b in bufs])
+
+        order = np.lexsort((ids, kidx))
+        ids, kidx = ids[order], kidx[order]
+        keep = np.r_[True, (ids[1:] != ids[:-1]) | (kidx[1:] != kidx[:-1])]
+        ids, kidx = ids[keep], kidx[keep]
+        bounds = np.searchsorted(kidx, np.arange(len(keys) + 1)).tolist()
+
+        for i, key in enumerate(keys):
+            part = ids[bounds[i]:bounds[i + 1]].copy()
+            old = self.table.get(key)
+            if old is None:
+                self.table[key] = part
+                self._index.add(key, _iter_bits(key))
+            else:
+                self.table[key] = np.union1d(old, part).astype(np.int32)
+        self._pending.clear()
+        self._pending_ids = 0
+
+    def merge(self, other: "CompactCHash") -> None:
+        """
+        Hợp một CompactCHash khác trên cùng dataset (vd. partial của một
+        tile): cùng key thì hợp hai mảng id.
+        """
+        self.flush()
+        other.flush()
+        for key, arr in other.table.items():
+            old = self.table.get(key)
+            if old is None:
+                self.table[key] = arr.copy()
+                self._index.add(key, _iter_bits(key))
+            else:
+                self.table[key] = np.union1d(old, arr).astype(np.int32)
+
+    # ---- key <-> tên feature ----
+
+    def code_of(self, feature: str) -> int:
+        """
+        Tên feature -> feature code; KeyError nêu tên nếu feature không có trong dataset.
+        """
+        c = self._code_of.get(feature)
+        if c is None:
+            raise KeyError(f"feature {feature!r} không có trong dataset")
+        return c
+
+    def key_of(self, cp: Iterable[str]) -> int:
+        """
+        frozenset tên feature -> bitmask; KeyError nếu có feature không tồn tại.
+        """
+        key = 0
+        for f in cp:
+            key |= 1 << self.code_of(f)
+        return key
+
+    def names_of(self, key: int) -> FrozenSet[str]:
+        names = self._names.get(key)
+        if names is None:
+            fn = self.dataset.feature_names
+            names = self._names[key] = frozenset(fn[c] for c in _iter_bits(key))
+        return names
+
+    def _slice(self, key: int, code: int) -> np.ndarray:
+        arr = self.table[key]
+        off = self.dataset.feature_offsets
+        lo, hi = np.searchsorted(arr, (off[code], off[code + 1]))
+        return arr[lo:hi]
+
+    # ---- API giống CHash ----
+
+    @property
+    def candidates(self) -> List[FrozenSet[str]]:
+        self.flush()
+        return [self.names_of(key) for key in self.table]
+
+    def participation(self, key: FrozenSet[str], feature: str) -> np.ndarray:
+        """
+        Mảng id (đã sort) của feature trong type key – view, không copy.
+        KeyError nếu feature không có trong dataset hoặc key không có trong C-Hash.
+        """
+        self.flush()
+        m = self.key_of(key)
+        if m not in self.table:
+            raise KeyError(key)
+        return self._slice(m, self.code_of(feature))
+
+    def instances_for(self, key: FrozenSet[str], feature: str) -> Set[int]:
+        return set(self.participation(key, feature).tolist())
+
+    def supersets(self, cp: FrozenSet[str]) -> List[int]:
+        """
+        Các key (bitmask) chứa cp, tra qua superset index.
+        """
+        return self.keys_at(self.superset_slots(cp))
+
+    def superset_slots(self, cp: FrozenSet[str]) -> int:
+        self.flush()
+        try:
+            m = self.key_of(cp)
+        except KeyError:
+            # feature không có trong dataset -> không key nào chứa cp (như CHash)
+            return 0
+        return self._index.slots(_iter_bits(m))
+
+    def keys_at(self, slots: int) -> List[int]:
+        return self._index.keys_at(slots)
+
+    def union(
+        self,
+        keys: Iterable[int],
+        feature: str,
+        base: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        c = self.code_of(feature)
+        keys = list(keys)
+        if not keys:
+            return np.zeros(0, dtype=np.int32) if base is None else base
+        if len(keys) == 1 and base is None:
+            return self._slice(keys[0], c)
+        # nối cả mảng rồi lọc đoạn id của feature một lần
+        ids = np.concatenate([self.table[key] for key in keys])
+        off = self.dataset.feature_offsets
+        ids = ids[(ids >= off[c]) & (ids < off[c + 1])]
+        if base is not None:
+            ids = np.concatenate((base, ids))
+        return np.unique(ids)
+
+
+def _bit_positions(mask: int) -> List[int]:
+    """
+    Vị trí các bit bật, tăng dần. Mask dài thì giải bằng NumPy thay vì
+    tách từng bit thấp nhất (mỗi bước O(độ dài mask)).
+    """
+    if mask.bit_length() <= 64:
+        return list(_iter_bits(mask))
+    raw = np.frombuffer(mask.to_bytes((mask.bit_length() + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")).tolist()
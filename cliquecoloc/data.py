@@ -1,9 +1,13 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, List, Set
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Sequence, Set, Tuple, Union
 import csv
+import json
 from pathlib import Path
 
+import numpy as np
+
 
 @dataclass(order=True, frozen=True)
 class Instance:
@@ -34,6 +38,9 @@ class SpatialDataset:
         for s in self.instances:
             self.feature_to_instances.setdefault(s.feature, []).append(s)
 
+    def __len__(self) -> int:
+        return len(self.instances)
+
     @property
     def features(self) -> Set[str]:
         return set(self.feature_to_instances.keys())
@@ -41,25 +48,214 @@ class SpatialDataset:
     def feature_counts(self) -> Dict[str, int]:
         return {f: len(v) for f, v in self.feature_to_instances.items()}
 
+    def to_columnar(self) -> "ColumnarDataset":
+        """
+        Chuyển sang dạng cột. Instance id = vị trí trong self.instances.
+        """
+        return ColumnarDataset.from_instances(self.instances)
+
+
+@dataclass
+class ColumnarDataset:
+    """
+    Tập dữ liệu (F,S) dạng cột (NumPy), không tạo object Instance cho từng điểm.
+
+    - feature_names: tên feature đã intern, code i <-> feature_names[i].
+      feature_names được sort nên thứ tự code trùng thứ tự tên feature.
+    - feature, idx, x, y: các cột, đã sort theo (feature, idx) như Sec.3.
+
+    Instance id = vị trí (int32) trong thứ tự (feature, idx), nên so sánh
+    id tương đương so sánh Instance.
+    """
+    feature_names: List[str]
+    feature: np.ndarray
+    idx: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+
+    def __post_init__(self) -> None:
+        self.feature_names = list(self.feature_names)
+        self.feature = np.asarray(self.feature, dtype=_code_dtype(len(self.feature_names)))
+        self.idx = np.asarray(self.idx, dtype=np.int64)
+        self.x = np.asarray(self.x, dtype=np.float64)
+        self.y = np.asarray(self.y, dtype=np.float64)
+
+        # Sort chuẩn theo paper: feature rồi index (x, y chỉ để phá hoà như Instance).
+        # Dữ liệu đã sort sẵn (vd. load_npy) chỉ cần kiểm tra O(n).
+        if not _is_sorted(self.feature, self.idx, self.x, self.y):
+            order = np.lexsort((self.y, self.x, self.idx, self.feature))
+            self.feature = self.feature[order]
+            self.idx = self.idx[order]
+            self.x = self.x[order]
+            self.y = self.y[order]
+
+        # feature_offsets[c] .. feature_offsets[c+1]: khoảng id của feature code c
+        self.feature_offsets = np.searchsorted(
+            self.feature, np.arange(len(self.feature_names) + 1)
+        )
+
+    @classmethod
+    def from_columns(
+        cls,
+        features: Sequence[str],
+        idx: Sequence[int],
+        x: Sequence[float],
+        y: Sequence[float],
+    ) -> "ColumnarDataset":
+        """
+        Tạo từ các cột thô; tên feature được intern thành code nhỏ.
+        """
+        names, codes = np.unique(np.asarray(features, dtype=str), return_inverse=True)
+        return cls([str(f) for f in names], codes, idx, x, y)
+
+    @classmethod
+    def from_instances(cls, instances: Iterable[Instance]) -> "ColumnarDataset":
+        instances = list(instances)
+        return cls.from_columns(
+            [s.feature for s in instances],
+            [s.idx for s in instances],
+            [s.x for s in instances],
+            [s.y for s in instances],
+        )
+
+    def __len__(self) -> int:
+        return len(self.feature)
+
+    @property
+    def ids(self) -> np.ndarray:
+        return np.arange(len(self), dtype=np.int32)
+
+    @property
+    def features(self) -> Set[str]:
+        return {f for f, n in self.feature_counts().items() if n > 0}
+
+    def feature_counts(self) -> Dict[str, int]:
+        counts = np.diff(self.feature_offsets)
+        return {f: int(n) for f, n in zip(self.feature_names, counts) if n > 0}
+
+    def feature_of(self, i: int) -> str:
+        return self.feature_names[self.feature[i]]
+
+    def instance(self, i: int) -> Instance:
+        """
+        Tạo Instance cho id i (chỉ khi người dùng cần).
+        """
+        return Instance(
+            self.feature_names[self.feature[i]],
+            int(self.idx[i]),
+            float(self.x[i]),
+            float(self.y[i]),
+        )
+
+    def to_instances(self, ids: Iterable[int] | None = None) -> List[Instance]:
+        if ids is None:
+            ids = range(len(self))
+        return [self.instance(i) for i in ids]
+
+    def to_spatial(self) -> SpatialDataset:
+        return SpatialDataset(self.to_instances())
+
+
+Dataset = Union[SpatialDataset, ColumnarDataset]
+
+
+def _code_dtype(n_features: int) -> np.dtype:
+    """
+    dtype của cột feature code: int16 nếu đủ, ngược lại int32.
+    """
+    return np.dtype(np.int16 if n_features <= np.iinfo(np.int16).max else np.int32)
+
+
+def _is_sorted(*cols: np.ndarray) -> bool:
+    """
+    Các hàng (cols[0][i], cols[1][i], ...) đã tăng dần theo thứ tự từ điển chưa.
+    """
+    n = len(cols[0])
+    if n < 2:
+        return True
+    # tie[i]: hàng i và i+1 bằng nhau trên các cột đã xét
+    tie = np.ones(n - 1, dtype=bool)
+    for c in cols:
+        a, b = c[:-1], c[1:]
+        if np.any(tie & (a > b)):
+            return False
+        tie &= a == b
+        if not tie.any():
+            break
+    return True
+
 
 # -------------------- CSV helpers --------------------
 
 
-def load_csv(path: str | Path) -> SpatialDataset:
+# tên cột chấp nhận được: feature, idx, x, y hoặc Feature, InstanceID, X, Y
+_CSV_COLUMNS = (("feature", "Feature"), ("idx", "InstanceID"), ("x", "X"), ("y", "Y"))
+
+_CSV_ROW = np.dtype([("feature", object), ("idx", np.int64), ("x", np.float64), ("y", np.float64)])
+
+CsvChunk = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def iter_csv_chunks(path: str | Path, chunksize: int = 1_000_000) -> Iterator[CsvChunk]:
+    """
+    Đọc CSV theo lô chunksize dòng, mỗi lô là 4 mảng (feature, idx, x, y).
+
+    Mỗi lô được tách một lần bằng parser C của np.loadtxt vào dtype có cấu
+    trúc (cột số đọc thẳng vào dtype số). Dòng trống bị bỏ qua.
+    """
+    path = Path(path)
+    with path.open("r", newline="") as f:
+        header = next(csv.reader([f.readline()]), [])
+        cols = []
+        for names in _CSV_COLUMNS:
+            pos = next((header.index(n) for n in names if n in header), None)
+            if pos is None:
+                raise ValueError(f"{path}: thiếu cột {names[0]!r}")
+            cols.append(pos)
+
+        while True:
+            lines = list(islice(f, chunksize))
+            if not lines:
+                return
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            rows = np.loadtxt(lines, dtype=_CSV_ROW, usecols=cols, delimiter=",",
+                              quotechar='"', comments=None, ndmin=1)
+            yield rows["feature"].astype(str), rows["idx"], rows["x"], rows["y"]
+
+
+def _load_csv_columnar(path: str | Path, chunksize: int = 1_000_000) -> ColumnarDataset:
+    chunks = list(iter_csv_chunks(path, chunksize))
+    if not chunks:
+        return ColumnarDataset.from_columns([], [], [], [])
+    return ColumnarDataset.from_columns(*(np.concatenate(c) for c in zip(*chunks)))
+
+
+def load_csv(path: str | Path, columnar: bool = False) -> Dataset:
     """
     Đọc file CSV với cột: feature, idx, x, y (hoặc Feature, InstanceID, X, Y).
+
+    columnar=True: trả về ColumnarDataset, đọc theo lô bằng iter_csv_chunks
+    (không tạo Instance cho từng dòng).
     """
     path = Path(path)
+    if columnar:
+        return _load_csv_columnar(path)
+
     instances: List[Instance] = []
     with path.open("r", newline="") as f:
         reader = csv.DictReader(f)
         for row in reader:
+            # dòng chỉ có khoảng trắng (DictReader chỉ tự bỏ dòng rỗng hẳn)
+            if not any(v and v.strip() for v in row.values()):
+                continue
             # Handle both lowercase and capitalized column names
             feature = row.get("feature") or row.get("Feature")
             idx = row.get("idx") or row.get("InstanceID")
             x = row.get("x") or row.get("X")
             y = row.get("y") or row.get("Y")
-            
+
             instances.append(
                 Instance(
                     feature=str(feature),
@@ -71,11 +267,75 @@ def load_csv(path: str | Path) -> SpatialDataset:
     return SpatialDataset(instances)
 
 
-def save_csv(dataset: SpatialDataset, path: str | Path) -> None:
+def save_csv(dataset: Dataset, path: str | Path) -> None:
     path = Path(path)
     path.parent.mkdir(parents=True, exist_ok=True)
     with path.open("w", newline="") as f:
         writer = csv.writer(f)
         writer.writerow(["feature", "idx", "x", "y"])
+        if isinstance(dataset, ColumnarDataset):
+            names = dataset.feature_names
+            for c, i, x, y in zip(dataset.feature.tolist(), dataset.idx.tolist(),
+                                  dataset.x.tolist(), dataset.y.tolist()):
+                writer.writerow([names[c], i, x, y])
+            return
         for s in dataset.instances:
             writer.writerow([s.feature, s.idx, s.x, s.y])
+
+
+# -------------------- Binary (.npy) format --------------------
+#
+# Một thư mục gồm feature.npy, idx.npy, x.npy, y.npy (đã sort theo
+# (feature, idx)) và meta.json chứa từ điển feature (code -> tên).
+
+_NPY_COLUMNS = ("feature", "idx", "x", "y")
+_NPY_VERSION = 1
+
+
+def save_npy(dataset: Dataset, path: str | Path) -> None:
+    """
+    Ghi dataset ra thư mục binary (xem load_npy).
+    """
+    if not isinstance(dataset, ColumnarDataset):
+        dataset = dataset.to_columnar()
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for name in _NPY_COLUMNS:
+        np.save(path / f"{name}.npy", getattr(dataset, name))
+    _write_npy_meta(path, dataset.feature_names, len(dataset))
+
+
+def _write_npy_meta(path: Path, feature_names: List[str], count: int) -> None:
+    meta = {
+        "version": _NPY_VERSION,
+        "feature_names": list(feature_names),
+        "count": count,
+    }
+    (path / "meta.json").write_text(json.dumps(meta))
+
+
+def load_npy(path: str | Path, mmap: bool = True) -> ColumnarDataset:
+    """
+    Đọc thư mục binary do save_npy / csv_to_npy ghi.
+
+    mmap=True: các cột là memory map chỉ đọc, chỉ nạp khi được truy cập.
+    Dữ liệu đã sort nên ColumnarDataset chỉ kiểm tra thứ tự, không sort lại.
+    """
+    path = Path(path)
+    meta = json.loads((path / "meta.json").read_text())
+    if meta.get("version") != _NPY_VERSION:
+        raise ValueError(f"{path}: không hỗ trợ version {meta.get('version')!r}")
+    mode = "r" if mmap else None
+    cols = [np.load(path / f"{name}.npy", mmap_mode=mode) for name in _NPY_COLUMNS]
+    if any(len(c) != meta["count"] for c in cols):
+        raise ValueError(f"{path}: số dòng các cột không khớp meta.json")
+    return ColumnarDataset(meta["feature_names"], *cols)
+
+
+def csv_to_npy(csv_path: str | Path, out_path: str | Path, chunksize: int = 1_000_000) -> ColumnarDataset:
+    """
+    Chuyển CSV sang thư mục binary (đọc theo lô), trả về dataset đã đọc.
+    """
+    dataset = _load_csv_columnar(csv_path, chunksize)
+    save_npy(dataset, out_path)
+    return dataset
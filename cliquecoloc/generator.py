@@ -1,9 +1,17 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Tuple
-import random
+from pathlib import Path
+from typing import Iterator, List, Tuple
 
-from .data import Instance, SpatialDataset
+import numpy as np
+
+from .data import (
+    _NPY_COLUMNS,
+    ColumnarDataset,
+    Dataset,
+    _code_dtype,
+    _write_npy_meta,
+)
 
 
 @dataclass
@@ -18,53 +26,164 @@ class GeneratorParams:
     clumpy: int = 1
 
 
-def generate_synthetic(params: GeneratorParams, seed: int | None = None) -> SpatialDataset:
+# (feature code, idx đầu tiên, x, y) – một khối instance liên tiếp của cùng feature
+Block = Tuple[int, int, np.ndarray, np.ndarray]
+
+
+@dataclass
+class _Layout:
     """
-    Spatial data generator giống mô tả Sec.4.1 + Table 2 (simplified nhưng đúng ý).
+    Phần đã quyết định trước khi sinh noise: tên feature, toạ độ instance
+    của core pattern theo từng feature code và số instance noise mỗi feature.
     """
-    if seed is not None:
-        random.seed(seed)
+    features: List[str]
+    core_x: List[np.ndarray]
+    core_y: List[np.ndarray]
+    noise: np.ndarray
 
+    @property
+    def counts(self) -> np.ndarray:
+        return np.array([len(c) for c in self.core_x], dtype=np.int64) + self.noise
+
+
+def _layout(params: GeneratorParams, rng: np.random.Generator) -> _Layout:
     # 1. Tạo feature names: A,B,C,...
-    features = [chr(ord("A") + i) for i in range(params.F)]
+    F = params.F
+    features = [chr(ord("A") + i) for i in range(F)]
 
     # 2. Sinh P core patterns, mỗi cái là tập feature size ≈ Q
-    cores: List[List[str]] = []
-    for _ in range(params.P):
-        size = max(2, int(random.gauss(params.Q, 0.5)) )
-        size = min(size, params.F)
-        cores.append(random.sample(features, size))
-
-    instances: List[Instance] = []
-    # index counter cho từng feature
-    idx_counter = {f: 1 for f in features}
-
-    # 3. Generate I row-instances per core pattern
-    grid_size = params.min_dist  # mỗi neighborhood ~1 grid cell
-    num_grids_side = max(1, params.D // int(grid_size))
-    for core in cores:
-        for _ in range(params.I):
-            # chọn 1 grid ngẫu nhiên
-            gx = random.randrange(num_grids_side)
-            gy = random.randrange(num_grids_side)
-            base_x = gx * grid_size
-            base_y = gy * grid_size
-            for feat in core:
-                x = base_x + random.random() * grid_size
-                y = base_y + random.random() * grid_size
-                instances.append(
-                    Instance(feat, idx_counter[feat], x, y)
-                )
-                idx_counter[feat] += 1
-
-    # 4. Bổ sung instance ngẫu nhiên tới đủ m
-    while len(instances) < params.m:
-        feat = random.choice(features)
-        x = random.random() * params.D
-        y = random.random() * params.D
-        instances.append(
-            Instance(feat, idx_counter[feat], x, y)
-        )
-        idx_counter[feat] += 1
-
-    return SpatialDataset(instances)
+    sizes = rng.normal(params.Q, 0.5, size=params.P).astype(np.int64)
+    sizes = np.minimum(np.maximum(sizes, 2), F)
+
+    # 3. I row-instances mỗi core; cứ clumpy row-instance liên tiếp chung
+    #    một grid min_dist x min_dist (clumpy=1: mỗi row-instance một grid)
+    grid_size = params.min_dist
+    num_grids_side = max(1, int(params.D // int(grid_size)))
+    clumpy = max(1, params.clumpy)
+    cell_of_row = np.arange(params.I) // clumpy
+    num_cells = -(-params.I // clumpy)
+
+    xs: List[List[np.ndarray]] = [[] for _ in range(F)]
+    ys: List[List[np.ndarray]] = [[] for _ in range(F)]
+    for size in sizes.tolist():
+        core = rng.choice(F, size=size, replace=False)
+        base = rng.integers(num_grids_side, size=(num_cells, 2))[cell_of_row] * grid_size
+        offset = rng.random((size, params.I, 2)) * grid_size
+        for k, f in enumerate(core.tolist()):
+            xs[f].append(base[:, 0] + offset[k, :, 0])
+            ys[f].append(base[:, 1] + offset[k, :, 1])
+
+    empty = np.empty(0, dtype=np.float64)
+    core_x = [np.concatenate(a) if a else empty for a in xs]
+    core_y = [np.concatenate(a) if a else empty for a in ys]
+
+    # 4. Bổ sung instance ngẫu nhiên tới đủ m, feature chọn đều
+    n_noise = max(0, params.m - sum(len(c) for c in core_x))
+    noise = rng.multinomial(n_noise, [1.0 / F] * F) if F else np.zeros(0, dtype=np.int64)
+    return _Layout(features, core_x, core_y, noise.astype(np.int64))
+
+
+def _iter_blocks(
+    params: GeneratorParams,
+    layout: _Layout,
+    rng: np.random.Generator,
+    chunksize: int,
+) -> Iterator[Block]:
+    """
+    Sinh instance theo thứ tự (feature, idx): với mỗi feature, instance của
+    core pattern (theo thứ tự core) rồi tới noise, noise sinh theo lô
+    chunksize điểm. (x, y) của noise lấy theo cặp nên kết quả không phụ
+    thuộc chunksize.
+    """
+    for f in range(len(layout.features)):
+        start = 1
+        if len(layout.core_x[f]):
+            yield f, start, layout.core_x[f], layout.core_y[f]
+            start += len(layout.core_x[f])
+        left = int(layout.noise[f])
+        while left > 0:
+            k = min(left, chunksize)
+            xy = rng.random((k, 2)) * params.D
+            yield f, start, xy[:, 0], xy[:, 1]
+            start += k
+            left -= k
+
+
+def _fill(cols, blocks: Iterator[Block]) -> None:
+    """
+    Ghi các khối lần lượt vào 4 cột (feature, idx, x, y) đã cấp phát đủ chỗ.
+    """
+    feature, idx, x, y = cols
+    pos = 0
+    for f, start, bx, by in blocks:
+        k = len(bx)
+        feature[pos:pos + k] = f
+        idx[pos:pos + k] = np.arange(start, start + k)
+        x[pos:pos + k] = bx
+        y[pos:pos + k] = by
+        pos += k
+
+
+def generate_synthetic(
+    params: GeneratorParams,
+    seed: int | None = None,
+    columnar: bool = False,
+) -> Dataset:
+    """
+    Spatial data generator giống mô tả Sec.4.1 + Table 2 (simplified nhưng đúng ý).
+
+    - P core pattern, size ~ int(N(Q, 0.5)) (ít nhất 2, nhiều nhất F);
+    - mỗi core I row-instance, mỗi row-instance nằm trong một grid
+      min_dist x min_dist, cứ clumpy row-instance chung một grid;
+    - thêm noise phân bố đều (feature chọn đều) tới đủ m instance.
+
+    Sinh bằng numpy.random.Generator theo mảng, không lặp theo từng điểm.
+    columnar=True: trả về ColumnarDataset (cùng dữ liệu, không giữ Instance).
+    Dữ liệu lớn hơn bộ nhớ: dùng write_synthetic.
+    """
+    rng = np.random.default_rng(seed)
+    layout = _layout(params, rng)
+    n = int(layout.counts.sum())
+    feature = np.empty(n, dtype=_code_dtype(len(layout.features)))
+    idx = np.empty(n, dtype=np.int64)
+    x = np.empty(n, dtype=np.float64)
+    y = np.empty(n, dtype=np.float64)
+
+    _fill((feature, idx, x, y), _iter_blocks(params, layout, rng, chunksize=max(1, n)))
+
+    # đã theo thứ tự (feature, idx) nên ColumnarDataset không phải sort lại
+    dataset = ColumnarDataset(layout.features, feature, idx, x, y)
+    return dataset if columnar else dataset.to_spatial()
+
+
+def write_synthetic(
+    params: GeneratorParams,
+    path: str | Path,
+    seed: int | None = None,
+    chunksize: int = 1_000_000,
+) -> int:
+    """
+    Sinh dữ liệu như generate_synthetic và ghi thẳng ra thư mục binary
+    (định dạng của save_npy, đọc lại bằng load_npy) theo lô chunksize điểm:
+    bộ nhớ chỉ cỡ một lô cộng instance của core pattern, không phụ thuộc m.
+
+    Cùng seed cho cùng dữ liệu với generate_synthetic. Trả về số instance.
+    """
+    rng = np.random.default_rng(seed)
+    layout = _layout(params, rng)
+    n = int(layout.counts.sum())
+
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    dtypes = (_code_dtype(len(layout.features)), np.int64, np.float64, np.float64)
+    cols = [
+        np.lib.format.open_memmap(path / f"{name}.npy", mode="w+", dtype=dt, shape=(n,))
+        for name, dt in zip(_NPY_COLUMNS, dtypes)
+    ]
+    _fill(cols, _iter_blocks(params, layout, rng, chunksize))
+    for c in cols:
+        c.flush()
+    del cols
+
+    _write_npy_meta(path, layout.features, n)
+    return n
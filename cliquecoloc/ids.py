@@ -1,164 +1,135 @@
 from __future__ import annotations
-from dataclasses import dataclass, field
-from typing import List, Optional, Set, Tuple
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 from collections import deque
 
-from .data import Instance, SpatialDataset
-from .neighborhood import NeighborhoodList
-
-
-@dataclass
-class ITreeNode:
-    instance: Optional[Instance] = None
-    parent: Optional["ITreeNode"] = None
-    children: List["ITreeNode"] = field(default_factory=list)
-    node_link: Optional["ITreeNode"] = None  # right sibling (Def. 5 trong paper)
+import numpy as np
 
+from .data import Dataset, Instance
+from .neighborhood import NeighborhoodList
+from .stats import PipelineStats
+from .utils import _iter_bits, _to_bitset
 
-class ITree:
-    def __init__(self) -> None:
-        # root: node gốc, instance=None
-        self.root = ITreeNode(instance=None)
 
-    def add_head_node(self, inst: Instance) -> ITreeNode:
-        """
-        Tạo head-node cho instance inst (con trực tiếp của root).
-        Đồng thời nối node_link giữa các head-nodes.
-        """
-        node = ITreeNode(instance=inst, parent=self.root)
-        self.root.children.append(node)
-        if len(self.root.children) > 1:
-            # node_link: head-node trước đó trỏ sang head-node mới
-            self.root.children[-2].node_link = node
-        return node
+class INode(NamedTuple):
+    """
+    Node của I-tree (Def. 5–6) dưới dạng gọn, không giữ parent/children.
 
+    Mọi bitset là Python int trên local id của BNs(head) (local id i
+    <-> instance thứ i trong BNs(head), giữ thứ tự instance).
 
-def _right_sibling_instances(node: ITreeNode) -> Set[Instance]:
+    - path: instance id từ head xuống node (tăng dần, chính là clique).
+    - local: local id của node.
+    - rs: bitset RS(ns) – các right-sibling của node. Vì anh em được sort
+      nên RS(ns) là các anh em có local id > local (sibling offset).
+    - blocked: bitset các local id có feature trùng feature của tổ tiên
+      (ancestor feature bitmask) – không được làm con của node.
     """
-    RS(ns): tập các instance ở các right-siblings của node.
-    Dùng để tránh sinh trùng clique và bảo toàn thứ tự.
+    path: Tuple[int, ...]
+    local: int
+    rs: int
+    blocked: int
+
+
+def _head_subtree(
+    head: int,
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    split: np.ndarray,
+    codes: np.ndarray,
+    out: List[Tuple[int, ...]],
+) -> int:
     """
-    if node.parent is None:
-        return set()
-
-    siblings = node.parent.children
-    idx = siblings.index(node)
-    rs: Set[Instance] = set()
-
-    for sib in siblings[idx + 1:]:
-        if sib.instance is not None:
-            rs.add(sib.instance)
-
-    return rs
-
-
-def _get_children(node: ITreeNode, nbs: NeighborhoodList) -> List[Instance]:
+    BFS trên cây con của head-node, thêm các I-clique (size >= 2) vào out.
+    Trả về số node I-tree đã duyệt (không tính head-node).
+
+    Lemma 3:
+        - children(head) = BNs(head)
+        - children(ns)   = BNs(s) ∩ RS(ns)
+    lọc thêm: không cho 2 instance cùng feature trên cùng đường đi (trừ chính
+    node cha, như cài đặt gốc).
     """
-    Lemma 3 trong paper:
-
-        - Nếu node là head-node (con trực tiếp của root):
-              children = BNs(hn_s)
-
-        - Nếu node là non-root node (khác head-node):
-              children = BNs(s) ∩ RS(ns)
-
-    Sau đó lọc thêm ràng buộc:
-        - Không cho 2 instance cùng feature xuất hiện trong cùng 1 clique.
+    local = indices[split[head]:indptr[head + 1]]
+    k = len(local)
+    if k == 0:
+        # head-node là lá, clique size 1 -> bỏ
+        return 0
+    ids = local.tolist()
+
+    # bns[i]: BNs(local i) ∩ BNs(head), dạng bitset – giao 2 mảng đã sort
+    bns: List[int] = []
+    for v in ids:
+        row = indices[split[v]:indptr[v + 1]]
+        bns.append(_to_bitset(np.searchsorted(local, np.intersect1d(row, local, assume_unique=True)), k))
+
+    # same_feature[c]: bitset các local id có feature code c
+    local_codes = codes[local]
+    same_feature: Dict[int, int] = {
+        int(c): _to_bitset(np.flatnonzero(local_codes == c), k) for c in np.unique(local_codes)
+    }
+    head_code = int(codes[head])
+
+    full = (1 << k) - 1
+    queue = deque()
+    # con của head-node: toàn bộ BNs(head); tổ tiên của chúng chỉ có head
+    head_blocked = same_feature.get(head_code, 0)
+    for i in range(k):
+        queue.append(INode((head, ids[i]), i, full & ~((2 << i) - 1), head_blocked))
+
+    nodes = 0
+    while queue:
+        node = queue.popleft()
+        nodes += 1
+        children = bns[node.local] & node.rs & ~node.blocked
+
+        # không có child -> node lá -> sinh 1 clique (path đã tăng dần)
+        if not children:
+            out.append(node.path)
+            continue
+
+        child_blocked = node.blocked | same_feature[int(local_codes[node.local])]
+        for i in _iter_bits(children):
+            queue.append(INode(
+                node.path + (ids[i],),
+                i,
+                children & ~((2 << i) - 1),
+                child_blocked,
+            ))
+    return nodes
+
+
+def iter_cliques_ids(dataset: Dataset,
+                     nbs: NeighborhoodList,
+                     stats: Optional[PipelineStats] = None) -> Iterator[Tuple[Instance, ...]]:
     """
-    s = node.instance
-    assert s is not None
-
-    # node là head-node nếu parent tồn tại và parent.instance is None (tức là root)
-    is_head_node = (node.parent is not None and node.parent.instance is None)
-
-    if is_head_node:
-        # head-node: chỉ dùng BNs(s)
-        candidates = nbs.bns(s)
-    else:
-        # non-root node: BNs(s) ∩ RS(ns)
-        candidates = nbs.bns(s) & _right_sibling_instances(node)
+    Bản generator của mine_cliques_ids: sinh I-clique theo từng head-node,
+    chỉ giữ trong bộ nhớ các clique của cây con đang xét.
 
-    # tránh 2 instance cùng feature trên cùng đường đi (1 clique)
-    ancestor_features = set()
-    cur = node.parent
-    while cur is not None and cur.instance is not None:
-        ancestor_features.add(cur.instance.feature)
-        cur = cur.parent
-
-    # sort(candidates) để thứ tự ổn định và ăn khớp RS
-    return [inst for inst in sorted(candidates)
-            if inst.feature not in ancestor_features]
-
-
-def _collect_clique(node: ITreeNode) -> Tuple[Instance, ...]:
+    stats: nếu có, cộng số node I-tree vào counter "itree_nodes".
     """
-    Thu clique = tập các instance trên đường đi từ node lên root (loại root).
-    Sau đó sort theo thứ tự tổng (định nghĩa của Instance.__lt__).
-    """
-    clique: List[Instance] = []
-    cur = node
-    while cur is not None and cur.instance is not None:
-        clique.append(cur.instance)
-        cur = cur.parent
-    return tuple(sorted(clique))
+    out: List[Tuple[int, ...]] = []
+
+    # Duyệt từng instance làm head-node; cây con được bỏ ngay sau khi xong
+    for s in range(len(nbs)):
+        nodes = _head_subtree(s, nbs.indptr, nbs.indices, nbs.split, nbs.feature_codes, out)
+        if stats is not None:
+            stats.add("itree_nodes", nodes)
+        for c in out:
+            yield nbs.to_clique(c)
+        out.clear()
 
 
-def mine_cliques_ids(dataset: SpatialDataset,
+def mine_cliques_ids(dataset: Dataset,
                      nbs: NeighborhoodList) -> List[Tuple[Instance, ...]]:
     """
     Algorithm 2 – IDS: Khai phá tất cả I-cliques (theo định nghĩa I-clique trong paper).
 
     Input:
-        - dataset: SpatialDataset (chứa các instance)
+        - dataset: SpatialDataset hoặc ColumnarDataset (chứa các instance)
         - nbs: NeighborhoodList (đã materialize Ns, SNs, BNs từ Algorithm 1)
 
     Output:
         - Danh sách các I-cliques (mỗi clique là tuple các Instance, đã sort).
           Chỉ giữ clique có kích thước >= 2.
+          Với ColumnarDataset, mỗi clique là tuple instance id (int).
     """
-    itree = ITree()
-    cliques: List[Tuple[Instance, ...]] = []
-
-    # Duyệt từng instance làm head-node
-    for s in dataset.instances:
-        queue = deque()
-
-        # tạo head-node cho instance s
-        head = itree.add_head_node(s)
-        queue.append(head)
-
-        # BFS trên I-tree
-        while queue:
-            curr = queue.popleft()
-
-            # bước mở rộng: tính children theo Lemma 3
-            children_instances = _get_children(curr, nbs)
-
-            # nếu không có child → curr là node lá → sinh 1 clique
-            if not children_instances:
-                clique = _collect_clique(curr)
-                # chỉ giữ clique có size >= 2
-                if len(clique) >= 2:
-                    cliques.append(clique)
-                continue
-
-            # tạo các node con cho curr
-            children_nodes: List[ITreeNode] = []
-            prev: Optional[ITreeNode] = None
-            for inst in children_instances:
-                node = ITreeNode(instance=inst, parent=curr)
-                curr.children.append(node)
-                # node_link giữa các con cùng level
-                if prev is not None:
-                    prev.node_link = node
-                prev = node
-                children_nodes.append(node)
-
-            # push children vào queue để BFS tiếp
-            for ch in children_nodes:
-                queue.append(ch)
-
-        # sau khi xong head-node s, reset cây con ở root
-        itree.root.children = []
-
-    return cliques
+    return list(iter_cliques_ids(dataset, nbs))
@@ -0,0 +1,329 @@
+from __future__ import annotations
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import math
+
+from .data import ColumnarDataset, Dataset, Instance, SpatialDataset
+from .neighborhood import NeighborhoodList, _divide_space, materialize_neighborhoods
+from .chash import CHash
+from .ids import _head_subtree
+from .nds import _ENGINES as _NDS_ENGINES
+from .prevalence import PICache, _filter_top_down, mine_prevalent_patterns
+from .tiling import clique_miner
+from .utils import all_nonempty_subsets
+
+Cell = Tuple[int, int]
+Clique = Tuple[Instance, ...]
+HeadMiner = Callable[[NeighborhoodList, int, List[Tuple[int, ...]]], int]
+
+
+def _head_miner(schema: str) -> HeadMiner:
+    """
+    miner(nbs, head, out): thêm các clique (tuple id) có head cho trước vào
+    out, cùng engine với clique_miner(schema).
+    """
+    schema = schema.lower()
+    if schema == "ids":
+        return lambda nbs, head, out: _head_subtree(head, nbs.indptr, nbs.indices, nbs.split,
+                                                    nbs.feature_codes, out)
+    engine = _NDS_ENGINES["pivot" if schema == "nds-pivot" else "bk"]
+    return lambda nbs, head, out: engine(head, nbs.indptr, nbs.indices, nbs.split, out)
+
+
+class _SizeCache(PICache):
+    """
+    PICache giữ thêm |⋃_{K ⊇ cp} K[f]| (tử số của PR) qua các lần cập nhật:
+    khi chỉ số instance của feature đổi, PI tính lại từ tử số cũ với mẫu số mới.
+    sizes[cp] = {} nghĩa là cp không có superset trong C-Hash (PI = 0).
+    """
+
+    def __init__(self, chash: CHash, feature_counts: Dict[str, int],
+                 sizes: Dict[FrozenSet[str], Dict[str, int]]) -> None:
+        super().__init__(chash, feature_counts)
+        self.sizes = sizes
+
+    def pi(self, cp: FrozenSet[str]) -> float:
+        self.calls += 1
+        sz = self.sizes.get(cp)
+        if sz is None:
+            slots, unions = self._unions(cp)
+            sz = self.sizes[cp] = {f: len(u) for f, u in unions.items()} if slots else {}
+        if not sz:
+            return 0.0
+
+        prs: Dict[str, float] = {}
+        for f in cp:
+            denom = self.feature_counts.get(f, 0)
+            prs[f] = 0.0 if denom == 0 else sz[f] / float(denom)
+
+        return min(prs.values()) if prs else 0.0
+
+
+class IncrementalPipeline:
+    """
+    Pipeline giữ trạng thái để cập nhật khi dữ liệu thay đổi ít.
+
+    Thêm/xoá instance p chỉ làm đổi Ns của các instance cách p không quá
+    min_dist, nên chỉ clique có head trong SNs(p) ∪ {p} thay đổi (clique của
+    head h chỉ phụ thuộc {h} ∪ BNs(h)). insert/delete:
+        1. cập nhật dataset và grid min_dist x min_dist (gốc cố định, như DivideSpace);
+        2. khai phá lại clique của các head bị ảnh hưởng trên các cell lân cận;
+        3. so với clique cũ của các head đó, bỏ/thêm phần chênh lệch vào
+           CHash (track_refs=True – reference count theo instance);
+        4. tính lại PI chỉ cho các co-location bị ảnh hưởng: chứa feature có
+           số instance thay đổi, hoặc là subset của type có bucket thay đổi.
+
+    Làm việc trên Instance, vì instance id dạng cột đổi khi chèn/xoá:
+    ColumnarDataset chỉ được dùng nguyên dạng cột cho lần khai phá đầu, sau
+    đó trạng thái là tập Instance. self.dataset là SpatialDataset dựng lại
+    (sort) khi được đọc sau một lần cập nhật – cập nhật không phải chèn vào
+    list đã sort; dataset truyền vào không bị sửa. Cần dạng cột thì gọi
+    self.dataset.to_columnar(). Kết quả luôn giống run_pipeline chạy lại
+    trên dataset hiện tại.
+    """
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        min_dist: float,
+        min_prev: float,
+        schema: str = "nds",
+    ) -> None:
+        self.min_dist = min_dist
+        self.min_prev = min_prev
+        self._mine_head = _head_miner(schema)
+
+        if isinstance(dataset, ColumnarDataset):
+            cols = dataset
+            instances = dataset.to_instances()
+        else:
+            cols = dataset.to_columnar()
+            instances = dataset.instances
+        self._members: Set[Instance] = set(instances)
+        self._feature_counts: Dict[str, int] = dataset.feature_counts()
+        self._dataset: Optional[SpatialDataset] = None
+
+        grids, self._min_x, self._min_y = _divide_space(cols.x, cols.y, min_dist)
+        self._grid: Dict[Cell, Set[Instance]] = {
+            cell: {instances[i] for i in ids.tolist()} for cell, ids in grids.items()
+        }
+
+        # clique theo head (instance nhỏ nhất)
+        self.head_cliques: Dict[Instance, List[Clique]] = {}
+        self.chash = CHash(track_refs=True)
+        nbs = materialize_neighborhoods(cols, min_dist)
+        for ids in clique_miner(schema)(cols, nbs):
+            c = tuple(instances[i] for i in ids)
+            self.head_cliques.setdefault(min(c), []).append(c)
+            self.chash.add_clique(c)
+
+        self._sizes: Dict[FrozenSet[str], Dict[str, int]] = {}
+        self.patterns: Dict[FrozenSet[str], float] = mine_prevalent_patterns(
+            cols, self.chash, min_prev, pi_cache=self._pi_cache()
+        )
+
+    @property
+    def dataset(self) -> SpatialDataset:
+        if self._dataset is None:
+            self._dataset = SpatialDataset(list(self._members))
+        return self._dataset
+
+    def _pi_cache(self) -> _SizeCache:
+        return _SizeCache(self.chash, dict(self._feature_counts), self._sizes)
+
+    # ---- grid ----
+
+    def _cell(self, s: Instance) -> Cell:
+        return (
+            math.floor((s.x - self._min_x) / self.min_dist),
+            math.floor((s.y - self._min_y) / self.min_dist),
+        )
+
+    def _around(self, cell: Cell) -> Iterable[Instance]:
+        cx, cy = cell
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                yield from self._grid.get((cx + dx, cy + dy), ())
+
+    def _smaller_neighbors(self, p: Instance) -> List[Instance]:
+        """
+        SNs(p) trên grid hiện tại (p có thể đã bị xoá khỏi grid).
+        """
+        d2 = self.min_dist * self.min_dist
+        out = []
+        for q in self._around(self._cell(p)):
+            if q < p:
+                dx = p.x - q.x
+                dy = p.y - q.y
+                if dx * dx + dy * dy <= d2:
+                    out.append(q)
+        return out
+
+    # ---- dataset ----
+
+    def _check_update(self, added: List[Instance], removed: List[Instance]) -> None:
+        """
+        Kiểm tra cả lô trước khi đổi trạng thái: instance xoá phải có trong
+        dataset (mỗi instance một lần); instance thêm không được trùng nhau
+        và không được đang có trong dataset, trừ khi cũng bị xoá trong lô này.
+        """
+        gone: Set[Instance] = set()
+        for s in removed:
+            if s in gone or s not in self._members:
+                raise KeyError(f"instance {s} không có trong dataset")
+            gone.add(s)
+        new: Set[Instance] = set()
+        for s in added:
+            if s in new or (s not in gone and s in self._members):
+                raise ValueError(f"instance {s} đã có trong dataset")
+            new.add(s)
+
+    def _add_instance(self, s: Instance) -> None:
+        self._members.add(s)
+        self._feature_counts[s.feature] = self._feature_counts.get(s.feature, 0) + 1
+        self._dataset = None
+        self._grid.setdefault(self._cell(s), set()).add(s)
+
+    def _remove_instance(self, s: Instance) -> None:
+        self._members.discard(s)
+        self._feature_counts[s.feature] -= 1
+        if not self._feature_counts[s.feature]:
+            del self._feature_counts[s.feature]
+        self._dataset = None
+        cell = self._cell(s)
+        self._grid[cell].discard(s)
+        if not self._grid[cell]:
+            del self._grid[cell]
+
+    # ---- clique mining cục bộ ----
+
+    def _mine_heads(self, heads: Set[Instance]) -> Dict[Instance, List[Clique]]:
+        """
+        Clique của các head cho trước. Neighborhood được dựng trên các
+        instance thuộc 3x3 cell quanh mỗi head (chứa toàn bộ BNs(head) và
+        láng giềng của chúng), nhưng engine chỉ chạy cho chính các head đó.
+        """
+        cells: Set[Cell] = set()
+        for h in heads:
+            cx, cy = self._cell(h)
+            cells.update((cx + dx, cy + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1))
+        # sort theo Instance = thứ tự id của ColumnarDataset con
+        local = sorted(s for cell in cells for s in self._grid.get(cell, ()))
+        out: Dict[Instance, List[Clique]] = {h: [] for h in heads}
+        if not local:
+            return out
+
+        sub = ColumnarDataset.from_instances(local)
+        nbs = materialize_neighborhoods(sub, self.min_dist)
+        pos = {s: i for i, s in enumerate(local)}
+        found: List[Tuple[int, ...]] = []
+        for h in heads:
+            self._mine_head(nbs, pos[h], found)
+            # clique của một head không trùng nhau (như iter_cliques_nds)
+            out[h] = [tuple(local[i] for i in c) for c in dict.fromkeys(tuple(sorted(c)) for c in found)]
+            found.clear()
+        return out
+
+    # ---- cập nhật ----
+
+    def insert(self, instances: Iterable[Instance]) -> Dict[FrozenSet[str], float]:
+        """
+        Thêm instance và cập nhật clique, C-Hash, pattern. Trả về self.patterns.
+        """
+        return self.update(added=instances)
+
+    def delete(self, instances: Iterable[Instance]) -> Dict[FrozenSet[str], float]:
+        """
+        Xoá instance và cập nhật clique, C-Hash, pattern. Trả về self.patterns.
+        """
+        return self.update(removed=instances)
+
+    def update(
+        self,
+        added: Iterable[Instance] = (),
+        removed: Iterable[Instance] = (),
+    ) -> Dict[FrozenSet[str], float]:
+        added = list(added)
+        removed = list(removed)
+        self._check_update(added, removed)
+        for s in removed:
+            self._remove_instance(s)
+        for s in added:
+            self._add_instance(s)
+
+        # instance xoá rồi thêm lại trong cùng lần cập nhật vẫn là head bình
+        # thường; chỉ instance thực sự biến mất mới bỏ hết clique
+        gone = set(removed).difference(added)
+
+        # head bị ảnh hưởng: SNs(p) ∪ {p} với mọi p thêm/xoá
+        heads: Set[Instance] = set(added)
+        for p in added + removed:
+            heads.update(self._smaller_neighbors(p))
+        heads -= gone
+
+        fresh = self._mine_heads(heads)
+
+        changed_keys: Set[FrozenSet[str]] = set()
+        chash = self.chash
+        for p in gone:
+            for c in self.head_cliques.pop(p, ()):
+                changed_keys.add(chash.remove_clique(c))
+        for h, new in fresh.items():
+            old = self.head_cliques.get(h, [])
+            new_set = set(new)
+            old_set = set(old)
+            for c in old:
+                if c not in new_set:
+                    changed_keys.add(chash.remove_clique(c))
+            for c in new:
+                if c not in old_set:
+                    chash.add_clique(c)
+                    changed_keys.add(frozenset(s.feature for s in c))
+            if new:
+                self.head_cliques[h] = new
+            else:
+                self.head_cliques.pop(h, None)
+        changed_keys.discard(None)
+
+        changed_features = {s.feature for s in added + removed}
+        self._refresh_patterns(changed_keys, changed_features)
+        return self.patterns
+
+    def _refresh_patterns(
+        self,
+        changed_keys: Set[FrozenSet[str]],
+        changed_features: Set[str],
+    ) -> None:
+        """
+        PI(cp) chỉ đổi khi |f| đổi với f ∈ cp, hoặc một key ⊇ cp đổi bucket
+        (khi đó cp ⊆ key đổi). Pattern không bị ảnh hưởng giữ nguyên; các
+        pattern bị ảnh hưởng được tính lại bằng Algorithm 5 xuất phát từ các
+        key có thể chứa chúng. Tử số của PR chỉ phải tính lại cho cp ⊆ key đổi.
+        """
+        if not changed_keys and not changed_features:
+            return
+
+        touched: Set[FrozenSet[str]] = set()
+        for k in changed_keys:
+            touched.add(k)
+            touched.update(all_nonempty_subsets(k))
+        for cp in touched:
+            self._sizes.pop(cp, None)
+
+        def affected(cp: FrozenSet[str]) -> bool:
+            return cp in touched or not changed_features.isdisjoint(cp)
+
+        table = self.chash.table
+        gone = [k for k in changed_keys if k not in table]
+        starts = [
+            key for key in table
+            if key in changed_keys
+            or not changed_features.isdisjoint(key)
+            or any(len(key & k) >= 2 for k in gone)
+        ]
+        # như mine_prevalent_patterns, nhưng không cần dựng lại self.dataset
+        fresh = _filter_top_down(self.chash, self.min_prev, self._pi_cache(), None, starts,
+                                 maximal=False)
+
+        patterns = {cp: pi for cp, pi in self.patterns.items() if not affected(cp)}
+        patterns.update(fresh)
+        self.patterns = patterns
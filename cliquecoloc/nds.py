@@ -1,25 +1,315 @@
 from __future__ import annotations
-from typing import List, Tuple, Set
+from collections import deque
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple, Set
+import multiprocessing as mp
 
-from .data import Instance, SpatialDataset
+import numpy as np
+
+from .data import Dataset, Instance
 from .neighborhood import NeighborhoodList
+from .stats import PipelineStats
+from .parallel import ArraySpec, attach_arrays, release_arrays, share_arrays, weighted_ranges
+from .utils import _iter_bits, _popcount, _to_bitset
 
 
 def _neighbors_in_set(
-    s: Instance,
-    cand: Set[Instance],
-    nbs: NeighborhoodList
-) -> Set[Instance]:
+    s: int,
+    cand: Set[int],
+    adj: Dict[int, Set[int]]
+) -> Set[int]:
     """
     Trả về các láng giềng của s nằm trong tập cand.
-    Dùng Ns(s) đã materialize trong NeighborhoodList.
+    adj: Ns(s) ∩ BNs(head) của head hiện tại (dựng từ NeighborhoodList).
     """
-    return nbs.ns(s) & cand
+    return adj[s] & cand
+
+
+def _head_cliques(
+    head: int,
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    split: np.ndarray,
+    out: List[Tuple[int, ...]],
+) -> int:
+    """
+    Bron–Kerbosch trên đồ thị con {head} ∪ BNs(head); thêm các clique
+    (tuple id đã sort, size >= 2) vào out. Trả về số lần gọi đệ quy.
+
+    Chỉ đọc mảng CSR nên chạy được trong worker với shared memory.
+    """
+    # Body candidates: các "big neighbors" của head
+    body_candidates: Set[int] = set(indices[split[head]:indptr[head + 1]].tolist())
+
+    # Ns(v) giới hạn trong BNs(head), dựng một lần cho mỗi head
+    adj: Dict[int, Set[int]] = {
+        v: set(indices[indptr[v]:indptr[v + 1]].tolist()) & body_candidates
+        for v in body_candidates
+    }
+
+    # Bron–Kerbosch với:
+    #   clique (R)    = {head}
+    #   candidates(P) = body_candidates
+    #   excluded  (X) = ∅
+    calls = 0
+
+    def expand(
+        clique: Tuple[int, ...],
+        candidates: Set[int],
+        excluded: Set[int]
+    ) -> None:
+        """
+        Invariant:
+            - clique: hiện là 1 clique (luôn chứa head).
+            - candidates: các node có thể thêm vào clique
+                          (tất cả đều kề với mọi node trong clique).
+            - excluded: các node đã được xem xét với gốc clique này.
+        """
+        nonlocal calls
+        calls += 1
+        # Nếu không còn candidates và excluded:
+        #    -> clique là maximal (không thể mở rộng thêm)
+        if not candidates and not excluded:
+            if len(clique) >= 2:  # chỉ giữ các clique có size >= 2
+                out.append(tuple(sorted(clique)))
+            return
+
+        # Duyệt từng candidate v trong bản copy để không phá vòng lặp
+        for v in list(candidates):
+            # new_clique = clique ∪ {v}
+            new_clique = clique + (v,)
+
+            # Các candidate mới: neighbors của v trong candidates
+            new_candidates = _neighbors_in_set(v, candidates, adj)
+
+            # Các excluded mới: neighbors của v trong excluded
+            new_excluded = _neighbors_in_set(v, excluded, adj)
+
+            # Đệ quy mở rộng
+            expand(new_clique, new_candidates, new_excluded)
+
+            # Di chuyển v từ candidates sang excluded (như Bron–Kerbosch gốc)
+            candidates.remove(v)
+            excluded.add(v)
+
+    # Gọi expand khởi đầu với clique = {head}
+    expand((head,), body_candidates, set())
+    return calls
+
+
+# ---------------- Pivot engine (Tomita pivot + degeneracy order) ----------
+
+
+def _head_cliques_pivot(
+    head: int,
+    indptr: np.ndarray,
+    indices: np.ndarray,
+    split: np.ndarray,
+    out: List[Tuple[int, ...]],
+) -> int:
+    """
+    Cùng kết quả với _head_cliques nhưng:
+        - đỉnh của BNs(head) được đánh local id 0..k-1 (giữ thứ tự instance),
+          P/X/Ns là bitset (Python int) trên local id;
+        - mức ngoài cùng duyệt theo degeneracy order (Eppstein–Löffler–Strash),
+          các mức trong dùng pivot kiểu Tomita.
+    Mỗi maximal clique của {head} ∪ BNs(head) chứa head được sinh đúng 1 lần.
+    Trả về số lần gọi đệ quy.
+    """
+    local = indices[split[head]:indptr[head + 1]]
+    k = len(local)
+    if k == 0:
+        return 0
+
+    # adj[i]: bitset các local id kề với local id i
+    adj: List[int] = []
+    for v in local.tolist():
+        row = indices[indptr[v]:indptr[v + 1]]
+        pos = np.searchsorted(local, row)
+        hit = pos < k
+        hit[hit] = local[pos[hit]] == row[hit]
+        adj.append(_to_bitset(pos[hit], k))
+
+    ids = local.tolist()
+
+    def report(r: List[int]) -> None:
+        out.append((head,) + tuple(ids[i] for i in sorted(r)))
+
+    calls = 0
+
+    def expand(r: List[int], p: int, x: int) -> None:
+        nonlocal calls
+        calls += 1
+        if not p:
+            if not x:
+                report(r)
+            return
+        # pivot u ∈ P ∪ X có nhiều láng giềng trong P nhất
+        u = max(_iter_bits(p | x), key=lambda w: _popcount(p & adj[w]))
+        for v in _iter_bits(p & ~adj[u]):
+            bit = 1 << v
+            r.append(v)
+            expand(r, p & adj[v], x & adj[v])
+            r.pop()
+            p &= ~bit
+            x |= bit
+
+    # degeneracy order: lần lượt bỏ đỉnh có bậc nhỏ nhất trong phần còn lại
+    remaining = (1 << k) - 1
+    order: List[int] = []
+    while remaining:
+        v = min(_iter_bits(remaining), key=lambda w: _popcount(adj[w] & remaining))
+        order.append(v)
+        remaining &= ~(1 << v)
+
+    later = (1 << k) - 1
+    earlier = 0
+    for v in order:
+        bit = 1 << v
+        later &= ~bit
+        expand([v], adj[v] & later, adj[v] & earlier)
+        earlier |= bit
+    return calls
+
+
+_ENGINES = {
+    "bk": _head_cliques,
+    "pivot": _head_cliques_pivot,
+}
+
+
+# ---------------- Parallel mode (process pool, shared CSR) ----------------
+
+# CSR của worker, attach một lần trong initializer (không pickle theo task)
+_WORKER_CSR: Optional[Dict[str, np.ndarray]] = None
+_WORKER_HANDLES: list = []
+_WORKER_ENGINE = _head_cliques
+
+# mỗi đoạn head có tổng |BNs| khoảng chừng này, để kết quả của một đoạn nhỏ
+_RANGE_WEIGHT = 1 << 16
+# số đoạn đang chạy / chờ lấy kết quả tối đa trên mỗi worker
+_INFLIGHT_PER_WORKER = 2
+
+
+def _init_worker(spec: ArraySpec, engine: str) -> None:
+    global _WORKER_CSR, _WORKER_HANDLES, _WORKER_ENGINE
+    _WORKER_HANDLES, _WORKER_CSR = attach_arrays(spec)
+    _WORKER_ENGINE = _ENGINES[engine]
+
+
+def _mine_head_range(bounds: Tuple[int, int]) -> Tuple[List[Tuple[int, ...]], int]:
+    csr = _WORKER_CSR
+    out: List[Tuple[int, ...]] = []
+    calls = 0
+    for head in range(*bounds):
+        calls += _WORKER_ENGINE(head, csr["indptr"], csr["indices"], csr["split"], out)
+    return out, calls
+
+
+def _iter_parallel(
+    nbs: NeighborhoodList,
+    workers: int,
+    engine: str,
+    stats: Optional[PipelineStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    """
+    Chia head thành các đoạn liên tiếp có tổng |BNs(head)| xấp xỉ nhau,
+    chạy trên process pool; lấy kết quả theo thứ tự đoạn nên giống hệt
+    chế độ tuần tự.
+
+    Chỉ có tối đa workers * _INFLIGHT_PER_WORKER đoạn đã gửi mà chưa được
+    tiêu thụ: đoạn mới chỉ được gửi khi process cha lấy xong một đoạn, nên
+    clique không dồn lại ở process cha khi consumer (vd. stream=True) chậm
+    hơn worker – bộ nhớ theo kích thước đoạn, không theo tổng số clique.
+    """
+    weights = (nbs.indptr[1:] - nbs.split) + 1
+    n_ranges = max(workers * 8, int(weights.sum()) // _RANGE_WEIGHT)
+    ranges = iter(weighted_ranges(weights, n_ranges))
+
+    handles, spec = share_arrays(
+        {"indptr": nbs.indptr, "indices": nbs.indices, "split": nbs.split}
+    )
+    try:
+        with mp.get_context().Pool(workers, initializer=_init_worker, initargs=(spec, engine)) as pool:
+            pending = deque(pool.apply_async(_mine_head_range, (r,))
+                            for r in islice(ranges, workers * _INFLIGHT_PER_WORKER))
+            while pending:
+                part, calls = pending.popleft().get()
+                nxt = next(ranges, None)
+                if nxt is not None:
+                    pending.append(pool.apply_async(_mine_head_range, (nxt,)))
+                if stats is not None:
+                    stats.add("bk_calls", calls)
+                yield from part
+                del part
+    finally:
+        release_arrays(handles)
+
+
+def _iter_sequential(
+    nbs: NeighborhoodList,
+    engine: str,
+    stats: Optional[PipelineStats] = None,
+) -> Iterator[Tuple[int, ...]]:
+    head_cliques = _ENGINES[engine]
+    out: List[Tuple[int, ...]] = []
+    # Duyệt head (instance id) theo thứ tự tăng (như Algorithm 1)
+    for head in range(len(nbs)):
+        calls = head_cliques(head, nbs.indptr, nbs.indices, nbs.split, out)
+        if stats is not None:
+            stats.add("bk_calls", calls)
+        yield from out
+        out.clear()
+
+
+def iter_cliques_nds(
+    dataset: Dataset,
+    nbs: NeighborhoodList,
+    workers: int = 1,
+    engine: str = "bk",  # "bk" hoặc "pivot"
+    stats: Optional[PipelineStats] = None,
+) -> Iterator[Tuple[Instance, ...]]:
+    """
+    Bản generator của mine_cliques_nds: sinh từng clique ngay khi tìm được,
+    chỉ giữ trong bộ nhớ các clique của head đang xét.
+
+    stats: nếu có, cộng số lần gọi đệ quy Bron–Kerbosch vào counter "bk_calls".
+    """
+    if engine not in _ENGINES:
+        raise ValueError(f"Unknown NDS engine: {engine!r}")
+
+    if workers > 1 and len(nbs) > 0:
+        stream = _iter_parallel(nbs, workers, engine, stats)
+    else:
+        stream = _iter_sequential(nbs, engine, stats)
+
+    if engine == "pivot":
+        # head khác nhau -> instance nhỏ nhất khác nhau, nên không có clique trùng
+        for c in stream:
+            yield nbs.to_clique(c)
+        return
+
+    # Loại trùng cho chắc (trong trường hợp __lt__ / sort có behavior lạ).
+    # Clique trùng chỉ có thể cùng head (phần tử nhỏ nhất), nên chỉ cần nhớ
+    # các clique của head hiện tại.
+    seen: Set[Tuple[int, ...]] = set()
+    head = None
+
+    for c in stream:
+        key = tuple(sorted(c))
+        if key[0] != head:
+            head = key[0]
+            seen.clear()
+        if key not in seen:
+            seen.add(key)
+            yield nbs.to_clique(key)
 
 
 def mine_cliques_nds(
-    dataset: SpatialDataset,
-    nbs: NeighborhoodList
+    dataset: Dataset,
+    nbs: NeighborhoodList,
+    workers: int = 1,
+    engine: str = "bk",  # "bk" hoặc "pivot"
 ) -> List[Tuple[Instance, ...]]:
     """
     NDS – khai phá N-cliques (maximal cliques) dựa trên head H_s.
@@ -33,71 +323,16 @@ def mine_cliques_nds(
             + Mỗi clique sẽ chỉ được sinh đúng 1 lần, với head
               là instance nhỏ nhất trong clique.
 
+    workers > 1: các head độc lập nên được chia cho process pool
+    (CSR đặt trong shared memory), kết quả gộp theo thứ tự head.
+
+    engine="pivot": Bron–Kerbosch có pivot (Tomita) + degeneracy order trên
+    bitset local id của BNs(head); cùng tập clique với "bk" và không cần
+    bước loại trùng.
+
     Trả về:
         - Danh sách các clique, mỗi clique là tuple Instance (đã sort).
+          Với ColumnarDataset, mỗi clique là tuple instance id (int).
         - Chỉ giữ clique có size >= 2.
     """
-
-    all_cliques: List[Tuple[Instance, ...]] = []
-
-    # Duyệt head theo thứ tự tăng (phù hợp với thứ tự bạn dùng trong Algorithm 1)
-    for head in sorted(dataset.instances):
-
-        # Body candidates: các "big neighbors" của head
-        body_candidates: Set[Instance] = set(nbs.bns(head))
-
-        # Bron–Kerbosch với:
-        #   clique (R)    = {head}
-        #   candidates(P) = body_candidates
-        #   excluded  (X) = ∅
-        def expand(
-            clique: Tuple[Instance, ...],
-            candidates: Set[Instance],
-            excluded: Set[Instance]
-        ) -> None:
-            """
-            Invariant:
-                - clique: hiện là 1 clique (luôn chứa head).
-                - candidates: các node có thể thêm vào clique
-                              (tất cả đều kề với mọi node trong clique).
-                - excluded: các node đã được xem xét với gốc clique này.
-            """
-            # Nếu không còn candidates và excluded:
-            #    -> clique là maximal (không thể mở rộng thêm)
-            if not candidates and not excluded:
-                if len(clique) >= 2:  # chỉ giữ các clique có size >= 2
-                    all_cliques.append(tuple(sorted(clique)))
-                return
-
-            # Duyệt từng candidate v trong bản copy để không phá vòng lặp
-            for v in list(candidates):
-                # new_clique = clique ∪ {v}
-                new_clique = clique + (v,)
-
-                # Các candidate mới: neighbors của v trong candidates
-                new_candidates = _neighbors_in_set(v, candidates, nbs)
-
-                # Các excluded mới: neighbors của v trong excluded
-                new_excluded = _neighbors_in_set(v, excluded, nbs)
-
-                # Đệ quy mở rộng
-                expand(new_clique, new_candidates, new_excluded)
-
-                # Di chuyển v từ candidates sang excluded (như Bron–Kerbosch gốc)
-                candidates.remove(v)
-                excluded.add(v)
-
-        # Gọi expand khởi đầu với clique = {head}
-        expand((head,), body_candidates, set())
-
-    # Loại trùng cho chắc (trong trường hợp __lt__ / sort có behavior lạ)
-    unique: List[Tuple[Instance, ...]] = []
-    seen: Set[Tuple[Instance, ...]] = set()
-
-    for c in all_cliques:
-        key = tuple(sorted(c))
-        if key not in seen:
-            seen.add(key)
-            unique.append(key)
-
-    return unique
+    return list(iter_cliques_nds(dataset, nbs, workers=workers, engine=engine))
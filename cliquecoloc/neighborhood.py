@@ -1,112 +1,732 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, List, Tuple, Set
-import math
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Set
+from multiprocessing import shared_memory
+import multiprocessing as mp
 
-from .data import Instance, SpatialDataset
+import numpy as np
+
+from .data import ColumnarDataset, Dataset, Instance
+from .parallel import ArraySpec, attach_arrays, release_arrays, share_arrays, weighted_ranges
+
+try:  # scipy là tuỳ chọn: không có thì dùng grid engine
+    from scipy.spatial import cKDTree
+except ImportError:  # pragma: no cover
+    cKDTree = None
 
 
 @dataclass
 class NeighborhoodEntry:
-    instance: Instance
+    instance: Instance  # hoặc instance id (int) với ColumnarDataset
     ns: Set[Instance] = field(default_factory=set)   # Ns(s)
     sns: Set[Instance] = field(default_factory=set)  # SNs(s)
     bns: Set[Instance] = field(default_factory=set)  # BNs(s)
 
 
 class NeighborhoodList:
-    def __init__(self, dataset: SpatialDataset) -> None:
+    """
+    Ns/SNs/BNs của mọi instance, lưu dạng CSR trên instance id.
+
+    - indptr, indices: Ns(s) = indices[indptr[s]:indptr[s+1]], sort tăng dần.
+    - split[s]: vị trí bắt đầu BNs(s) trong hàng của s. Vì SNs(s) < s < BNs(s)
+      nên SNs(s) = indices[indptr[s]:split[s]], BNs(s) = indices[split[s]:indptr[s+1]].
+
+    ns/sns/bns trả về view (np.ndarray id) – không copy.
+    Instance id = vị trí trong thứ tự (feature, idx), tức vị trí trong
+    dataset.instances với SpatialDataset.
+    """
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        indptr: np.ndarray | None = None,
+        indices: np.ndarray | None = None,
+        split: np.ndarray | None = None,
+    ) -> None:
         self.dataset = dataset
-        self.entries: Dict[Instance, NeighborhoodEntry] = {
-            s: NeighborhoodEntry(s) for s in dataset.instances
-        }
+        self.columns: ColumnarDataset = (
+            dataset if isinstance(dataset, ColumnarDataset) else dataset.to_columnar()
+        )
+        n = len(self.columns)
+        self.indptr = np.zeros(n + 1, dtype=np.int64) if indptr is None else indptr
+        self.indices = np.zeros(0, dtype=np.int32) if indices is None else indices
+        self.split = self.indptr[:-1].copy() if split is None else split
+        self._id_of: Dict[Instance, int] | None = None
+
+    def __len__(self) -> int:
+        return len(self.columns)
 
-    def get_entry(self, s: Instance) -> NeighborhoodEntry:
-        return self.entries[s]
+    def _id(self, s) -> int:
+        if isinstance(s, Instance):
+            if self._id_of is None:
+                self._id_of = {inst: i for i, inst in enumerate(self.dataset.instances)}
+            return self._id_of[s]
+        return int(s)
 
-    def ns(self, s: Instance) -> Set[Instance]:
-        return self.entries[s].ns
+    def ns(self, s) -> np.ndarray:
+        i = self._id(s)
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
 
-    def sns(self, s: Instance) -> Set[Instance]:
-        return self.entries[s].sns
+    def sns(self, s) -> np.ndarray:
+        i = self._id(s)
+        return self.indices[self.indptr[i]:self.split[i]]
 
-    def bns(self, s: Instance) -> Set[Instance]:
-        return self.entries[s].bns
+    def bns(self, s) -> np.ndarray:
+        i = self._id(s)
+        return self.indices[self.split[i]:self.indptr[i + 1]]
+
+    def get_entry(self, s) -> NeighborhoodEntry:
+        """
+        Dựng NeighborhoodEntry (dạng set) cho s – chỉ khi người dùng cần.
+        """
+        i = self._id(s)
+        entry = NeighborhoodEntry(self.to_instance(i))
+        entry.sns = {self.to_instance(j) for j in self.sns(i).tolist()}
+        entry.bns = {self.to_instance(j) for j in self.bns(i).tolist()}
+        entry.ns = entry.sns | entry.bns
+        return entry
 
     @property
     def instances(self) -> List[Instance]:
+        if isinstance(self.dataset, ColumnarDataset):
+            return list(range(len(self.dataset)))
         return list(self.dataset.instances)
 
+    @property
+    def feature_codes(self) -> np.ndarray:
+        return self.columns.feature
+
+    def feature_of(self, s) -> str:
+        if isinstance(self.dataset, ColumnarDataset):
+            return self.dataset.feature_of(s)
+        return s.feature
+
+    def to_instance(self, i: int):
+        """
+        id -> phần tử output: Instance (SpatialDataset) hoặc chính id (ColumnarDataset).
+        """
+        if isinstance(self.dataset, ColumnarDataset):
+            return i
+        return self.dataset.instances[i]
+
+    def to_clique(self, ids: Iterable[int]) -> tuple:
+        if isinstance(self.dataset, ColumnarDataset):
+            return tuple(ids)
+        inst = self.dataset.instances
+        return tuple(inst[i] for i in ids)
 
-def _divide_space(instances: List[Instance], min_dist: float):
+    @property
+    def num_pairs(self) -> int:
+        return len(self.indices) // 2
+
+
+def _grid_cells(x: np.ndarray, y: np.ndarray, min_dist: float):
+    """
+    Sort instance theo cell (gx, gy) của grid min_dist x min_dist.
+
+    Trả về (order, cell_x, cell_y, starts, min_x, min_y): instance id xếp
+    theo cell, toạ độ từng cell (theo thứ tự (gx, gy)) và starts[c] ..
+    starts[c+1] là khoảng của cell c trong order.
+    """
+    min_x = float(x.min())
+    min_y = float(y.min())
+    gx = np.floor((x - min_x) / min_dist).astype(np.int64)
+    gy = np.floor((y - min_y) / min_dist).astype(np.int64)
+
+    # sort ổn định theo cell, rồi cắt thành từng nhóm
+    order = np.lexsort((gy, gx))
+    gx_s, gy_s = gx[order], gy[order]
+    starts = np.flatnonzero(np.r_[True, (gx_s[1:] != gx_s[:-1]) | (gy_s[1:] != gy_s[:-1])])
+    starts = np.r_[starts, len(order)]
+    return order.astype(np.int32), gx_s[starts[:-1]], gy_s[starts[:-1]], starts, min_x, min_y
+
+
+def _divide_space(x: np.ndarray, y: np.ndarray, min_dist: float):
     """
     DivideSpace(min_dist, S) – chia theo grid min_dist x min_dist.
+
+    Trả về dict cell -> mảng instance id (tăng dần), cùng min_x, min_y.
     """
-    if not instances:
+    if len(x) == 0:
         return {}, 0.0, 0.0
 
-    min_x = min(s.x for s in instances)
-    min_y = min(s.y for s in instances)
-
-    grids: Dict[Tuple[int, int], List[Instance]] = {}
-    for s in instances:
-        gx = int(math.floor((s.x - min_x) / min_dist))
-        gy = int(math.floor((s.y - min_y) / min_dist))
-        grids.setdefault((gx, gy), []).append(s)
+    order, cell_x, cell_y, starts, min_x, min_y = _grid_cells(x, y, min_dist)
+    grids: Dict[Tuple[int, int], np.ndarray] = {}
+    for gx, gy, a, b in zip(cell_x.tolist(), cell_y.tolist(), starts[:-1].tolist(), starts[1:].tolist()):
+        grids[(gx, gy)] = order[a:b]
     return grids, min_x, min_y
 
 
-def _neighbor_grid_coords(cell: Tuple[int, int]) -> List[Tuple[int, int]]:
-    gx, gy = cell
-    coords = []
-    for dx in (-1, 0, 1):
-        for dy in (-1, 0, 1):
-            coords.append((gx + dx, gy + dy))
-    return coords
+# nửa trên của 3x3: mỗi cặp cell chỉ xét một lần
+_HALF_NEIGHBOR_OFFSETS = ((1, -1), (1, 0), (1, 1), (0, 1))
+
+
+# engine="adaptive": cell nhiều hơn số điểm này được chia k-d thành các lá
+DEFAULT_LEAF_SIZE = 256
+
+# một nhóm điểm của cell: danh sách lá (mảng id) và box (k, 4) = xmin, xmax, ymin, ymax
+Leaves = Tuple[List[np.ndarray], np.ndarray]
+
+
+def _kd_leaves(ids: np.ndarray, x: np.ndarray, y: np.ndarray, leaf_size: int) -> Leaves:
+    """
+    Chia đôi theo median của trục dài hơn tới khi mỗi lá <= leaf_size điểm.
+    """
+    parts: List[np.ndarray] = []
+    stack = [ids]
+    while stack:
+        a = stack.pop()
+        ax, ay = x[a], y[a]
+        if len(a) <= leaf_size:
+            parts.append(a)
+            continue
+        coord = ax if np.ptp(ax) >= np.ptp(ay) else ay
+        half = len(a) // 2
+        part = np.argpartition(coord, half)
+        stack.append(a[part[half:]])
+        stack.append(a[part[:half]])
+    box = np.array([(x[a].min(), x[a].max(), y[a].min(), y[a].max()) for a in parts])
+    return parts, box
+
+
+def _leaf_pairs(
+    x: np.ndarray,
+    y: np.ndarray,
+    d2: float,
+    la: Leaves,
+    lb: Leaves,
+    same: bool,
+    out_i: List[np.ndarray],
+    out_j: List[np.ndarray],
+) -> None:
+    """
+    Cặp láng giềng giữa hai nhóm lá (same=True: cùng một cell, mỗi cặp lá
+    một lần). Với mỗi lá A, các lá B được phân loại theo box:
+    - khoảng cách nhỏ nhất > min_dist: bỏ qua;
+    - khoảng cách lớn nhất <= min_dist: mọi cặp đều là láng giềng, không tính;
+    - còn lại: tính block dx*dx + dy*dy <= d2 như grid engine.
+    Phép trừ/nhân/cộng float đơn điệu nên box cho đúng cùng kết quả với
+    từng cặp điểm.
+    """
+    parts_a, box_a = la
+    parts_b, box_b = lb
+    for k, a in enumerate(parts_a):
+        ba = box_a[k]
+        gap_x = np.maximum(0.0, np.maximum(box_b[:, 0] - ba[1], ba[0] - box_b[:, 1]))
+        gap_y = np.maximum(0.0, np.maximum(box_b[:, 2] - ba[3], ba[2] - box_b[:, 3]))
+        span_x = np.maximum(box_b[:, 1] - ba[0], ba[1] - box_b[:, 0])
+        span_y = np.maximum(box_b[:, 3] - ba[2], ba[3] - box_b[:, 2])
+        near = gap_x * gap_x + gap_y * gap_y <= d2
+        full = span_x * span_x + span_y * span_y <= d2
+
+        if same:
+            # lá k với chính nó: tam giác trên; lá < k đã xét ở vòng trước
+            if len(a) > 1:
+                ax, ay = x[a], y[a]
+                dx = ax[:, None] - ax[None, :]
+                dy = ay[:, None] - ay[None, :]
+                ii, jj = np.nonzero(np.triu(dx * dx + dy * dy <= d2, k=1))
+                out_i.append(a[ii])
+                out_j.append(a[jj])
+            near[:k + 1] = False
+
+        hit = np.flatnonzero(near & full)
+        if len(hit):
+            b = np.concatenate([parts_b[t] for t in hit])
+            out_i.append(np.repeat(a, len(b)))
+            out_j.append(np.tile(b, len(a)))
+
+        hit = np.flatnonzero(near & ~full)
+        if len(hit):
+            b = np.concatenate([parts_b[t] for t in hit])
+            dx = x[a][:, None] - x[b][None, :]
+            dy = y[a][:, None] - y[b][None, :]
+            ii, jj = np.nonzero(dx * dx + dy * dy <= d2)
+            out_i.append(a[ii])
+            out_j.append(b[jj])
+
+
+def _cell_pairs(
+    x: np.ndarray,
+    y: np.ndarray,
+    d2: float,
+    grids: Dict[Tuple[int, int], np.ndarray],
+    cells: Iterable[Tuple[int, int]],
+    leaf_size: Optional[int] = None,
+) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+    """
+    Cặp láng giềng có phần tử đầu thuộc các cell cho trước: block NumPy
+    giữa cell và các cell kề (nửa trên 3x3, cell chính xét tam giác trên).
+
+    leaf_size: nếu có, cặp cell mà một trong hai cell có > leaf_size điểm
+    được xét theo lá k-d (_leaf_pairs) thay vì một block n x n – bộ nhớ
+    chỉ còn cỡ leaf_size x (điểm trong vùng lân cận) và cặp lá chắc chắn
+    nằm trong min_dist không phải tính khoảng cách.
+    """
+    out_i: List[np.ndarray] = []
+    out_j: List[np.ndarray] = []
+    leaves: Dict[Tuple[int, int], Leaves] = {}
+
+    def leaves_of(cell: Tuple[int, int]) -> Leaves:
+        lv = leaves.get(cell)
+        if lv is None:
+            lv = leaves[cell] = _kd_leaves(grids[cell], x, y, leaf_size)
+        return lv
+
+    def dense(ids: np.ndarray) -> bool:
+        return leaf_size is not None and len(ids) > leaf_size
+
+    for gx, gy in cells:
+        a = grids[(gx, gy)]
+        ax, ay = x[a], y[a]
+
+        # cặp trong cùng cell
+        if dense(a):
+            la = leaves_of((gx, gy))
+            _leaf_pairs(x, y, d2, la, la, True, out_i, out_j)
+        elif len(a) > 1:
+            dx = ax[:, None] - ax[None, :]
+            dy = ay[:, None] - ay[None, :]
+            hit = np.triu(dx * dx + dy * dy <= d2, k=1)
+            ii, jj = np.nonzero(hit)
+            out_i.append(a[ii])
+            out_j.append(a[jj])
+
+        # cặp với các cell kề (mỗi cặp cell một lần)
+        for ox, oy in _HALF_NEIGHBOR_OFFSETS:
+            b = grids.get((gx + ox, gy + oy))
+            if b is None:
+                continue
+            if dense(a) or dense(b):
+                _leaf_pairs(x, y, d2, leaves_of((gx, gy)), leaves_of((gx + ox, gy + oy)),
+                            False, out_i, out_j)
+                continue
+            dx = ax[:, None] - x[b][None, :]
+            dy = ay[:, None] - y[b][None, :]
+            ii, jj = np.nonzero(dx * dx + dy * dy <= d2)
+            out_i.append(a[ii])
+            out_j.append(b[jj])
 
+    return out_i, out_j
 
-def _is_neighbor(a: Instance, b: Instance, min_dist: float) -> bool:
-    dx = a.x - b.x
-    dy = a.y - b.y
-    return dx * dx + dy * dy <= min_dist * min_dist
 
+def _concat_pairs(out_i: List[np.ndarray], out_j: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    if not out_i:
+        empty = np.zeros(0, dtype=np.int32)
+        return empty, empty
+    return np.concatenate(out_i), np.concatenate(out_j)
 
-def materialize_neighborhoods(dataset: SpatialDataset, min_dist: float) -> NeighborhoodList:
+
+def _pairs_grid(
+    x: np.ndarray,
+    y: np.ndarray,
+    min_dist: float,
+    leaf_size: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tất cả cặp láng giềng (i, j) theo grid, tính khoảng cách theo block NumPy
+    giữa một cell và các cell kề. leaf_size: chia k-d cell quá dày (engine="adaptive").
+    """
+    grids, _, _ = _divide_space(x, y, min_dist)
+    return _concat_pairs(*_cell_pairs(x, y, min_dist * min_dist, grids, grids, leaf_size))
+
+
+def _pairs_kdtree(x: np.ndarray, y: np.ndarray, min_dist: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cặp láng giềng bằng cKDTree.query_pairs. Lấy dư một chút rồi lọc lại bằng
+    đúng công thức dx*dx + dy*dy <= min_dist^2 để khớp grid engine.
+    """
+    tree = cKDTree(np.column_stack((x, y)))
+    pairs = tree.query_pairs(min_dist * (1.0 + 1e-9), output_type="ndarray")
+    i, j = pairs[:, 0], pairs[:, 1]
+    dx = x[i] - x[j]
+    dy = y[i] - y[j]
+    keep = dx * dx + dy * dy <= min_dist * min_dist
+    return i[keep], j[keep]
+
+
+def _build_csr(n: int, i: np.ndarray, j: np.ndarray):
+    """
+    Cặp vô hướng (i, j) -> CSR của Ns, mỗi hàng sort tăng dần, cùng mảng split.
+    """
+    lo = np.minimum(i, j).astype(np.int32)
+    hi = np.maximum(i, j).astype(np.int32)
+
+    src = np.concatenate((lo, hi))
+    dst = np.concatenate((hi, lo))
+    order = np.lexsort((dst, src))
+    indices = dst[order]
+
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    # số SNs của s = số cặp mà s là phần tử lớn hơn
+    split = indptr[:-1] + np.bincount(hi, minlength=n)
+    return indptr, indices, split
+
+
+def _resolve_engine(engine: str) -> str:
+    engine = engine.lower()
+    if engine == "auto":
+        engine = "kdtree" if cKDTree is not None else "grid"
+    return engine
+
+
+def _find_pairs(cols: ColumnarDataset, min_dist: float, engine: str) -> Tuple[np.ndarray, np.ndarray]:
+    engine = _resolve_engine(engine)
+    if engine == "kdtree":
+        if cKDTree is None:
+            raise ImportError("engine='kdtree' cần scipy")
+        return _pairs_kdtree(cols.x, cols.y, min_dist)
+    if engine == "grid":
+        return _pairs_grid(cols.x, cols.y, min_dist)
+    if engine == "adaptive":
+        return _pairs_grid(cols.x, cols.y, min_dist, leaf_size=DEFAULT_LEAF_SIZE)
+    raise ValueError(f"Unknown neighborhood engine: {engine!r}")
+
+
+# ---------------- Parallel mode (process pool, shared memory) ----------------
+
+# grid của worker, attach một lần trong initializer: (x, y, d2, grids, cells, leaf_size)
+_WORKER_GRID: Optional[tuple] = None
+_WORKER_HANDLES: list = []
+
+
+def _init_pairs_worker(spec: ArraySpec, min_dist: float, leaf_size: Optional[int]) -> None:
+    global _WORKER_GRID, _WORKER_HANDLES
+    _WORKER_HANDLES, arrs = attach_arrays(spec)
+    order, starts = arrs["order"], arrs["cell_start"]
+    grids = {
+        (gx, gy): order[a:b]
+        for gx, gy, a, b in zip(arrs["cell_x"].tolist(), arrs["cell_y"].tolist(),
+                                starts[:-1].tolist(), starts[1:].tolist())
+    }
+    _WORKER_GRID = (arrs["x"], arrs["y"], min_dist * min_dist, grids, list(grids), leaf_size)
+
+
+def _pairs_shard(bounds: Tuple[int, int]) -> Tuple[str, int]:
+    """
+    Cặp láng giềng của các cell [bounds) – ghi vào một block shared memory
+    mới (2 x k int32: hàng i, hàng j); chỉ trả về tên block và k.
+    """
+    x, y, d2, grids, cells, leaf_size = _WORKER_GRID
+    i, j = _concat_pairs(*_cell_pairs(x, y, d2, grids, cells[bounds[0]:bounds[1]], leaf_size))
+    k = len(i)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 2 * k * 4))
+    out = np.ndarray((2, k), dtype=np.int32, buffer=shm.buf)
+    out[0] = i
+    out[1] = j
+    del out
+    name = shm.name
+    shm.close()
+    return name, k
+
+
+def _cell_costs(cell_x: np.ndarray, cell_y: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """
+    Số phép so khoảng cách của từng cell: n_c * (n_c + Σ n các cell kề nửa trên).
+    """
+    sizes = np.diff(starts).astype(np.float64)
+    cost = sizes * sizes
+    # cell đã sort theo (gx, gy) nên code = gx * w + gy + 1 tăng dần
+    w = int(cell_y.max()) + 3
+    code = cell_x * w + cell_y + 1
+    for ox, oy in _HALF_NEIGHBOR_OFFSETS:
+        nb = (cell_x + ox) * w + (cell_y + oy + 1)
+        pos = np.minimum(np.searchsorted(code, nb), len(code) - 1)
+        cost += sizes * np.where(code[pos] == nb, sizes[pos], 0.0)
+    return cost
+
+
+def _pairs_parallel(
+    x: np.ndarray,
+    y: np.ndarray,
+    min_dist: float,
+    workers: int,
+    leaf_size: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Như _pairs_grid nhưng chia cell thành các shard liên tiếp có tổng chi
+    phí (_cell_costs) xấp xỉ nhau – cell dày đặc không dồn hết vào một
+    worker. x, y và grid được share một lần; mỗi shard trả cặp qua shared
+    memory, process cha chỉ nhận tên block rồi gộp theo thứ tự shard (cùng
+    thứ tự cặp với _pairs_grid).
+    """
+    order, cell_x, cell_y, starts, _, _ = _grid_cells(x, y, min_dist)
+    ranges = weighted_ranges(_cell_costs(cell_x, cell_y, starts) + 1, workers * 4)
+
+    handles, spec = share_arrays({
+        "x": x, "y": y, "order": order,
+        "cell_x": cell_x, "cell_y": cell_y, "cell_start": starts,
+    })
+    out_i: List[np.ndarray] = []
+    out_j: List[np.ndarray] = []
+    try:
+        ctx = mp.get_context()
+        with ctx.Pool(workers, initializer=_init_pairs_worker, initargs=(spec, min_dist, leaf_size)) as pool:
+            for name, k in pool.imap(_pairs_shard, ranges):
+                shm = shared_memory.SharedMemory(name=name)
+                try:
+                    part = np.ndarray((2, k), dtype=np.int32, buffer=shm.buf)
+                    out_i.append(part[0].copy())
+                    out_j.append(part[1].copy())
+                    del part
+                finally:
+                    shm.close()
+                    shm.unlink()
+    finally:
+        release_arrays(handles)
+    return _concat_pairs(out_i, out_j)
+
+
+@dataclass
+class CellCosts:
+    """
+    Phân bố tải theo cell của grid min_dist x min_dist (Algorithm 1).
+
+    cells: (k, 2) toạ độ grid (gx, gy), gốc tại (min x, min y); points: số điểm mỗi cell;
+    checks: số phép so khoảng cách của grid engine tính từ cell đó
+    (n_c * (n_c + Σ n các cell kề nửa trên)).
+    """
+    min_dist: float
+    cells: np.ndarray
+    points: np.ndarray
+    checks: np.ndarray
+
+    def summary(self) -> Dict[str, float]:
+        """
+        Số cell, max/p50/p90/p99 số điểm mỗi cell và phần phép so dồn vào
+        1% cell nặng nhất – cao nghĩa là nên dùng engine="adaptive".
+        """
+        if len(self.points) == 0:
+            return {"cells": 0}
+        p50, p90, p99 = np.percentile(self.points, [50, 90, 99])
+        total = float(self.checks.sum())
+        top = max(1, len(self.checks) // 100)
+        heavy = float(np.sort(self.checks)[-top:].sum())
+        return {
+            "cells": len(self.points),
+            "points_max": int(self.points.max()),
+            "points_p50": float(p50),
+            "points_p90": float(p90),
+            "points_p99": float(p99),
+            "checks": total,
+            "top1pct_share": heavy / total if total else 0.0,
+        }
+
+    def top(self, k: int = 10) -> List[Tuple[Tuple[int, int], int, float]]:
+        """
+        k cell nặng nhất: ((gx, gy), số điểm, số phép so).
+        """
+        idx = np.argsort(self.checks, kind="stable")[::-1][:k]
+        return [((int(self.cells[t, 0]), int(self.cells[t, 1])), int(self.points[t]), float(self.checks[t]))
+                for t in idx]
+
+
+def cell_costs(dataset: Dataset, min_dist: float) -> CellCosts:
+    """
+    Báo cáo phân bố điểm / phép so theo cell trước khi materialize – không
+    tìm cặp, chỉ dựng grid.
+    """
+    cols = NeighborhoodList(dataset).columns
+    if len(cols) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return CellCosts(min_dist, np.zeros((0, 2), dtype=np.int64), empty, empty.astype(np.float64))
+    _, cell_x, cell_y, starts, _, _ = _grid_cells(cols.x, cols.y, min_dist)
+    cells = np.column_stack([cell_x, cell_y])
+    return CellCosts(min_dist, cells, np.diff(starts), _cell_costs(cell_x, cell_y, starts))
+
+
+def materialize_neighborhoods(
+    dataset: Dataset,
+    min_dist: float,
+    engine: str = "auto",  # "auto", "kdtree", "grid" hoặc "adaptive"
+    workers: int = 1,
+) -> NeighborhoodList:
     """
     Algorithm 1 – Neighborhood materialization (Grid-based).
+
+    Tìm các cặp láng giềng theo batch (block NumPy trên grid, hoặc cKDTree
+    nếu có scipy), rồi dựng Ns/SNs/BNs dạng CSR sort theo thứ tự instance.
+
+    engine="adaptive": grid, nhưng cell có hơn DEFAULT_LEAF_SIZE điểm (dữ
+    liệu có hotspot) được chia k-d thành lá, cặp lá xa hẳn/gần hẳn quyết
+    định theo box (xem _leaf_pairs). Cùng tập cặp với "grid"; xem
+    cell_costs để biết dữ liệu có cell quá dày hay không.
+
+    workers > 1: grid/adaptive engine chạy song song trên process pool, cell
+    chia thành shard cân theo số phép so (xem _pairs_parallel). Cùng kết
+    quả với chế độ tuần tự. "kdtree" (cũng là "auto" khi có scipy) luôn chạy
+    tuần tự: cKDTree một process vẫn nhanh hơn grid song song.
     """
     nbs = NeighborhoodList(dataset)
-    instances = dataset.instances
-
-    grids, _, _ = _divide_space(instances, min_dist)
-
-    for cell, g_instances in grids.items():
-        ncoords = _neighbor_grid_coords(cell)
-        ngrid_instances: List[Instance] = []
-        for nc in ncoords:
-            ngrid_instances.extend(grids.get(nc, []))
-
-        for s in g_instances:
-            entry_s = nbs.get_entry(s)
-            for s_prime in ngrid_instances:
-                if s is s_prime:
-                    continue
-                if not _is_neighbor(s, s_prime, min_dist):
-                    continue
-
-                entry_sp = nbs.get_entry(s_prime)
-
-                if s < s_prime:
-                    # s < s'  ⇒ s' ∈ BNs(s), s ∈ SNs(s')
-                    entry_s.bns.add(s_prime)
-                    entry_s.ns.add(s_prime)
-                    entry_sp.sns.add(s)
-                    entry_sp.ns.add(s)
-                else:
-                    # s > s' ⇒ s ∈ BNs(s'), s' ∈ SNs(s)
-                    entry_sp.bns.add(s)
-                    entry_sp.ns.add(s)
-                    entry_s.sns.add(s_prime)
-                    entry_s.ns.add(s_prime)
+    cols = nbs.columns
+    n = len(cols)
+    if n == 0:
+        return nbs
 
+    engine = _resolve_engine(engine)
+    if workers > 1 and engine in ("grid", "adaptive"):
+        leaf_size = DEFAULT_LEAF_SIZE if engine == "adaptive" else None
+        i, j = _pairs_parallel(cols.x, cols.y, min_dist, workers, leaf_size)
+    else:
+        i, j = _find_pairs(cols, min_dist, engine)
+    nbs.indptr, nbs.indices, nbs.split = _build_csr(n, i, j)
     return nbs
+
+
+@dataclass
+class PairSet:
+    """
+    Mọi cặp láng giềng ở khoảng cách max_dist, kèm bình phương khoảng cách,
+    sort theo d2 tăng dần. Cặp ở min_dist <= max_dist là một tiền tố, nên
+    NeighborhoodList cho từng min_dist chỉ cần cắt mảng rồi dựng CSR.
+    """
+    dataset: Dataset = field(repr=False)
+    max_dist: float
+    i: np.ndarray
+    j: np.ndarray
+    d2: np.ndarray
+
+    @property
+    def dist(self) -> np.ndarray:
+        return np.sqrt(self.d2)
+
+    def count(self, min_dist: float) -> int:
+        """
+        Số cặp có dx*dx + dy*dy <= min_dist^2 (cùng phép so với Algorithm 1).
+        """
+        if min_dist > self.max_dist:
+            raise ValueError(f"min_dist={min_dist} lớn hơn max_dist={self.max_dist}")
+        return int(np.searchsorted(self.d2, min_dist * min_dist, side="right"))
+
+    def neighborhoods(self, min_dist: float) -> NeighborhoodList:
+        """
+        NeighborhoodList ở min_dist – giống materialize_neighborhoods(dataset, min_dist).
+        """
+        k = self.count(min_dist)
+        nbs = NeighborhoodList(self.dataset)
+        nbs.indptr, nbs.indices, nbs.split = _build_csr(len(nbs), self.i[:k], self.j[:k])
+        return nbs
+
+
+def materialize_pairs(
+    dataset: Dataset,
+    max_dist: float,
+    engine: str = "auto",
+) -> PairSet:
+    """
+    Tìm cặp láng giềng một lần ở max_dist (dùng cho sweep nhiều min_dist).
+    """
+    cols = dataset if isinstance(dataset, ColumnarDataset) else dataset.to_columnar()
+    if len(cols) == 0:
+        empty = np.zeros(0, dtype=np.int32)
+        return PairSet(dataset, max_dist, empty, empty, np.zeros(0))
+    i, j = _find_pairs(cols, max_dist, engine)
+    dx = cols.x[i] - cols.x[j]
+    dy = cols.y[i] - cols.y[j]
+    d2 = dx * dx + dy * dy
+    order = np.argsort(d2, kind="stable")
+    return PairSet(dataset, max_dist, i[order], j[order], d2[order])
+
+
+# -------------------- Feature-pair pruning --------------------
+
+
+@dataclass
+class PairPruning:
+    """
+    Kết quả của prune_feature_pairs.
+
+    - pair_pi: PI({f, g}) của mọi cặp feature có ít nhất một cặp láng giềng.
+    - pruned: các cặp có PI < min_prev (cạnh giữa chúng đã bị bỏ).
+    - edges_before / edges_after: số cặp láng giềng.
+    - search_before / search_after: Σ_s |BNs(s)|·(|BNs(s)|-1)/2 – số cặp
+      instance mà miner phải xét trong các subgraph BNs(head).
+    """
+    pair_pi: Dict[FrozenSet[str], float]
+    pruned: List[FrozenSet[str]]
+    edges_before: int
+    edges_after: int
+    search_before: int
+    search_after: int
+
+    @property
+    def reduction(self) -> float:
+        """
+        Tỉ lệ không gian tìm clique bị cắt (theo search_*).
+        """
+        if self.search_before == 0:
+            return 0.0
+        return 1.0 - self.search_after / self.search_before
+
+
+def _search_pairs(indptr: np.ndarray, split: np.ndarray) -> int:
+    k = (indptr[1:] - split).astype(np.int64)
+    return int((k * (k - 1) // 2).sum())
+
+
+def prune_feature_pairs(nbs: NeighborhoodList, min_prev: float) -> Tuple[NeighborhoodList, PairPruning]:
+    """
+    Bỏ các cạnh láng giềng giữa hai feature f != g có PI({f, g}) < min_prev.
+
+    PR(f, {f, g}) = số instance của f có ít nhất một láng giềng thuộc g,
+    chia |f| – tính thẳng từ NeighborhoodList. PI không tăng khi thêm feature
+    (Lemma 10), nên mọi co-location chứa {f, g} đều không prevalent; một
+    row-instance của co-location không chứa cặp bị cắt thì vẫn là clique sau
+    khi bỏ cạnh. Vì vậy kết quả Algorithm 5 giữ nguyên, chỉ ít clique hơn
+    (clique trả về là clique của đồ thị đã cắt). Cạnh cùng feature giữ nguyên.
+
+    Trả về (NeighborhoodList mới, PairPruning); nbs không bị sửa.
+    """
+    cols = nbs.columns
+    n = len(nbs)
+    codes = cols.feature.astype(np.int64)
+    F = max(len(cols.feature_names), 1)
+    counts = np.diff(cols.feature_offsets)
+    search_before = _search_pairs(nbs.indptr, nbs.split)
+
+    rows = np.repeat(np.arange(n, dtype=np.int64), np.diff(nbs.indptr))
+    fr = codes[rows]
+    fc = codes[nbs.indices]
+    cross = fr != fc
+
+    # participant (s, g): s có láng giềng thuộc g -> đếm theo cặp có thứ tự (f, g)
+    part = np.unique(rows[cross] * F + fc[cross])
+    ordered, hits = np.unique(codes[part // F] * F + part % F, return_counts=True)
+    f_of, g_of = ordered // F, ordered % F
+    pr = hits / counts[f_of]
+    # cạnh đối xứng nên (g, f) luôn có trong ordered
+    pi = np.minimum(pr, pr[np.searchsorted(ordered, g_of * F + f_of)])
+    bad = pi < min_prev
+
+    names = cols.feature_names
+    upper = f_of < g_of
+    pair_pi = {
+        frozenset((names[f], names[g])): float(v)
+        for f, g, v in zip(f_of[upper].tolist(), g_of[upper].tolist(), pi[upper].tolist())
+    }
+    pruned = sorted(
+        (frozenset((names[f], names[g])) for f, g in zip(f_of[upper & bad].tolist(), g_of[upper & bad].tolist())),
+        key=sorted,
+    )
+
+    keep = ~cross
+    keep[cross] = ~bad[np.searchsorted(ordered, fr[cross] * F + fc[cross])]
+
+    out = NeighborhoodList(nbs.dataset)
+    kept_rows = rows[keep]
+    out.indices = nbs.indices[keep]
+    out.indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(kept_rows, minlength=n), out=out.indptr[1:])
+    # SNs(s) là phần đầu hàng (id < s), thứ tự trong hàng giữ nguyên
+    out.split = out.indptr[:-1] + np.bincount(kept_rows[out.indices < kept_rows], minlength=n)
+
+    report = PairPruning(
+        pair_pi=pair_pi,
+        pruned=pruned,
+        edges_before=nbs.num_pairs,
+        edges_after=out.num_pairs,
+        search_before=search_before,
+        search_after=_search_pairs(out.indptr, out.split),
+    )
+    return out, report
@@ -0,0 +1,63 @@
+from __future__ import annotations
+from typing import Dict, List, Tuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# spec: tên mảng -> (tên shared memory block, shape, dtype)
+ArraySpec = Dict[str, Tuple[str, Tuple[int, ...], str]]
+
+
+def share_arrays(arrays: Dict[str, np.ndarray]) -> Tuple[List[shared_memory.SharedMemory], ArraySpec]:
+    """
+    Copy các mảng NumPy vào shared memory một lần.
+
+    Trả về (handles, spec): process cha giữ handles và gọi release_arrays
+    khi xong; worker chỉ nhận spec (vài chuỗi) rồi attach_arrays.
+    """
+    handles: List[shared_memory.SharedMemory] = []
+    spec: ArraySpec = {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        handles.append(shm)
+        spec[name] = (shm.name, arr.shape, arr.dtype.str)
+    return handles, spec
+
+
+def attach_arrays(spec: ArraySpec) -> Tuple[List[shared_memory.SharedMemory], Dict[str, np.ndarray]]:
+    """
+    Worker: attach vào các block đã share, trả về view NumPy (không copy).
+    Phải giữ handles còn sống chừng nào còn dùng view.
+    """
+    handles: List[shared_memory.SharedMemory] = []
+    arrays: Dict[str, np.ndarray] = {}
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        handles.append(shm)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+    return handles, arrays
+
+
+def release_arrays(handles: List[shared_memory.SharedMemory]) -> None:
+    for shm in handles:
+        shm.close()
+        shm.unlink()
+
+
+def weighted_ranges(weights: np.ndarray, n_chunks: int) -> List[Tuple[int, int]]:
+    """
+    Chia [0, len(weights)) thành tối đa n_chunks đoạn liên tiếp có tổng
+    weight xấp xỉ bằng nhau. Giữ đoạn liên tiếp để gộp kết quả theo đúng thứ tự.
+    """
+    n = len(weights)
+    if n == 0:
+        return []
+    n_chunks = max(1, min(n_chunks, n))
+    cum = np.cumsum(weights, dtype=np.float64)
+    targets = cum[-1] * np.arange(1, n_chunks) / n_chunks
+    cuts = np.searchsorted(cum, targets, side="right")
+    bounds = np.unique(np.concatenate(([0], cuts, [n])))
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
@@ -1,9 +1,14 @@
 from __future__ import annotations
-from typing import Dict, FrozenSet, List
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from heapq import heapify, heappop, heappush, heapreplace
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+import multiprocessing as mp
 
-from .data import SpatialDataset
+from .data import Dataset
 from .chash import CHash
-from .utils import all_nonempty_subsets, direct_subsets
+from .utils import _popcount, all_nonempty_subsets, direct_subsets
 
 
 # ---------------- Algorithm 6 – Calculate PI value -----------------
@@ -12,73 +17,585 @@ from .utils import all_nonempty_subsets, direct_subsets
 def calculate_pi(cp: FrozenSet[str], chash: CHash, feature_counts: Dict[str, int]) -> float:
     """
     Algorithm 6 + Lemma 10: PI(cp) = min_i |⋃ cp_j[f_i]| / |f_i|.
+
+    chash: CHash hoặc CompactCHash (dùng supersets/union của C-Hash).
     """
-    supersets = [key for key in chash.table.keys() if cp.issubset(key)]
+    supersets = chash.supersets(cp)
     if not supersets:
         return 0.0
 
-    ins_union: Dict[str, set] = {f: set() for f in cp}
-    for key in supersets:
-        bucket = chash.table[key]
-        for f in cp:
-            ins_union[f].update(bucket[f])
-
     prs: Dict[str, float] = {}
     for f in cp:
         denom = feature_counts.get(f, 0)
-        prs[f] = 0.0 if denom == 0 else len(ins_union[f]) / float(denom)
+        prs[f] = 0.0 if denom == 0 else len(chash.union(supersets, f)) / float(denom)
 
     return min(prs.values()) if prs else 0.0
 
 
+class PICache:
+    """
+    Tính PI như calculate_pi nhưng dùng lại participation union giữa các
+    co-location chồng lên nhau.
+
+    Với cp và một direct superset cp ∪ {g} đã có trong cache:
+        ⋃_{K ⊇ cp} K[f] = ⋃_{K ⊇ cp∪{g}} K[f]  ∪  ⋃_{K ⊇ cp, K ⊉ cp∪{g}} K[f]
+    nên chỉ cần hợp thêm bucket của các key còn lại (hiệu bitmask slot
+    của superset index). Cache giữ union theo (pattern, feature), bỏ bớt
+    theo LRU khi vượt max_entries.
+
+    hits: số (pattern, feature) lấy từ cache (nguyên vẹn hoặc làm nền để hợp thêm).
+    misses: số (pattern, feature) phải hợp từ đầu.
+    calls: số lần tính PI (mỗi lần tương đương một calculate_pi).
+    """
+
+    def __init__(
+        self,
+        chash: CHash,
+        feature_counts: Dict[str, int],
+        max_entries: int = 100_000,
+    ) -> None:
+        self.chash = chash
+        self.feature_counts = feature_counts
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+        self._features = sorted(feature_counts)
+        # pattern -> (slot mask, {feature: union})
+        self._cache: "OrderedDict[FrozenSet[str], Tuple[int, Dict[str, object]]]" = OrderedDict()
+        self._entries = 0
+
+    def _lookup(self, cp: FrozenSet[str]):
+        hit = self._cache.get(cp)
+        if hit is not None:
+            self._cache.move_to_end(cp)
+        return hit
+
+    def _store(self, cp: FrozenSet[str], slots: int, unions: Dict[str, object]) -> None:
+        self._cache[cp] = (slots, unions)
+        self._entries += len(unions)
+        while self._entries > self.max_entries and len(self._cache) > 1:
+            _, (_, old) = self._cache.popitem(last=False)
+            self._entries -= len(old)
+
+    def unions(self, cp: FrozenSet[str]) -> Dict[str, object]:
+        """
+        {f: ⋃_{K ⊇ cp} K[f]} cho mọi f ∈ cp.
+        """
+        return self._unions(cp)[1]
+
+    def _unions(self, cp: FrozenSet[str]) -> Tuple[int, Dict[str, object]]:
+        cached = self._lookup(cp)
+        if cached is not None:
+            self.hits += len(cp)
+            return cached
+
+        slots = self.chash.superset_slots(cp)
+
+        # direct superset đã cache, phủ nhiều key nhất
+        parent: Optional[Tuple[int, Dict[str, object]]] = None
+        best = 0
+        if slots:
+            for g in self._features:
+                if g in cp:
+                    continue
+                p = self._lookup(cp | {g})
+                if p is not None and p[0]:
+                    n = _popcount(p[0])
+                    if n > best:
+                        parent, best = p, n
+
+        chash = self.chash
+        if parent is None:
+            keys = chash.keys_at(slots)
+            unions = {f: chash.union(keys, f) for f in cp}
+            self.misses += len(cp)
+        else:
+            keys = chash.keys_at(slots & ~parent[0])
+            unions = {f: chash.union(keys, f, base=parent[1][f]) for f in cp}
+            self.hits += len(cp)
+
+        self._store(cp, slots, unions)
+        return slots, unions
+
+    def pi(self, cp: FrozenSet[str]) -> float:
+        """
+        PI(cp), cùng giá trị với calculate_pi(cp, chash, feature_counts).
+        """
+        self.calls += 1
+        slots, unions = self._unions(cp)
+        if not slots:
+            return 0.0
+
+        prs: Dict[str, float] = {}
+        for f in cp:
+            denom = self.feature_counts.get(f, 0)
+            prs[f] = 0.0 if denom == 0 else len(unions[f]) / float(denom)
+
+        return min(prs.values()) if prs else 0.0
+
+
+# ---------------- Parallel mode (process pool, PI theo level) ----------------
+
+# tính PI cho cả một batch pattern, cùng thứ tự
+BatchPI = Callable[[List[FrozenSet[str]]], List[float]]
+
+# batch nhỏ hơn thế này thì tính ngay ở process cha
+_PARALLEL_MIN_BATCH = 64
+
+# PICache riêng của worker trên bản C-Hash nhận một lần trong initializer
+_WORKER_PI: Optional[PICache] = None
+
+
+def _init_pi_worker(chash: CHash, feature_counts: Dict[str, int]) -> None:
+    global _WORKER_PI
+    _WORKER_PI = PICache(chash, feature_counts)
+
+
+def _pi_chunk(cps: List[FrozenSet[str]]) -> Tuple[List[float], int, int, int]:
+    cache = _WORKER_PI
+    calls, hits, misses = cache.calls, cache.hits, cache.misses
+    pis = [cache.pi(cp) for cp in cps]
+    return pis, cache.calls - calls, cache.hits - hits, cache.misses - misses
+
+
+@contextmanager
+def _pi_pool(chash: CHash, pi_cache: PICache, workers: int) -> Iterator[Optional[BatchPI]]:
+    """
+    workers > 1: process pool, mỗi worker giữ một bản C-Hash chỉ đọc (gửi
+    một lần khi khởi tạo) và PICache riêng. Batch được chia thành các đoạn
+    liên tiếp, imap giữ thứ tự; hits/misses/calls của worker cộng vào
+    pi_cache. workers <= 1: None (tính tuần tự).
+
+    PI và calls giống hệt workers=1, nhưng hits/misses thì không: union
+    chỉ dùng lại được trong cache của cùng một worker (không gửi union giữa
+    các process), nên có nhiều miss hơn khi chạy tuần tự.
+    """
+    if workers <= 1:
+        yield None
+        return
+
+    chash.flush()  # buffer của CompactCHash phải vào table trước khi pickle
+
+    with mp.get_context().Pool(
+        workers, initializer=_init_pi_worker, initargs=(chash, pi_cache.feature_counts)
+    ) as pool:
+        def batch_pi(cps: List[FrozenSet[str]]) -> List[float]:
+            if len(cps) < _PARALLEL_MIN_BATCH:
+                return [pi_cache.pi(cp) for cp in cps]
+            step = -(-len(cps) // (workers * 4))
+            chunks = [cps[a:a + step] for a in range(0, len(cps), step)]
+            out: List[float] = []
+            for pis, calls, hits, misses in pool.imap(_pi_chunk, chunks):
+                out.extend(pis)
+                pi_cache.calls += calls
+                pi_cache.hits += hits
+                pi_cache.misses += misses
+            return out
+
+        yield batch_pi
+
+
 # ---------------- Algorithm 5 – Prevalent co-locations filtering ----
 
 
+@dataclass
+class LevelStats:
+    """
+    Đếm theo từng level (kích thước pattern) của Algorithm 5.
+
+    - evaluated: số candidate đã tính PI.
+    - prevalent: số candidate có PI >= min_prev.
+    - non_prevalent: số candidate bị thay bằng các direct subset.
+    - pruned: số candidate bị bỏ mà không cần xét vì là subset của một
+      pattern prevalent đã tìm thấy.
+    """
+    evaluated: int = 0
+    prevalent: int = 0
+    non_prevalent: int = 0
+    pruned: int = 0
+
+
 def mine_prevalent_patterns(
-    dataset: SpatialDataset,
+    dataset: Dataset,
     chash: CHash,
     min_prev: float,
+    pi_cache: Optional[PICache] = None,
+    level_stats: Optional[Dict[int, LevelStats]] = None,
+    candidates: Optional[Iterable[FrozenSet[str]]] = None,
+    workers: int = 1,
 ) -> Dict[FrozenSet[str], float]:
     """
     Algorithm 5 – Prevalent co-location filtering.
     Trả về map: co-location -> PI.
+
+    pi_cache: PICache dùng để tính PI (tạo mới nếu None); truyền vào để
+    đọc hits/misses sau khi chạy.
+
+    Candidate được chia vào các level theo kích thước; xét level lớn nhất
+    trước, trong mỗi level theo thứ tự vào hàng đợi (giống thứ tự của list
+    được sort ổn định theo len). Direct subset nhỏ hơn đúng 1 phần tử nên chỉ cần
+    append vào level ngay dưới, không phải sort lại.
+
+    level_stats: dict rỗng (tùy chọn) để nhận LevelStats theo kích thước.
+
+    candidates: các co-location khởi đầu (mặc định mọi key của C-Hash); kết
+    quả là các pattern prevalent là subset của chúng. PI vẫn tính trên toàn
+    bộ C-Hash.
+
+    workers > 1: PI của các candidate cùng một level (và của subset các
+    pattern prevalent trong level đó) được tính theo batch trên process
+    pool; Steps 6–15 vẫn chạy tuần tự giữa các level. Cùng kết quả (cả thứ
+    tự và LevelStats) và pi_cache.calls với workers=1; hits/misses khác
+    (xem _pi_pool).
+    """
+    if pi_cache is None:
+        pi_cache = PICache(chash, dataset.feature_counts())
+    with _pi_pool(chash, pi_cache, workers) as batch_pi:
+        return _filter_top_down(chash, min_prev, pi_cache, level_stats, candidates,
+                                maximal=False, batch_pi=batch_pi)
+
+
+def mine_maximal_patterns(
+    dataset: Dataset,
+    chash: CHash,
+    min_prev: float,
+    pi_cache: Optional[PICache] = None,
+    level_stats: Optional[Dict[int, LevelStats]] = None,
+    candidates: Optional[Iterable[FrozenSet[str]]] = None,
+    workers: int = 1,
+) -> "MaximalPatterns":
+    """
+    Algorithm 5 chỉ giữ các co-location prevalent tối đại: khi currCandidate
+    prevalent, không tính PI cho 2^k subset của nó (Steps 6–10) mà chỉ ghi
+    nhận curr; candidate là subset của một pattern đã ghi nhận thì bị bỏ
+    như khi chạy đầy đủ. Số lần tính PI chỉ còn theo số candidate được xét.
+
+    Tham số như mine_prevalent_patterns. Trả về MaximalPatterns: PI của
+    subset được tính khi cần; to_dict() cho đúng kết quả (cả thứ tự) của
+    mine_prevalent_patterns.
+    """
+    if pi_cache is None:
+        pi_cache = PICache(chash, dataset.feature_counts())
+    with _pi_pool(chash, pi_cache, workers) as batch_pi:
+        maximal = _filter_top_down(chash, min_prev, pi_cache, level_stats, candidates,
+                                   maximal=True, batch_pi=batch_pi)
+    return MaximalPatterns(maximal, pi_cache, min_prev)
+
+
+def _filter_top_down(
+    chash: CHash,
+    min_prev: float,
+    pi_cache: PICache,
+    level_stats: Optional[Dict[int, LevelStats]],
+    candidates: Optional[Iterable[FrozenSet[str]]],
+    maximal: bool,
+    batch_pi: Optional[BatchPI] = None,
+) -> Dict[FrozenSet[str], float]:
     """
-    feature_counts = dataset.feature_counts()
+    Vòng lặp top-down của Algorithm 5. maximal=True: không tính PI các
+    subset của pattern prevalent, results chỉ chứa các pattern đó; "đã biết
+    prevalent" = là subset của một pattern đã tìm thấy (tra theo feature).
 
-    candidates: List[FrozenSet[str]] = chash.candidates
-    candidates.sort(key=len, reverse=True)
-    candidate_set = set(candidates)
+    batch_pi: tính trước PI của cả level. Candidate cùng size không là
+    subset của nhau, nên tập candidate được xét trong một level (và tập
+    subset phải tính PI của Steps 6–10) chỉ phụ thuộc các level trên –
+    biết được trước khi duyệt level; vòng lặp sau đó chỉ tra PI đã có.
+    """
+    start = chash.candidates if candidates is None else list(candidates)
+    levels: Dict[int, Deque[FrozenSet[str]]] = {}
+    for cp in start:
+        levels.setdefault(len(cp), deque()).append(cp)
+    # candidate_set: các pattern còn chờ xét; queued: mọi pattern đã từng
+    # vào hàng đợi (pattern không prevalent đã xét thì không cần xét lại)
+    candidate_set: Set[FrozenSet[str]] = set(start)
+    queued: Set[FrozenSet[str]] = set(candidate_set)
     results: Dict[FrozenSet[str], float] = {}
+    # maximal: feature -> các pattern tối đại chứa feature đó
+    by_feature: Dict[str, List[FrozenSet[str]]] = {}
 
-    while candidates:
-        curr = candidates.pop(0)
-        if curr not in candidate_set:
+    def covered(cp: FrozenSet[str]) -> bool:
+        if not maximal:
+            return cp in results
+        if len(cp) < 2:
+            # như all_nonempty_subsets: subset size 1 không được tính theo pattern cha
+            return False
+        owners = min((by_feature.get(f, ()) for f in cp), key=len, default=())
+        return any(cp <= m for m in owners)
+
+    for size in range(max(levels, default=0), 0, -1):
+        queue = levels.pop(size, None)
+        if not queue:
             continue
+        stats = LevelStats()
+        lower = levels.setdefault(size - 1, deque())
+
+        known: Optional[Dict[FrozenSet[str], float]] = None
+        if batch_pi is not None:
+            todo = [cp for cp in queue if cp in candidate_set and not (maximal and covered(cp))]
+            known = dict(zip(todo, batch_pi(todo)))
+            if not maximal:
+                subs: Dict[FrozenSet[str], None] = {}
+                for cp in todo:
+                    if known[cp] >= min_prev:
+                        subs.update((sub, None) for sub in reversed(all_nonempty_subsets(cp))
+                                    if sub not in results)
+                known.update(zip(subs, batch_pi(list(subs))))
 
-        pi = calculate_pi(curr, chash, feature_counts)
+        while queue:
+            curr = queue.popleft()
+            if curr not in candidate_set or (maximal and covered(curr)):
+                # đã bị xoá vì là subset của một pattern prevalent
+                stats.pruned += 1
+                continue
 
-        if pi >= min_prev:
-            # currCandidate là prevalent (Steps 6–10)
-            subsets = all_nonempty_subsets(curr)
-            for sub in subsets:
-                if sub in results:
+            pi = pi_cache.pi(curr) if known is None else known[curr]
+            stats.evaluated += 1
+
+            if pi >= min_prev:
+                # currCandidate là prevalent (Steps 6–10)
+                stats.prevalent += 1
+                if maximal:
+                    results[curr] = pi
+                    for f in curr:
+                        by_feature.setdefault(f, []).append(curr)
+                    candidate_set.discard(curr)
                     continue
-                sub_pi = calculate_pi(sub, chash, feature_counts)
-                results[sub] = sub_pi
 
-            results[curr] = pi
+                subsets = all_nonempty_subsets(curr)
+                # tính từ subset lớn xuống nhỏ để dùng lại union của superset,
+                # nhưng vẫn ghi results theo thứ tự cũ
+                if known is None:
+                    sub_pis = {sub: pi_cache.pi(sub) for sub in reversed(subsets) if sub not in results}
+                else:
+                    sub_pis = {sub: known[sub] for sub in subsets if sub not in results}
+                for sub in subsets:
+                    if sub in sub_pis:
+                        results[sub] = sub_pis[sub]
 
-            for sub in subsets:
-                candidate_set.discard(sub)
-            candidate_set.discard(curr)
-        else:
-            # currCandidate không prevalent (Steps 11–15)
-            dsubs = direct_subsets(curr)
-            candidate_set.discard(curr)
-            for sub in dsubs:
-                if sub not in candidate_set and sub not in results:
-                    candidates.append(sub)
-                    candidate_set.add(sub)
-            candidates.sort(key=len, reverse=True)
+                results[curr] = pi
+
+                for sub in subsets:
+                    candidate_set.discard(sub)
+                candidate_set.discard(curr)
+            else:
+                # currCandidate không prevalent (Steps 11–15)
+                stats.non_prevalent += 1
+                candidate_set.discard(curr)
+                for sub in direct_subsets(curr):
+                    if sub not in queued and not covered(sub):
+                        lower.append(sub)
+                        candidate_set.add(sub)
+                        queued.add(sub)
+
+        if level_stats is not None:
+            level_stats[size] = stats
 
     return results
+
+
+class MaximalPatterns:
+    """
+    Kết quả của mine_maximal_patterns.
+
+    - maximal: co-location prevalent tối đại -> PI, theo thứ tự tìm thấy.
+    - cp in result: cp prevalent, tức |cp| >= 2 và cp là subset của một
+      pattern tối đại (Lemma 10) – không cần tính PI.
+    - result[cp] / pi(cp): PI, tính qua PICache lần đầu được hỏi rồi nhớ lại.
+    - patterns(): mọi pattern prevalent, cùng thứ tự với mine_prevalent_patterns.
+    """
+
+    def __init__(self, maximal: Dict[FrozenSet[str], float], pi_cache: PICache, min_prev: float) -> None:
+        self.maximal = maximal
+        self.pi_cache = pi_cache
+        self.min_prev = min_prev
+        self._pi: Dict[FrozenSet[str], float] = dict(maximal)
+        self._by_feature: Dict[str, List[FrozenSet[str]]] = {}
+        for m in maximal:
+            for f in m:
+                self._by_feature.setdefault(f, []).append(m)
+
+    def __contains__(self, cp: object) -> bool:
+        if not isinstance(cp, frozenset):
+            return False
+        if len(cp) < 2:
+            return cp in self.maximal
+        owners = min((self._by_feature.get(f, ()) for f in cp), key=len, default=())
+        return any(cp <= m for m in owners)
+
+    def pi(self, cp: FrozenSet[str]) -> float:
+        """
+        PI(cp) cho co-location bất kỳ (không cần prevalent), có memo.
+        """
+        v = self._pi.get(cp)
+        if v is None:
+            v = self._pi[cp] = self.pi_cache.pi(cp)
+        return v
+
+    def __getitem__(self, cp: FrozenSet[str]) -> float:
+        if cp not in self:
+            raise KeyError(cp)
+        return self.pi(cp)
+
+    def __iter__(self) -> Iterator[FrozenSet[str]]:
+        return self.patterns()
+
+    def patterns(self) -> Iterator[FrozenSet[str]]:
+        seen: Set[FrozenSet[str]] = set()
+        for m in self.maximal:
+            for sub in all_nonempty_subsets(m):
+                if sub not in seen:
+                    seen.add(sub)
+                    yield sub
+            if m not in seen:
+                seen.add(m)
+                yield m
+
+    def to_dict(self) -> Dict[FrozenSet[str], float]:
+        """
+        Tính PI mọi subset – cùng kết quả với mine_prevalent_patterns.
+        """
+        for m in self.maximal:
+            # subset lớn trước để PICache dùng lại union của superset
+            for sub in reversed(all_nonempty_subsets(m)):
+                self.pi(sub)
+        return {cp: self.pi(cp) for cp in self.patterns()}
+
+
+# ---------------- Top-k prevalent co-locations ----------------
+
+
+def _cooccurring(chash: CHash, cp: FrozenSet[str]) -> Set[str]:
+    """
+    Các feature cùng nằm trong một key với cp (⋃ key ⊇ cp).
+    """
+    keys = chash.keys_at(chash.superset_slots(cp))
+    names_of = getattr(chash, "names_of", None)  # CompactCHash: key là bitmask
+    out: Set[str] = set()
+    for key in keys:
+        out.update(key if names_of is None else names_of(key))
+    return out
+
+
+def mine_top_k_patterns(
+    dataset: Dataset,
+    chash: CHash,
+    k: int,
+    min_size: int = 2,
+    min_prev: float = 0.0,
+    pi_cache: Optional[PICache] = None,
+) -> Dict[FrozenSet[str], float]:
+    """
+    k co-location có PI cao nhất (size >= min_size, PI >= min_prev), không
+    cần chọn min_prev trước. Trả về map pattern -> PI, xếp theo PI giảm dần
+    (hoà thì pattern lớn hơn trước, rồi theo tên feature).
+
+    PI không tăng khi thêm feature (Lemma 10), nên PI(cp ∪ {g}) <=
+    min(PI(cp), PI({g})). Các pattern được mở rộng dần từ từng feature (chỉ
+    thêm feature lớn hơn, trong cùng một key của C-Hash) theo thứ tự cận
+    trên giảm dần; ngưỡng nội bộ θ = PI thứ k tốt nhất đã thấy (ban đầu là
+    min_prev) tăng dần, pattern có PI < θ không được mở rộng và dừng khi
+    cận trên lớn nhất còn lại < θ. Mọi pattern có PI >= θ cuối cùng đều
+    được xét, nên kết quả giống lấy k phần tử đầu của toàn bộ lattice.
+
+    Đi từ dưới lên thay vì top-down như Algorithm 5: cận trên của một
+    pattern đến từ subset của nó, nên chỉ có cách này mới cắt được sớm.
+    C-Hash đầu vào giống mine_prevalent_patterns (CHash hoặc CompactCHash).
+    """
+    if k <= 0:
+        return {}
+    min_size = max(2, min_size)
+    if pi_cache is None:
+        pi_cache = PICache(chash, dataset.feature_counts())
+
+    # PI({f}): cận trên cho mọi pattern chứa f
+    single: Dict[str, float] = {}
+    for key in chash.candidates:
+        for f in key:
+            if f not in single:
+                single[f] = pi_cache.pi(frozenset((f,)))
+
+    # heap theo cận trên (âm để thành max-heap), hoà thì theo tên
+    frontier: List[Tuple[float, Tuple[str, ...]]] = [
+        (-v, (f,)) for f, v in sorted(single.items())
+    ]
+    heapify(frontier)
+    best: List[float] = []  # min-heap k PI tốt nhất -> θ = best[0]
+    found: List[Tuple[FrozenSet[str], float]] = []
+    theta = min_prev
+
+    while frontier:
+        neg_ub, names = heappop(frontier)
+        if -neg_ub < theta:
+            break
+        cp = frozenset(names)
+        pi = single[names[0]] if len(names) == 1 else pi_cache.pi(cp)
+        if pi < theta:
+            continue
+
+        if len(cp) >= min_size:
+            found.append((cp, pi))
+            if len(best) < k:
+                heappush(best, pi)
+            elif pi > best[0]:
+                heapreplace(best, pi)
+            if len(best) == k:
+                theta = max(theta, best[0])
+
+        last = names[-1]
+        for g in sorted(_cooccurring(chash, cp)):
+            if g > last:
+                ub = min(pi, single.get(g, 0.0))
+                if ub >= theta:
+                    heappush(frontier, (-ub, names + (g,)))
+
+    found.sort(key=lambda t: (-t[1], -len(t[0]), sorted(t[0])))
+    return dict(found[:k])
+
+
+# ---------------- Multi-threshold sweep ----------------
+
+
+@dataclass
+class PILattice:
+    """
+    PI của mọi co-location có PI >= floor: các subset (size >= 2) của key
+    trong C-Hash. PI không tăng khi thêm feature (Lemma 10) nên kết quả của
+    Algorithm 5 với bất kỳ min_prev >= floor là đúng các pattern có PI >= min_prev.
+    """
+    pi: Dict[FrozenSet[str], float]
+    floor: float
+
+    def prevalent(self, min_prev: float) -> Dict[FrozenSet[str], float]:
+        """
+        Cùng nội dung với mine_prevalent_patterns(..., min_prev), không tính lại PI.
+        """
+        if min_prev < self.floor:
+            raise ValueError(f"min_prev={min_prev} nhỏ hơn floor={self.floor} của lattice")
+        return {cp: v for cp, v in self.pi.items() if v >= min_prev}
+
+
+def sweep_min_prev(
+    dataset: Dataset,
+    chash: CHash,
+    thresholds: Iterable[float],
+    pi_cache: Optional[PICache] = None,
+    floor: Optional[float] = None,
+) -> Tuple[Dict[float, Dict[FrozenSet[str], float]], PILattice]:
+    """
+    Chạy Algorithm 5 cho nhiều min_prev trong một lượt: chỉ lọc một lần ở
+    ngưỡng thấp nhất (mỗi PI tính đúng một lần qua PICache), rồi mỗi ngưỡng
+    là một phép lọc trên PILattice.
+
+    floor: ngưỡng của lượt lọc (mặc định min(thresholds)); floor=0 cho
+    lattice đầy đủ, trả lời được mọi ngưỡng sau này.
+
+    Trả về ({min_prev: patterns}, lattice).
+    """
+    thresholds = sorted(thresholds)
+    if not thresholds:
+        raise ValueError("thresholds rỗng")
+    if floor is None:
+        floor = thresholds[0]
+    lattice = PILattice(mine_prevalent_patterns(dataset, chash, floor, pi_cache=pi_cache), floor)
+    return {t: lattice.prevalent(t) for t in thresholds}, lattice
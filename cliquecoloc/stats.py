@@ -0,0 +1,163 @@
+from __future__ import annotations
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import sys
+import time
+import tracemalloc
+
+try:  # resource chỉ có trên Unix
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+# hook(event, payload): event "stage" khi một stage xong, "done" khi pipeline xong
+StatsHook = Callable[[str, dict], None]
+
+
+@dataclass
+class StageStats:
+    """
+    Số đo của một stage.
+
+    - wall: thời gian (giây).
+    - peak_traced: peak bộ nhớ cấp phát trong stage theo tracemalloc
+      (byte, gồm cả mảng NumPy); None nếu không bật trace_memory.
+    """
+    name: str
+    wall: float = 0.0
+    peak_traced: Optional[int] = None
+
+
+def _rss_high_water() -> Optional[int]:
+    """
+    ru_maxrss theo byte: peak RSS của cả vòng đời process (không reset được).
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS trả về byte, Linux/BSD trả về KB
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@dataclass
+class PipelineStats:
+    """
+    Thống kê của một lần chạy run_pipeline(stats=...).
+
+    - stages: StageStats theo tên stage, theo thứ tự chạy.
+    - counters: vd. neighbor_pairs, bk_calls / itree_nodes, cliques,
+      chash_keys, pi_calls, pi_cache_hits, pi_cache_misses.
+    - histograms: vd. bns_size (|BNs(s)| -> số instance), clique_size,
+      prevalent_by_size, pruned_by_size.
+    - hooks: gọi hook(event, payload) để đẩy số liệu sang exporter.
+    - rss_high_water: peak RSS của process (byte) ghi một lần trong
+      finish(); là high-water mark của cả process, gồm cả những gì chạy
+      trước pipeline, không phải peak riêng của lần chạy này.
+
+    Khi không truyền stats (mặc định), pipeline không đo gì cả.
+    trace_memory=True: đo thêm peak cấp phát theo stage bằng tracemalloc –
+    chậm đáng kể với stage tạo nhiều object nhỏ (clique), nên mặc định tắt.
+    """
+    trace_memory: bool = False
+    hooks: List[StatsHook] = field(default_factory=list)
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    histograms: Dict[str, Dict[int, int]] = field(default_factory=dict)
+    rss_high_water: Optional[int] = None
+
+    def __post_init__(self) -> None:
+        self._own_trace = False
+
+    # ---- ghi số liệu ----
+
+    def add(self, name: str, n: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name: str, value: int, n: int = 1) -> None:
+        h = self.histograms.setdefault(name, {})
+        h[value] = h.get(value, 0) + n
+
+    def observe_counts(self, name: str, counts: Iterable[int]) -> None:
+        """
+        Ghi cả histogram dạng bincount: counts[v] = số lần gặp giá trị v.
+        """
+        for value, n in enumerate(counts):
+            if n:
+                self.observe(name, value, int(n))
+
+    def observe_cliques(self, cliques: Iterable[tuple]) -> Iterator[tuple]:
+        """
+        Bọc iterator clique: đếm số clique và phân bố kích thước khi clique đi qua.
+        """
+        sizes = self.histograms.setdefault("clique_size", {})
+        n = 0
+        for c in cliques:
+            k = len(c)
+            sizes[k] = sizes.get(k, 0) + 1
+            n += 1
+            yield c
+        self.add("cliques", n)
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Đo wall time và peak bộ nhớ của khối lệnh bên trong.
+        """
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._own_trace = True
+            if hasattr(tracemalloc, "reset_peak"):  # Python >= 3.9
+                tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        st = StageStats(name)
+        t0 = time.perf_counter()
+        try:
+            yield st
+        finally:
+            st.wall = time.perf_counter() - t0
+            if self.trace_memory:
+                st.peak_traced = max(0, tracemalloc.get_traced_memory()[1] - base)
+            self.stages[name] = st
+            self._emit("stage", asdict(st))
+
+    def finish(self) -> None:
+        """
+        Dừng tracemalloc (nếu do stats bật), ghi rss_high_water và gọi hook "done".
+        """
+        if self._own_trace:
+            tracemalloc.stop()
+            self._own_trace = False
+        self.rss_high_water = _rss_high_water()
+        self._emit("done", self.to_dict())
+
+    def _emit(self, event: str, payload: dict) -> None:
+        for hook in self.hooks:
+            hook(event, payload)
+
+    # ---- xuất ----
+
+    @property
+    def total_wall(self) -> float:
+        return sum(st.wall for st in self.stages.values())
+
+    def to_dict(self) -> dict:
+        return {
+            "stages": {name: asdict(st) for name, st in self.stages.items()},
+            "counters": dict(self.counters),
+            "histograms": {k: dict(sorted(v.items())) for k, v in self.histograms.items()},
+            "rss_high_water": self.rss_high_water,
+        }
+
+    def report(self) -> str:
+        """
+        Bảng text ngắn: các stage, rồi các counter.
+        """
+        lines = [f"{'stage':<16}{'wall(s)':>10}{'peak(MB)':>10}"]
+        for st in self.stages.values():
+            peak = "-" if st.peak_traced is None else f"{st.peak_traced / 2**20:.1f}"
+            lines.append(f"{st.name:<16}{st.wall:>10.3f}{peak:>10}")
+        for k, v in self.counters.items():
+            lines.append(f"{k:<26}{v:>10}")
+        return "\n".join(lines)
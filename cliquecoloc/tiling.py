@@ -0,0 +1,167 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .data import ColumnarDataset, Dataset, SpatialDataset
+from .neighborhood import NeighborhoodList, _divide_space, materialize_neighborhoods
+from .chash import CHash, CompactCHash
+from .ids import iter_cliques_ids
+from .nds import iter_cliques_nds
+from .stats import PipelineStats
+
+# miner(dataset, nbs) -> iterator clique (tuple id của dataset con)
+CliqueMiner = Callable[[ColumnarDataset, NeighborhoodList], Iterable[Tuple[int, ...]]]
+AnyCHash = Union[CHash, CompactCHash]
+
+# nới halo một chút để sai số làm tròn không làm rơi láng giềng
+_HALO_EPS = 1e-9
+
+
+def clique_miner(schema: str, workers: int = 1, stats: Optional[PipelineStats] = None) -> CliqueMiner:
+    """
+    miner(dataset, nbs) -> iterator clique theo schema "ids", "nds" hoặc "nds-pivot".
+    """
+    schema = schema.lower()
+    if schema == "ids":
+        return lambda ds, nbs: iter_cliques_ids(ds, nbs, stats=stats)
+    engine = "pivot" if schema == "nds-pivot" else "bk"
+    return lambda ds, nbs: iter_cliques_nds(ds, nbs, workers=workers, engine=engine, stats=stats)
+
+
+@dataclass
+class Tile:
+    """
+    Một tile của lưới tile_size x tile_size (cùng cách chia như DivideSpace).
+
+    - cell: toạ độ tile trên lưới.
+    - ids: instance id toàn cục của core ∪ halo, tăng dần.
+    - core: mask trên ids – True nếu instance nằm trong chính tile này.
+
+    Halo gồm các instance của 8 tile xung quanh cách core không quá min_dist,
+    nên mọi clique có head trong core đều nằm trọn trong ids.
+    """
+    cell: Tuple[int, int]
+    ids: np.ndarray
+    core: np.ndarray
+
+
+def _columns(dataset: Dataset) -> ColumnarDataset:
+    if isinstance(dataset, ColumnarDataset):
+        return dataset
+    return dataset.to_columnar()
+
+
+def iter_tiles(dataset: Dataset, min_dist: float, tile_size: float) -> Iterator[Tile]:
+    """
+    Chia không gian thành các tile kèm halo min_dist (theo thứ tự cell).
+    tile_size phải >= min_dist để halo chỉ lấy từ 8 tile kề.
+    """
+    if tile_size < min_dist:
+        raise ValueError("tile_size phải >= min_dist")
+    cols = _columns(dataset)
+    x, y = cols.x, cols.y
+    tiles, min_x, min_y = _divide_space(x, y, tile_size)
+    halo = min_dist * (1 + _HALO_EPS) + _HALO_EPS
+
+    for (cx, cy), core_ids in sorted(tiles.items()):
+        x0 = min_x + cx * tile_size
+        y0 = min_y + cy * tile_size
+        parts = [core_ids]
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                nb = tiles.get((cx + dx, cy + dy))
+                if nb is None or (dx == 0 and dy == 0):
+                    continue
+                nx, ny = x[nb], y[nb]
+                near = ((nx >= x0 - halo) & (nx <= x0 + tile_size + halo)
+                        & (ny >= y0 - halo) & (ny <= y0 + tile_size + halo))
+                parts.append(nb[near])
+        ids = np.concatenate(parts)
+        order = np.argsort(ids, kind="stable")
+        core = np.zeros(len(ids), dtype=bool)
+        core[:len(core_ids)] = True
+        yield Tile((cx, cy), ids[order], core[order])
+
+
+def tile_dataset(dataset: Dataset, tile: Tile) -> ColumnarDataset:
+    """
+    Dataset con của tile. ids tăng dần nên id cục bộ i <-> tile.ids[i]
+    giữ nguyên thứ tự (feature, idx); feature_names giữ như dataset gốc.
+    """
+    cols = _columns(dataset)
+    ids = tile.ids
+    return ColumnarDataset(cols.feature_names, cols.feature[ids], cols.idx[ids], cols.x[ids], cols.y[ids])
+
+
+def iter_tile_cliques(
+    dataset: Dataset,
+    tile: Tile,
+    min_dist: float,
+    miner: CliqueMiner,
+    cols: Optional[ColumnarDataset] = None,
+) -> Iterator[tuple]:
+    """
+    Khai phá clique trong một tile, chỉ giữ clique có head (instance nhỏ
+    nhất) thuộc core – mỗi clique toàn cục được giữ ở đúng một tile.
+
+    Clique trả về theo dataset gốc: tuple id (ColumnarDataset) hoặc tuple
+    Instance (SpatialDataset).
+
+    cols: dạng cột của dataset đã chuyển sẵn – tránh to_columnar() O(n)
+    cho mỗi tile khi dataset là SpatialDataset.
+    """
+    sub = tile_dataset(dataset if cols is None else cols, tile)
+    nbs = materialize_neighborhoods(sub, min_dist)
+    ids = tile.ids.tolist()
+    core = tile.core
+    instances = dataset.instances if isinstance(dataset, SpatialDataset) else None
+    for c in miner(sub, nbs):
+        if not core[min(c)]:
+            continue
+        if instances is None:
+            yield tuple(ids[i] for i in c)
+        else:
+            yield tuple(instances[ids[i]] for i in c)
+
+
+def mine_tiled(
+    dataset: Dataset,
+    min_dist: float,
+    tile_size: float,
+    miner: CliqueMiner,
+    new_chash: Callable[[], AnyCHash],
+    keep_cliques: bool = False,
+    stats: Optional[PipelineStats] = None,
+) -> Tuple[Optional[List[tuple]], AnyCHash]:
+    """
+    Chế độ tile: mỗi lần chỉ giữ NeighborhoodList, clique và C-Hash partial
+    của một tile; partial được merge vào C-Hash toàn cục ngay sau tile đó.
+
+    new_chash: tạo C-Hash rỗng trên dataset gốc (dùng cho cả partial và
+    C-Hash toàn cục).
+    keep_cliques=True: trả thêm danh sách clique (theo thứ tự tile) – khi
+    đó clique của mọi tile đều nằm trong bộ nhớ, chỉ NeighborhoodList và
+    C-Hash partial là theo tile.
+    stats: nếu có, đếm clique giữ lại (head trong core) và số tile.
+
+    SpatialDataset được chuyển sang dạng cột một lần (cả dataset); dùng
+    ColumnarDataset (vd. load_npy mmap) để không phải chép.
+    """
+    chash = new_chash()
+    cliques: Optional[List[tuple]] = [] if keep_cliques else None
+    # chuyển sang dạng cột một lần cho mọi tile
+    cols = _columns(dataset)
+    for tile in iter_tiles(cols, min_dist, tile_size):
+        found = iter_tile_cliques(dataset, tile, min_dist, miner, cols)
+        if stats is not None:
+            stats.add("tiles")
+            found = stats.observe_cliques(found)
+        if cliques is not None:
+            found = list(found)
+            cliques.extend(found)
+        part = new_chash()
+        part.add_cliques(found)
+        chash.merge(part)
+    return cliques, chash
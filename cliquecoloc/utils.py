@@ -1,8 +1,10 @@
 # cliquecoloc/utils.py
 from __future__ import annotations
-from typing import Iterable, FrozenSet, List
+from typing import Iterable, Iterator, FrozenSet, List
 from itertools import combinations
 
+import numpy as np
+
 
 def all_nonempty_subsets(p: FrozenSet[str]) -> List[FrozenSet[str]]:
     elems = list(p)
@@ -21,3 +23,26 @@ def direct_subsets(p: FrozenSet[str]) -> List[FrozenSet[str]]:
     if k < 2:
         return []
     return [frozenset(c) for c in combinations(elems, k)]
+
+
+# ---- bitset (Python int): bit i bật <-> phần tử i có trong tập ----
+
+
+def _iter_bits(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+# int.bit_count có từ Python 3.10
+_popcount = getattr(int, "bit_count", None) or (lambda x: bin(x).count("1"))
+
+
+def _to_bitset(positions: Iterable[int], k: int) -> int:
+    """
+    Bitset k bit từ các vị trí bật (mảng / list), dựng qua np.packbits.
+    """
+    bits = np.zeros(k, dtype=bool)
+    bits[positions] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
@@ -0,0 +1,8 @@
+import sys
+from pathlib import Path
+
+# package được import dạng cliquecoloc._init_ từ gốc repo (không cần cài đặt)
+ROOT = Path(__file__).resolve().parents[1]
+for p in (ROOT, ROOT / "tests"):
+    if str(p) not in sys.path:
+        sys.path.insert(0, str(p))
@@ -0,0 +1,95 @@
+"""
+Tiện ích chung cho test: dataset ngẫu nhiên nhỏ (seed cố định) và dạng
+chuẩn hoá của clique / C-Hash để so các đường chạy mới với đường gốc
+(SpatialDataset + CHash + IDS).
+"""
+import numpy as np
+
+from cliquecoloc._init_ import (
+    ColumnarDataset, GeneratorParams, generate_synthetic, run_pipeline,
+)
+
+SEEDS = (0, 1, 2)
+MIN_DIST = 30.0
+MIN_PREV = 0.3
+
+
+def synthetic(seed: int, columnar: bool = False, m: int = 250):
+    """
+    Dữ liệu synthetic nhỏ có core pattern (clique size 3–4) lẫn noise.
+    """
+    params = GeneratorParams(P=4, I=8, D=300, F=6, Q=3, m=m, min_dist=MIN_DIST)
+    return generate_synthetic(params, seed=seed, columnar=columnar)
+
+
+def gridded(seed: int, n: int = 300, columnar: bool = False):
+    """
+    Toạ độ nguyên: nhiều cặp cách nhau đúng MIN_DIST (kiểm tra biên <=).
+    """
+    rng = np.random.default_rng(seed)
+    ds = ColumnarDataset.from_columns(
+        rng.choice(list("ABCD"), n),
+        np.arange(1, n + 1),
+        rng.integers(0, 200, n).astype(float),
+        rng.integers(0, 200, n).astype(float),
+    )
+    return ds if columnar else ds.to_spatial()
+
+
+def hotspot(seed: int, n_hot: int = 1500, n_bg: int = 300, columnar: bool = True):
+    """
+    Dữ liệu lệch: n_hot điểm dồn trong đúng một cell MIN_DIST x MIN_DIST
+    (grid gốc (0, 0), vượt xa DEFAULT_LEAF_SIZE nên engine "adaptive" phải
+    chia k-d), nửa số đó có toạ độ nguyên (điểm trùng nhau, cặp cách đúng
+    MIN_DIST như (18, 24)), cộng nền thưa.
+    """
+    rng = np.random.default_rng(seed)
+    half = n_hot // 2
+    lo, hi = 3 * MIN_DIST, 4 * MIN_DIST
+    hot_x = np.concatenate([rng.uniform(lo, hi, n_hot - half), rng.integers(lo, hi, half)])
+    hot_y = np.concatenate([rng.uniform(lo, hi, n_hot - half), rng.integers(lo, hi, half)])
+    bg_x = np.r_[0.0, rng.uniform(0, 300, n_bg - 1)]
+    bg_y = np.r_[0.0, rng.uniform(0, 300, n_bg - 1)]
+    n = n_hot + n_bg
+    ds = ColumnarDataset.from_columns(
+        rng.choice(list("ABCD"), n),
+        np.arange(1, n + 1),
+        np.concatenate([hot_x, bg_x]).astype(float),
+        np.concatenate([hot_y, bg_y]).astype(float),
+    )
+    return ds if columnar else ds.to_spatial()
+
+
+def ident(dataset, s):
+    """
+    (feature, idx) của một instance – Instance hoặc id của ColumnarDataset.
+    """
+    if isinstance(dataset, ColumnarDataset):
+        return dataset.feature_of(s), int(dataset.idx[s])
+    return s.feature, s.idx
+
+
+def clique_set(dataset, cliques):
+    return {tuple(sorted(ident(dataset, s) for s in c)) for c in cliques}
+
+
+def chash_table(dataset, chash):
+    """
+    {key: {feature: frozenset (feature, idx)}} – so được CHash theo Instance,
+    CHash theo id và CompactCHash. dataset: dataset mà C-Hash lưu theo.
+    """
+    return {
+        key: {f: frozenset(ident(dataset, s) for s in chash.instances_for(key, f)) for f in key}
+        for key in chash.candidates
+    }
+
+
+def baseline(dataset, min_dist: float = MIN_DIST, min_prev: float = MIN_PREV, schema: str = "ids"):
+    """
+    Đường gốc: SpatialDataset + CHash theo Instance + IDS (hoặc schema cho
+    trước). Trả về (dataset, cliques, chash, patterns).
+    """
+    if isinstance(dataset, ColumnarDataset):
+        dataset = dataset.to_spatial()
+    cliques, chash, patterns = run_pipeline(dataset, min_dist, min_prev, schema=schema)
+    return dataset, cliques, chash, patterns
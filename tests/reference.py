@@ -0,0 +1,174 @@
+"""
+Bản tham chiếu của đường gốc, viết lại trực tiếp trên Instance và tập
+láng giềng tính bằng so từng cặp (không dùng CSR, C-Hash index hay
+PICache): IDS/NDS như cài đặt ban đầu, C-Hash dạng dict và PI theo
+Algorithm 6, Algorithm 5 dạng list. Chỉ dùng cho test trên dữ liệu nhỏ.
+"""
+from collections import deque
+from itertools import combinations
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+from cliquecoloc._init_ import ColumnarDataset, Instance
+from cliquecoloc.prevalence import calculate_pi
+from cliquecoloc.utils import all_nonempty_subsets, direct_subsets
+
+
+def instances(dataset) -> List[Instance]:
+    if isinstance(dataset, ColumnarDataset):
+        dataset = dataset.to_spatial()
+    return sorted(dataset.instances)
+
+
+def neighbors(insts: List[Instance], min_dist: float) -> Dict[Instance, Set[Instance]]:
+    ns: Dict[Instance, Set[Instance]] = {s: set() for s in insts}
+    d2 = min_dist * min_dist
+    for a, b in combinations(insts, 2):
+        dx = a.x - b.x
+        dy = a.y - b.y
+        if dx * dx + dy * dy <= d2:
+            ns[a].add(b)
+            ns[b].add(a)
+    return ns
+
+
+def ids_cliques(dataset, min_dist: float) -> List[Tuple[Instance, ...]]:
+    """
+    I-tree theo Lemma 3: children(head) = BNs(head), children(ns) =
+    BNs(s) ∩ RS(ns), bỏ instance trùng feature với tổ tiên; mỗi lá là một clique.
+    """
+    insts = instances(dataset)
+    ns = neighbors(insts, min_dist)
+    bns = {s: {t for t in ns[s] if t > s} for s in insts}
+    out: List[Tuple[Instance, ...]] = []
+    for head in insts:
+        # (đường đi, RS của node – None với head-node, feature của tổ tiên)
+        queue = deque([((head,), None, frozenset())])
+        while queue:
+            path, rs, anc = queue.popleft()
+            s = path[-1]
+            cand = bns[s] if rs is None else bns[s] & rs
+            children = [t for t in sorted(cand) if t.feature not in anc]
+            if not children:
+                if len(path) >= 2:
+                    out.append(tuple(sorted(path)))
+                continue
+            child_anc = anc | {s.feature}
+            for i, t in enumerate(children):
+                queue.append((path + (t,), set(children[i + 1:]), child_anc))
+    return out
+
+
+def nds_cliques(dataset, min_dist: float) -> List[Tuple[Instance, ...]]:
+    """
+    Bron–Kerbosch không pivot trên {head} ∪ BNs(head) cho từng head.
+    """
+    insts = instances(dataset)
+    ns = neighbors(insts, min_dist)
+    out: List[Tuple[Instance, ...]] = []
+
+    def expand(clique, cand, excl):
+        if not cand and not excl:
+            if len(clique) >= 2:
+                out.append(tuple(sorted(clique)))
+            return
+        for v in list(cand):
+            expand(clique + (v,), ns[v] & cand, ns[v] & excl)
+            cand.remove(v)
+            excl.add(v)
+
+    for head in insts:
+        expand((head,), {t for t in ns[head] if t > head}, set())
+    return out
+
+
+Table = Dict[FrozenSet[str], Dict[str, Set[Instance]]]
+
+
+def chash_table(cliques) -> Table:
+    table: Table = {}
+    for c in cliques:
+        key = frozenset(s.feature for s in c)
+        if len(c) < 2 or len(key) < 2:
+            continue
+        bucket = table.setdefault(key, {f: set() for f in key})
+        for s in c:
+            bucket[s.feature].add(s)
+    return table
+
+
+def pi(cp: FrozenSet[str], table: Table, counts: Dict[str, int]) -> float:
+    """
+    Algorithm 6: PI(cp) = min_f |⋃_{K ⊇ cp} K[f]| / |f|.
+    """
+    supersets = [k for k in table if cp <= k]
+    if not supersets:
+        return 0.0
+    return min(len(set().union(*(table[k][f] for k in supersets))) / counts[f] for f in cp)
+
+
+def lattice(table: Table, counts: Dict[str, int]) -> Dict[FrozenSet[str], float]:
+    """
+    PI của mọi subset size >= 2 của các key.
+    """
+    out: Dict[FrozenSet[str], float] = {}
+    for key in table:
+        for k in range(2, len(key) + 1):
+            for cp in combinations(sorted(key), k):
+                cp = frozenset(cp)
+                if cp not in out:
+                    out[cp] = pi(cp, table, counts)
+    return out
+
+
+def normalized(table: Table) -> Dict[FrozenSet[str], Dict[str, FrozenSet[Tuple[str, int]]]]:
+    """
+    Cùng dạng với helpers.chash_table: instance thay bằng (feature, idx).
+    """
+    return {
+        key: {f: frozenset((s.feature, s.idx) for s in insts) for f, insts in bucket.items()}
+        for key, bucket in table.items()
+    }
+
+
+def prevalent(dataset, table: Table, min_prev: float) -> Dict[FrozenSet[str], float]:
+    """
+    Pattern có PI >= min_prev, tính trên C-Hash tham chiếu.
+    """
+    counts = {}
+    for s in instances(dataset):
+        counts[s.feature] = counts.get(s.feature, 0) + 1
+    return {cp: v for cp, v in lattice(table, counts).items() if v >= min_prev}
+
+
+def filter_original(dataset, chash, min_prev: float) -> Dict[FrozenSet[str], float]:
+    """
+    Algorithm 5 như cài đặt ban đầu: list candidate, pop(0) rồi sort lại
+    sau mỗi candidate không prevalent, PI tính bằng calculate_pi.
+    """
+    counts = dataset.feature_counts()
+    candidates = chash.candidates
+    candidates.sort(key=len, reverse=True)
+    candidate_set = set(candidates)
+    results: Dict[FrozenSet[str], float] = {}
+    while candidates:
+        curr = candidates.pop(0)
+        if curr not in candidate_set:
+            continue
+        pi_curr = calculate_pi(curr, chash, counts)
+        if pi_curr >= min_prev:
+            subsets = all_nonempty_subsets(curr)
+            for sub in subsets:
+                if sub not in results:
+                    results[sub] = calculate_pi(sub, chash, counts)
+            results[curr] = pi_curr
+            for sub in subsets:
+                candidate_set.discard(sub)
+            candidate_set.discard(curr)
+        else:
+            candidate_set.discard(curr)
+            for sub in direct_subsets(curr):
+                if sub not in candidate_set and sub not in results:
+                    candidates.append(sub)
+                    candidate_set.add(sub)
+            candidates.sort(key=len, reverse=True)
+    return results
@@ -0,0 +1,90 @@
+import json
+
+import pytest
+
+from cliquecoloc import bench
+from cliquecoloc._init_ import GeneratorParams
+
+TINY = GeneratorParams(P=3, I=5, D=200, F=5, Q=3, m=150, min_dist=30)
+
+
+def row(**kw):
+    out = {"case": "c", "schema": "ids", "total_s": 1.0, "cliques_s": 0.5, "peak_bytes": 1000,
+           "cliques": 10, "patterns": 3}
+    out.update(kw)
+    return out
+
+
+def test_param_grid():
+    axes = {"m": [100, 200], "F": [4, 6, 8]}
+    base = bench.BASE_PARAMS
+    cases = bench.param_grid(base, axes)
+    assert cases[0] == base and len(cases) == 1 + 2 + 3
+    assert len(bench.param_grid(base, axes, full=True)) == 2 * 3
+
+
+@pytest.mark.parametrize("current,metrics", [
+    (row(), []),
+    (row(total_s=1.19), []),
+    (row(total_s=1.3), ["total_s"]),
+    (row(cliques_s=0.53), []),
+    (row(cliques_s=0.7), ["cliques_s"]),
+    (row(peak_bytes=1300), ["peak_bytes"]),
+    (row(peak_bytes=None), []),
+    (row(patterns=4), ["patterns"]),
+    (row(cliques=9, total_s=5.0), ["cliques", "total_s"]),
+])
+def test_compare_thresholds(current, metrics):
+    regressions = bench.compare([row()], [current], time_threshold=0.2, mem_threshold=0.2, min_seconds=0.05)
+    assert [r.metric for r in regressions] == metrics
+    for r in regressions:
+        assert r.case == "c" and r.schema == "ids" and str(r)
+
+
+def test_compare_skips_unknown_cases():
+    assert bench.compare([row()], [row(case="other", total_s=9.0)]) == []
+
+
+def test_small_min_seconds():
+    base = row(cliques_s=0.01)
+    assert bench.compare([base], [row(cliques_s=0.03)]) == []
+    assert [r.metric for r in bench.compare([base], [row(cliques_s=0.03)], min_seconds=0.0)] == ["cliques_s"]
+
+
+@pytest.mark.parametrize("schema", ["ids", "nds"])
+def test_run_case_row(schema):
+    r = bench.run_case(TINY, 0, schema)
+    assert r["schema"] == schema and r["n"] == TINY.m
+    assert r["cliques"] > 0 and r["total_s"] > 0
+    assert r["case"] == bench.case_id(TINY, 0)
+    # clique và C-Hash đo riêng, không tracemalloc
+    assert {"neighborhoods_s", "cliques_s", "chash_s", "prevalence_s"} <= set(r)
+    assert r["peak_bytes"] is None and not any(k.endswith("_peak_bytes") for k in r)
+
+
+def test_run_case_trace_memory():
+    r = bench.run_case(TINY, 0, "nds", trace_memory=True)
+    assert r["cliques_peak_bytes"] > 0
+    assert r["peak_bytes"] == max(v for k, v in r.items() if k.endswith("_peak_bytes"))
+
+
+def test_cli(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(bench, "param_grid", lambda full=False: [TINY])
+    out, csv_path = tmp_path / "b.json", tmp_path / "b.csv"
+    assert bench.main(["--out", str(out), "--csv", str(csv_path), "--schemas", "ids", "--trace-memory"]) == 0
+    rows = bench.read_json(out)
+    assert len(rows) == 1 and csv_path.read_text().startswith("case,")
+    assert rows[0]["peak_bytes"] > 0
+
+    # cùng kết quả, ngưỡng thời gian rộng -> không regression
+    new = tmp_path / "new.json"
+    assert bench.main(["--out", str(new), "--schemas", "ids", "--baseline", str(out),
+                       "--time-threshold", "100", "--mem-threshold", "100"]) == 0
+
+    # baseline có số clique khác -> regression, exit code 1
+    data = json.loads(out.read_text())
+    data["results"][0]["cliques"] += 1
+    out.write_text(json.dumps(data))
+    assert bench.main(["--out", str(new), "--schemas", "ids", "--baseline", str(out),
+                       "--time-threshold", "100", "--mem-threshold", "100"]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
@@ -0,0 +1,114 @@
+import os
+
+import pytest
+
+import cliquecoloc.cache as cache_mod
+from cliquecoloc._init_ import CompactCHash, PipelineCache, PipelineStats, run_pipeline
+
+from helpers import MIN_DIST, MIN_PREV, chash_table, synthetic
+
+
+@pytest.mark.parametrize("columnar,compact", [(False, False), (True, False), (True, True)])
+@pytest.mark.parametrize("schema", ["ids", "nds"])
+def test_hit_matches_fresh_run(tmp_path, columnar, compact, schema):
+    cache = PipelineCache(tmp_path)
+    ds = synthetic(0, columnar=columnar)
+    _, chash, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema, compact=compact, cache=cache)
+    assert cache.load(ds, MIN_DIST, schema, compact) is not None
+
+    # hit: không có clique, cùng C-Hash; min_prev khác vẫn dùng lại được
+    again = synthetic(0, columnar=columnar)
+    cliques, hit_chash, hit_patterns = run_pipeline(again, MIN_DIST, MIN_PREV, schema=schema, compact=compact, cache=cache)
+    assert cliques is None
+    assert chash_table(again, hit_chash) == chash_table(ds, chash)
+    assert hit_patterns == patterns
+    _, _, lower = run_pipeline(again, MIN_DIST, 0.1, schema=schema, compact=compact, cache=cache)
+    assert lower == run_pipeline(ds, MIN_DIST, 0.1, schema=schema, compact=compact)[2]
+
+
+def test_key_changes_invalidate(tmp_path):
+    cache = PipelineCache(tmp_path)
+    ds = synthetic(0, columnar=True)
+    run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids", cache=cache)
+    assert cache.load(ds, MIN_DIST, "ids") is not None
+    assert cache.load(ds, MIN_DIST, "nds") is None
+    assert cache.load(ds, MIN_DIST, "ids", compact=True) is None
+    assert cache.load(ds, MIN_DIST + 1, "ids") is None
+    assert cache.load(ds.to_spatial(), MIN_DIST, "ids") is None
+
+    # dời một điểm -> fingerprint khác
+    moved = synthetic(0, columnar=True)
+    moved.x[0] += 1e-9
+    assert cache.load(moved, MIN_DIST, "ids") is None
+
+
+def test_old_version_is_a_miss(tmp_path, monkeypatch):
+    cache = PipelineCache(tmp_path)
+    ds = synthetic(0, columnar=True)
+    monkeypatch.setattr(cache_mod, "CACHE_VERSION", cache_mod.CACHE_VERSION - 1)
+    run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids", cache=cache)
+    monkeypatch.undo()
+    assert cache.load(ds, MIN_DIST, "ids") is None
+
+
+@pytest.mark.parametrize("damage", ["garbage", "truncate", "missing", "meta"])
+def test_corrupt_entry_is_dropped(tmp_path, damage):
+    cache = PipelineCache(tmp_path)
+    ds = synthetic(0, columnar=True)
+    _, chash, _ = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids", compact=True)
+    key = cache.store(ds, MIN_DIST, "ids", chash)
+    entry = tmp_path / key
+    pkl = entry / "chash.pkl"
+    if damage == "garbage":
+        pkl.write_bytes(b"not a pickle")
+    elif damage == "truncate":
+        pkl.write_bytes(pkl.read_bytes()[:20])
+    elif damage == "missing":
+        pkl.unlink()
+    else:
+        (entry / "meta.json").write_text('{"version": 1}')
+    assert cache.load(ds, MIN_DIST, "ids", compact=True) is None
+    assert not entry.exists()
+    # pipeline tính lại và ghi entry mới
+    _, again, _ = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids", compact=True, cache=cache)
+    assert isinstance(again, CompactCHash)
+    assert cache.load(ds, MIN_DIST, "ids", compact=True) is not None
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    cache = PipelineCache(tmp_path)
+    ds = synthetic(0, columnar=True)
+    keys = []
+    for i, d in enumerate((20.0, 25.0, 30.0)):
+        _, chash, _ = run_pipeline(ds, d, MIN_PREV, schema="ids", compact=True)
+        keys.append(cache.store(ds, d, "ids", chash))
+        os.utime(tmp_path / keys[-1] / "meta.json", (1000 + i, 1000 + i))
+    # hit làm entry đầu thành mới nhất
+    assert cache.load(ds, 20.0, "ids", compact=True) is not None
+
+    sizes = {k: cache._size(tmp_path / k) for k in keys}
+    cache.max_bytes = sum(sizes.values()) - 1
+    cache.evict()
+    assert sorted(p.name for p in cache._entries()) == sorted([keys[0], keys[2]])
+
+    cache.max_bytes = 0
+    cache.evict(keep=keys[2])
+    assert [p.name for p in cache._entries()] == [keys[2]]
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_neighborhoods_reused_across_schemas(tmp_path):
+    cache = PipelineCache(tmp_path)
+    ds = synthetic(0, columnar=True)
+    assert cache.load_neighborhoods(ds, MIN_DIST) is None
+    run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids", cache=cache)
+    nbs = cache.load_neighborhoods(ds, MIN_DIST)
+    assert nbs is not None and nbs.num_pairs > 0
+    assert cache.load_neighborhoods(ds, MIN_DIST + 1) is None
+
+    # C-Hash miss (schema khác) nhưng không materialize lại neighborhood
+    stats = PipelineStats()
+    _, _, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="nds", cache=cache, stats=stats)
+    assert "cache_load" in stats.stages and "neighborhoods" not in stats.stages
+    assert patterns == run_pipeline(ds, MIN_DIST, MIN_PREV, schema="nds")[2]
@@ -0,0 +1,80 @@
+from itertools import combinations
+
+import pytest
+
+from cliquecoloc._init_ import CHash, CompactCHash, materialize_neighborhoods, mine_cliques_nds, run_pipeline
+
+from helpers import MIN_DIST, MIN_PREV, SEEDS, baseline, chash_table, gridded, synthetic
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+def test_compact_matches_baseline(seed, make):
+    spatial, _, chash, patterns = baseline(make(seed))
+    ds = make(seed, columnar=True)
+    _, compact, got = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids", stream=True, compact=True)
+    assert isinstance(compact, CompactCHash)
+    assert chash_table(ds, compact) == chash_table(spatial, chash)
+    assert got == patterns
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_compact_matches_chash_on_same_cliques(seed):
+    ds = synthetic(seed, columnar=True)
+    cliques = mine_cliques_nds(ds, materialize_neighborhoods(ds, MIN_DIST))
+    chash = CHash(dataset=ds)
+    chash.add_cliques(cliques)
+
+    # hai lô add_cliques: lô sau phải hợp với mảng đã flush
+    half = len(cliques) // 2
+    compact = CompactCHash(ds)
+    compact.add_cliques(cliques[:half])
+    compact.add_cliques(cliques[half:])
+    assert chash_table(ds, compact) == chash_table(ds, chash)
+
+
+def test_unknown_feature():
+    ds = synthetic(0, columnar=True)
+    _, compact, _ = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids", compact=True)
+    key = compact.candidates[0]
+    f = next(iter(key))
+    with pytest.raises(KeyError, match="'nope'"):
+        compact.participation(key, "nope")
+    with pytest.raises(KeyError, match="'nope'"):
+        compact.key_of(frozenset({f, "nope"}))
+    assert compact.supersets(frozenset({f, "nope"})) == []
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_merge_matches_single_chash(compact):
+    ds = synthetic(0, columnar=True)
+    cliques = mine_cliques_nds(ds, materialize_neighborhoods(ds, MIN_DIST))
+    new = (lambda: CompactCHash(ds)) if compact else (lambda: CHash(dataset=ds))
+    whole = new()
+    whole.add_cliques(cliques)
+
+    # merge ba partial chồng nhau (như C-Hash partial của các tile)
+    merged = new()
+    for lo, hi in ((0, len(cliques) // 2), (len(cliques) // 3, len(cliques)), (0, 10)):
+        part = new()
+        part.add_cliques(cliques[lo:hi])
+        merged.merge(part)
+    assert chash_table(ds, merged) == chash_table(ds, whole)
+    assert merged.candidates and set(merged.candidates) == set(whole.candidates)
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_supersets_match_scan(compact):
+    ds = synthetic(0, columnar=True)
+    _, chash, _ = run_pipeline(ds, MIN_DIST, MIN_PREV, compact=compact)
+    names = chash.names_of if compact else (lambda key: key)
+    keys = chash.candidates
+    features = sorted(set().union(*keys)) + ["Z"]
+    for k in (1, 2, 3):
+        for cp in map(frozenset, combinations(features, k)):
+            assert {names(key) for key in chash.supersets(cp)} == {key for key in keys if cp <= key}
+
+
+def test_compact_needs_columnar():
+    with pytest.raises(ValueError):
+        run_pipeline(synthetic(0), MIN_DIST, MIN_PREV, compact=True)
@@ -0,0 +1,29 @@
+import pytest
+
+from cliquecoloc._init_ import ColumnarDataset, run_pipeline
+
+from helpers import MIN_DIST, MIN_PREV, SEEDS, baseline, chash_table, clique_set, gridded, synthetic
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_round_trip(seed):
+    spatial = synthetic(seed)
+    cols = spatial.to_columnar()
+    assert cols.to_spatial().instances == spatial.instances
+    assert ColumnarDataset.from_instances(reversed(spatial.instances)).to_spatial().instances == spatial.instances
+    assert cols.feature_counts() == spatial.feature_counts()
+    assert [cols.instance(i) for i in range(len(cols))] == spatial.instances
+    assert synthetic(seed, columnar=True).to_spatial().instances == spatial.instances
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("schema", ["ids", "nds"])
+def test_columnar_pipeline_matches_baseline(seed, make, schema):
+    spatial, cliques, chash, patterns = baseline(make(seed), schema=schema)
+    cols = make(seed, columnar=True)
+    got_cliques, got_chash, got_patterns = run_pipeline(cols, MIN_DIST, MIN_PREV, schema=schema)
+    assert len(got_cliques) == len(cliques)
+    assert clique_set(cols, got_cliques) == clique_set(spatial, cliques)
+    assert chash_table(cols, got_chash) == chash_table(spatial, chash)
+    assert got_patterns == patterns
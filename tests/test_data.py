@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+import pytest
+
+from cliquecoloc._init_ import csv_to_npy, iter_csv_chunks, load_csv, load_npy, save_csv, save_npy
+from cliquecoloc.data import _load_csv_columnar
+
+from helpers import synthetic
+
+
+def same_columns(a, b):
+    assert a.feature_names == b.feature_names
+    for name in ("feature", "idx", "x", "y"):
+        assert np.array_equal(getattr(a, name), getattr(b, name))
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_csv_round_trip(tmp_path, columnar):
+    ds = synthetic(0, columnar=columnar)
+    save_csv(ds, tmp_path / "d.csv")
+    assert load_csv(tmp_path / "d.csv").instances == synthetic(0).instances
+    same_columns(load_csv(tmp_path / "d.csv", columnar=True), synthetic(0, columnar=True))
+
+
+def test_csv_chunks(tmp_path):
+    save_csv(synthetic(0), tmp_path / "d.csv")
+    chunks = list(iter_csv_chunks(tmp_path / "d.csv", chunksize=7))
+    assert [len(c[0]) for c in chunks[:-1]] == [7] * (len(chunks) - 1)
+    features, idx, x, y = (np.concatenate(c) for c in zip(*chunks))
+    spatial = load_csv(tmp_path / "d.csv")
+    assert list(zip(features.tolist(), idx.tolist(), x.tolist(), y.tolist())) == [
+        (s.feature, s.idx, s.x, s.y) for s in spatial.instances
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "Feature,InstanceID,X,Y\nB,2,1.5,2.5\nA,1,0.0,3.0\n",
+    "y,x,feature,idx\n2.5,1.5,B,2\n3.0,0.0,A,1\n",
+    "feature,idx,x,y\r\nB,2,1.5,2.5\r\nA,1,0.0,3.0\r\n",
+    'feature,idx,x,y\n"B",2,1.5,"2.5"\n"A","1",0.0,3.0\n',
+    "feature,idx,x,y\nB,2,1.5,2.5\nA,1,0.0,3.0",
+])
+def test_csv_layouts(tmp_path, text):
+    path = tmp_path / "d.csv"
+    path.write_bytes(text.encode())
+    expected = [("A", 1, 0.0, 3.0), ("B", 2, 1.5, 2.5)]
+    assert [(s.feature, s.idx, s.x, s.y) for s in load_csv(path).instances] == expected
+    assert [(s.feature, s.idx, s.x, s.y) for s in load_csv(path, columnar=True).to_instances()] == expected
+
+
+@pytest.mark.filterwarnings("error")
+@pytest.mark.parametrize("chunksize", [1, 2, 1000])
+def test_csv_blank_lines(tmp_path, chunksize):
+    path = tmp_path / "d.csv"
+    path.write_bytes(b"feature,idx,x,y\r\n\r\nB,2,1.5,2.5\n\n  \nA,1,0.0,3.0\n\n\n")
+    expected = [("A", 1, 0.0, 3.0), ("B", 2, 1.5, 2.5)]
+    chunks = list(iter_csv_chunks(path, chunksize))
+    assert sum(len(c[0]) for c in chunks) == 2
+    assert [(s.feature, s.idx, s.x, s.y) for s in load_csv(path).instances] == expected
+    ds = _load_csv_columnar(path, chunksize)
+    assert [(s.feature, s.idx, s.x, s.y) for s in ds.to_instances()] == expected
+
+
+def test_csv_missing_column(tmp_path):
+    (tmp_path / "d.csv").write_text("feature,idx,x\nA,1,0.0\n")
+    with pytest.raises(ValueError, match="'y'"):
+        list(iter_csv_chunks(tmp_path / "d.csv"))
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_npy_round_trip(tmp_path, mmap):
+    ds = synthetic(0, columnar=True)
+    save_npy(ds, tmp_path / "d")
+    same_columns(load_npy(tmp_path / "d", mmap=mmap), ds)
+    save_npy(synthetic(0), tmp_path / "s")
+    same_columns(load_npy(tmp_path / "s", mmap=mmap), ds)
+
+
+def test_csv_to_npy(tmp_path):
+    save_csv(synthetic(1), tmp_path / "d.csv")
+    out = csv_to_npy(tmp_path / "d.csv", tmp_path / "d", chunksize=10)
+    same_columns(out, synthetic(1, columnar=True))
+    same_columns(load_npy(tmp_path / "d"), out)
+
+
+def test_npy_version_mismatch(tmp_path):
+    save_npy(synthetic(0), tmp_path / "d")
+    meta = json.loads((tmp_path / "d" / "meta.json").read_text())
+    meta["version"] = 0
+    (tmp_path / "d" / "meta.json").write_text(json.dumps(meta))
+    with pytest.raises(ValueError):
+        load_npy(tmp_path / "d")
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from cliquecoloc._init_ import GeneratorParams, generate_synthetic, load_npy
+from cliquecoloc.generator import write_synthetic
+
+PARAMS = [
+    GeneratorParams(P=4, I=8, D=300, F=6, Q=3, m=250, min_dist=30),
+    GeneratorParams(P=3, I=20, D=500, F=4, Q=3, m=1000, min_dist=40, clumpy=3),
+]
+
+
+@pytest.mark.parametrize("params", PARAMS)
+@pytest.mark.parametrize("chunksize", [1, 37, 1_000_000])
+def test_write_synthetic_matches_generate(tmp_path, params, chunksize):
+    ds = generate_synthetic(params, seed=3, columnar=True)
+    n = write_synthetic(params, tmp_path / "d", seed=3, chunksize=chunksize)
+    assert n == len(ds)
+    out = load_npy(tmp_path / "d")
+    assert out.feature_names == ds.feature_names
+    for name in ("feature", "idx", "x", "y"):
+        assert np.array_equal(getattr(out, name), getattr(ds, name))
+
+
+@pytest.mark.parametrize("params", PARAMS)
+def test_generate_is_deterministic(params):
+    a = generate_synthetic(params, seed=1, columnar=True)
+    b = generate_synthetic(params, seed=1)
+    assert a.to_spatial().instances == b.instances
+    assert generate_synthetic(params, seed=2).instances != b.instances
+
+    assert len(a) == params.m
+    assert set(a.feature_names) <= {chr(ord("A") + i) for i in range(params.F)}
+    # idx của mỗi feature là 1..count, toạ độ trong vùng D x D
+    for f, count in a.feature_counts().items():
+        assert sorted(s.idx for s in b.feature_to_instances[f]) == list(range(1, count + 1))
+    assert a.x.min() >= 0 and a.x.max() <= params.D
+    assert a.y.min() >= 0 and a.y.max() <= params.D
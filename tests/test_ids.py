@@ -0,0 +1,36 @@
+import pytest
+
+from cliquecoloc._init_ import (
+    iter_cliques_ids, materialize_neighborhoods, mine_cliques_ids, run_pipeline,
+)
+
+import reference
+from helpers import MIN_DIST, MIN_PREV, SEEDS, chash_table, clique_set, gridded, synthetic
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("columnar", [False, True])
+def test_cliques_match_reference(seed, make, columnar):
+    expected = reference.ids_cliques(make(seed), MIN_DIST)
+    ds = make(seed, columnar=columnar)
+    cliques = mine_cliques_ids(ds, materialize_neighborhoods(ds, MIN_DIST))
+    assert len(cliques) == len(expected)
+    assert clique_set(ds, cliques) == clique_set(make(seed), expected)
+
+
+def test_streaming_matches_list():
+    ds = synthetic(0, columnar=True)
+    nbs = materialize_neighborhoods(ds, MIN_DIST)
+    assert list(iter_cliques_ids(ds, nbs)) == mine_cliques_ids(ds, nbs)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("columnar", [False, True])
+def test_chash_and_patterns_match_reference(seed, make, columnar):
+    ds = make(seed, columnar=columnar)
+    _, chash, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="ids")
+    table = reference.chash_table(reference.ids_cliques(make(seed), MIN_DIST))
+    assert chash_table(ds, chash) == reference.normalized(table)
+    assert patterns == reference.prevalent(make(seed), table, MIN_PREV)
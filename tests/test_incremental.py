@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+
+from cliquecoloc._init_ import IncrementalPipeline, Instance, SpatialDataset, run_pipeline
+from cliquecoloc.chash import _SupersetIndex
+
+from helpers import MIN_DIST, MIN_PREV, SEEDS, chash_table, synthetic
+
+
+def _churn(rng, dataset, n):
+    """
+    Xoá ngẫu nhiên n instance và thêm n instance mới (idx chưa dùng).
+    """
+    insts = dataset.instances
+    removed = [insts[i] for i in rng.choice(len(insts), n, replace=False)]
+    next_idx = {}
+    for s in insts:
+        next_idx[s.feature] = max(next_idx.get(s.feature, 0), s.idx + 1)
+    features = sorted(next_idx)
+    added = []
+    for _ in range(n):
+        f = features[rng.integers(len(features))]
+        added.append(Instance(f, next_idx[f], float(rng.uniform(0, 300)), float(rng.uniform(0, 300))))
+        next_idx[f] += 1
+    return added, removed
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("schema", ["ids", "nds"])
+@pytest.mark.parametrize("columnar", [False, True])
+def test_churn_matches_rerun(seed, schema, columnar):
+    rng = np.random.default_rng(seed)
+    source = synthetic(seed, columnar=columnar)
+    inc = IncrementalPipeline(source, MIN_DIST, MIN_PREV, schema=schema)
+    for _ in range(5):
+        added, removed = _churn(rng, inc.dataset, 10)
+        patterns = inc.update(added=added, removed=removed)
+
+        fresh = SpatialDataset(list(inc.dataset.instances))
+        _, chash, expected = run_pipeline(fresh, MIN_DIST, MIN_PREV, schema=schema, stream=True)
+        assert patterns == expected
+        assert chash_table(fresh, inc.chash) == chash_table(fresh, chash)
+    # dataset truyền vào không bị sửa
+    assert len(source) == len(synthetic(seed))
+
+
+def test_mines_only_affected_heads(monkeypatch):
+    inc = IncrementalPipeline(synthetic(0), MIN_DIST, MIN_PREV, schema="nds")
+    calls = []
+    mine_head = inc._mine_head
+    monkeypatch.setattr(inc, "_mine_head", lambda nbs, head, out: calls.append(head) or mine_head(nbs, head, out))
+    added, removed = _churn(np.random.default_rng(0), inc.dataset, 1)
+    inc.update(added=added, removed=removed)
+    heads = {added[0], *inc._smaller_neighbors(added[0]), *inc._smaller_neighbors(removed[0])}
+    assert len(calls) == len(heads)
+
+
+def test_insert_then_delete_restores_patterns():
+    inc = IncrementalPipeline(synthetic(0), MIN_DIST, MIN_PREV, schema="ids")
+    before = dict(inc.patterns)
+    added, _ = _churn(np.random.default_rng(0), inc.dataset, 20)
+    inc.insert(added)
+    assert len(inc.dataset) == 250 + 20
+    assert inc.delete(added) == before
+    assert len(inc.dataset) == 250
+
+
+def test_readded_instances_keep_their_cliques():
+    inc = IncrementalPipeline(synthetic(0), MIN_DIST, MIN_PREV, schema="nds")
+    before = dict(inc.patterns)
+    table = chash_table(inc.dataset, inc.chash)
+    rng = np.random.default_rng(0)
+    added, removed = _churn(rng, inc.dataset, 10)
+
+    # xoá rồi thêm lại đúng các instance đó: không đổi gì
+    same = removed[:5]
+    assert inc.update(added=same, removed=same) == before
+    assert chash_table(inc.dataset, inc.chash) == table
+
+    # lẫn với thay đổi thật
+    keep = removed[:5]
+    patterns = inc.update(added=added + keep, removed=removed)
+    fresh = SpatialDataset(list(inc.dataset.instances))
+    _, chash, expected = run_pipeline(fresh, MIN_DIST, MIN_PREV, schema="nds")
+    assert patterns == expected
+    assert chash_table(fresh, inc.chash) == chash_table(fresh, chash)
+
+
+def test_invalid_update_leaves_state_unchanged():
+    inc = IncrementalPipeline(synthetic(0), MIN_DIST, MIN_PREV, schema="ids")
+    before = dict(inc.patterns)
+    instances = list(inc.dataset.instances)
+    table = chash_table(inc.dataset, inc.chash)
+    added, removed = _churn(np.random.default_rng(0), inc.dataset, 5)
+    missing = Instance("A", 10 ** 6, 1.0, 1.0)
+
+    with pytest.raises(KeyError):
+        inc.update(added=added, removed=removed + [missing])
+    with pytest.raises(KeyError):
+        inc.delete(removed + removed[:1])
+    with pytest.raises(ValueError):
+        inc.insert(added + added[:1])
+    with pytest.raises(ValueError):
+        inc.update(added=[next(s for s in instances if s not in removed)], removed=removed)
+
+    assert inc.dataset.instances == instances
+    assert inc.patterns == before
+    assert chash_table(inc.dataset, inc.chash) == table
+    # vẫn cập nhật được bình thường sau các lần lỗi
+    inc.update(added=added, removed=removed)
+    fresh = SpatialDataset(list(inc.dataset.instances))
+    assert inc.patterns == run_pipeline(fresh, MIN_DIST, MIN_PREV, schema="ids")[2]
+
+
+def test_superset_index_compaction():
+    rng = np.random.default_rng(0)
+    features = list("ABCDEFGH")
+    index = _SupersetIndex()
+    live = set()
+    for _ in range(2000):
+        if live and rng.random() < 0.5:
+            key = sorted(live)[rng.integers(len(live))]
+            index.remove(key)
+            live.discard(key)
+        else:
+            key = frozenset(rng.choice(features, rng.integers(2, 5), replace=False).tolist())
+            index.add(key, key)
+            live.add(key)
+        cp = frozenset(rng.choice(features, 2, replace=False).tolist())
+        assert set(index.supersets(cp)) == {k for k in live if cp <= k}
+
+    # slot chết đã được dồn: index không lớn hơn nhiều so với số key còn sống
+    assert len(index._keys) <= 2 * len(live) + 64
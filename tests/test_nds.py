@@ -0,0 +1,55 @@
+import pytest
+
+import cliquecoloc.nds as nds
+
+from cliquecoloc._init_ import (
+    iter_cliques_nds, materialize_neighborhoods, mine_cliques_nds, run_pipeline,
+)
+
+import reference
+from helpers import MIN_DIST, MIN_PREV, SEEDS, chash_table, clique_set, gridded, synthetic
+
+ENGINES = ["bk", "pivot"]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("columnar", [False, True])
+@pytest.mark.parametrize("engine", ENGINES)
+def test_cliques_match_reference(seed, make, columnar, engine):
+    expected = reference.nds_cliques(make(seed), MIN_DIST)
+    ds = make(seed, columnar=columnar)
+    cliques = mine_cliques_nds(ds, materialize_neighborhoods(ds, MIN_DIST), engine=engine)
+    assert len(cliques) == len(expected)
+    assert clique_set(ds, cliques) == clique_set(make(seed), expected)
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+@pytest.mark.parametrize("engine", ENGINES)
+def test_parallel_and_streaming_match_sequential(columnar, engine):
+    ds = synthetic(0, columnar=columnar)
+    nbs = materialize_neighborhoods(ds, MIN_DIST)
+    expected = mine_cliques_nds(ds, nbs, engine=engine)
+    assert mine_cliques_nds(ds, nbs, workers=2, engine=engine) == expected
+    assert list(iter_cliques_nds(ds, nbs, engine=engine)) == expected
+    assert list(iter_cliques_nds(ds, nbs, workers=2, engine=engine)) == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_pivot_schema_matches_nds(seed):
+    ds = synthetic(seed, columnar=True)
+    _, chash, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="nds")
+    _, pivot_chash, pivot_patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema="nds-pivot")
+    assert chash_table(ds, pivot_chash) == chash_table(ds, chash)
+    assert pivot_patterns == patterns
+
+
+def test_parallel_with_many_small_ranges(monkeypatch):
+    # mỗi range một head, tối đa 1 range đang chạy mỗi worker: phải đợi
+    # kết quả trước khi gửi tiếp mà vẫn giữ thứ tự head
+    monkeypatch.setattr(nds, "_RANGE_WEIGHT", 1)
+    monkeypatch.setattr(nds, "_INFLIGHT_PER_WORKER", 1)
+    ds = synthetic(1, columnar=True)
+    nbs = materialize_neighborhoods(ds, MIN_DIST)
+    expected = mine_cliques_nds(ds, nbs)
+    assert list(iter_cliques_nds(ds, nbs, workers=2)) == expected
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+import cliquecoloc.neighborhood as neighborhood
+from cliquecoloc._init_ import cell_costs, materialize_neighborhoods, materialize_pairs
+from cliquecoloc.neighborhood import DEFAULT_LEAF_SIZE
+
+from helpers import MIN_DIST, SEEDS, gridded, hotspot, ident, synthetic
+
+ENGINES = ["grid", "kdtree", "adaptive"]
+
+
+def brute_force_ns(dataset, min_dist):
+    """
+    Ns(s) bằng so từng cặp, cùng phép so dx*dx + dy*dy <= min_dist^2 (như
+    _is_neighbor của bản gốc: mọi instance khác s, kể cả cùng feature).
+    """
+    cols = dataset if hasattr(dataset, "feature_offsets") else dataset.to_columnar()
+    x, y = cols.x, cols.y
+    dx = x[:, None] - x[None, :]
+    dy = y[:, None] - y[None, :]
+    near = dx * dx + dy * dy <= min_dist * min_dist
+    np.fill_diagonal(near, False)
+    return [np.flatnonzero(row) for row in near]
+
+
+def assert_matches_brute_force(ds, nbs):
+    expected = brute_force_ns(ds, MIN_DIST)
+    for s in range(len(ds)):
+        assert nbs.ns(s).tolist() == expected[s].tolist()
+        assert nbs.sns(s).tolist() == [t for t in expected[s].tolist() if t < s]
+        assert nbs.bns(s).tolist() == [t for t in expected[s].tolist() if t > s]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_match_brute_force(seed, make, engine):
+    ds = make(seed, columnar=True)
+    assert_matches_brute_force(ds, materialize_neighborhoods(ds, MIN_DIST, engine=engine))
+
+
+def assert_same_csr(a, b):
+    for name in ("indptr", "indices", "split"):
+        assert np.array_equal(getattr(a, name), getattr(b, name))
+
+
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("engine", ["grid", "adaptive"])
+@pytest.mark.parametrize("workers", [2, 3])
+def test_parallel_grid_matches_sequential(make, engine, workers):
+    ds = make(0, columnar=True)
+    seq = materialize_neighborhoods(ds, MIN_DIST, engine=engine)
+    assert_same_csr(seq, materialize_neighborhoods(ds, MIN_DIST, engine=engine, workers=workers))
+
+
+@pytest.mark.parametrize("engine", ["auto", "kdtree"])
+def test_kdtree_ignores_workers(monkeypatch, engine):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("kdtree không được chuyển sang grid song song")
+
+    monkeypatch.setattr(neighborhood, "_pairs_parallel", no_pool)
+    ds = synthetic(0, columnar=True)
+    seq = materialize_neighborhoods(ds, MIN_DIST, engine=engine)
+    assert_same_csr(seq, materialize_neighborhoods(ds, MIN_DIST, engine=engine, workers=2))
+
+
+@pytest.mark.parametrize("seed", SEEDS[:2])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_adaptive_hotspot_matches_kdtree(seed, workers):
+    ds = hotspot(seed)
+    # ô dày nhất vượt leaf size -> nhánh chia k-d thực sự chạy
+    assert cell_costs(ds, MIN_DIST).points.max() > 4 * DEFAULT_LEAF_SIZE
+    expected = materialize_neighborhoods(ds, MIN_DIST, engine="kdtree")
+    assert_same_csr(materialize_neighborhoods(ds, MIN_DIST, engine="adaptive", workers=workers), expected)
+    if workers == 1:
+        assert_same_csr(materialize_neighborhoods(ds, MIN_DIST, engine="grid"), expected)
+
+
+def test_cell_costs():
+    ds = hotspot(0)
+    costs = cell_costs(ds, MIN_DIST)
+    gx = np.floor((ds.x - ds.x.min()) / MIN_DIST).astype(int)
+    gy = np.floor((ds.y - ds.y.min()) / MIN_DIST).astype(int)
+    points = {}
+    for cell in zip(gx.tolist(), gy.tolist()):
+        points[cell] = points.get(cell, 0) + 1
+    assert {tuple(c): int(n) for c, n in zip(costs.cells.tolist(), costs.points)} == points
+    for (cx, cy), n, checks in costs.top(len(points)):
+        half = sum(points.get((cx + ox, cy + oy), 0) for ox, oy in ((1, -1), (1, 0), (1, 1), (0, 1)))
+        assert checks == n * (n + half)
+
+    summary = costs.summary()
+    assert summary["cells"] == len(points)
+    assert summary["points_max"] == max(points.values()) == costs.top(1)[0][1]
+    assert summary["checks"] == float(costs.checks.sum())
+    assert 0.5 < summary["top1pct_share"] <= 1.0
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_spatial_and_columnar_csr_agree(seed):
+    spatial = synthetic(seed)
+    cols = synthetic(seed, columnar=True)
+    a = materialize_neighborhoods(spatial, MIN_DIST)
+    b = materialize_neighborhoods(cols, MIN_DIST)
+    for s in range(len(cols)):
+        assert [ident(spatial, t) for t in a.to_clique(a.ns(s))] == [ident(cols, t) for t in b.ns(s).tolist()]
+
+
+@pytest.mark.parametrize("make", [synthetic, gridded])
+def test_pairs_filtered_by_distance(make):
+    ds = make(0, columnar=True)
+    pairs = materialize_pairs(ds, 2 * MIN_DIST)
+    for d in (10.0, MIN_DIST, 2 * MIN_DIST):
+        a = pairs.neighborhoods(d)
+        b = materialize_neighborhoods(ds, d)
+        for name in ("indptr", "indices", "split"):
+            assert np.array_equal(getattr(a, name), getattr(b, name))
@@ -0,0 +1,57 @@
+import pytest
+
+from cliquecoloc._init_ import run_pipeline, sweep_min_dist
+
+from helpers import MIN_DIST, MIN_PREV, SEEDS, chash_table, gridded, synthetic
+
+SCHEMAS = ["ids", "nds", "nds-pivot"]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("columnar", [False, True])
+@pytest.mark.parametrize("schema", SCHEMAS)
+def test_stream_matches_list(seed, columnar, schema):
+    ds = synthetic(seed, columnar=columnar)
+    _, chash, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema)
+    cliques, stream_chash, stream_patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema, stream=True)
+    assert cliques is None
+    assert chash_table(ds, stream_chash) == chash_table(ds, chash)
+    assert stream_patterns == patterns
+
+
+@pytest.mark.parametrize("schema", SCHEMAS)
+def test_workers_match_sequential(schema):
+    ds = synthetic(0, columnar=True)
+    cliques, chash, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema)
+    par_cliques, par_chash, par_patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema, workers=2)
+    assert par_cliques == cliques
+    assert chash_table(ds, par_chash) == chash_table(ds, chash)
+    assert par_patterns == patterns
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("schema", SCHEMAS)
+@pytest.mark.parametrize("columnar,compact", [(False, False), (True, False), (True, True)])
+def test_sweep_min_dist_matches_independent_runs(seed, make, schema, columnar, compact):
+    ds = make(seed, columnar=columnar)
+    distances = [MIN_DIST, 10.0, 20.0]
+    sweep = sweep_min_dist(ds, distances, MIN_PREV, schema=schema, compact=compact)
+    assert sorted(sweep) == sorted(distances)
+    for d in distances:
+        chash, patterns = sweep[d]
+        _, expected_chash, expected = run_pipeline(ds, d, MIN_PREV, schema=schema, compact=compact)
+        assert chash_table(ds, chash) == chash_table(ds, expected_chash)
+        assert patterns == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("schema", SCHEMAS)
+@pytest.mark.parametrize("min_prev", [0.1, 0.3, 0.6])
+@pytest.mark.parametrize("columnar,compact", [(False, False), (True, True)])
+def test_prune_pairs_keeps_patterns(seed, schema, min_prev, columnar, compact):
+    ds = synthetic(seed, columnar=columnar)
+    cliques, _, patterns = run_pipeline(ds, MIN_DIST, min_prev, schema=schema, compact=compact)
+    pruned, _, pruned_patterns = run_pipeline(ds, MIN_DIST, min_prev, schema=schema, compact=compact, prune_pairs=True)
+    assert pruned_patterns == patterns
+    assert len(pruned) <= len(cliques)
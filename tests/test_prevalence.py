@@ -0,0 +1,128 @@
+from itertools import combinations
+
+import pytest
+
+import cliquecoloc.prevalence as prevalence
+from cliquecoloc._init_ import CompactCHash, mine_maximal_patterns, run_pipeline, sweep_min_prev
+from cliquecoloc.prevalence import LevelStats, PICache, calculate_pi, mine_prevalent_patterns
+
+import reference
+from helpers import MIN_DIST, SEEDS, gridded, synthetic
+
+MIN_PREVS = [0.0, 0.2, 0.5]
+
+
+def lattice_top_down(chash):
+    """
+    Mọi subset size >= 2 của các key, lớn trước (thứ tự như Algorithm 5).
+    """
+    cps = {frozenset(c) for key in chash.candidates for k in range(2, len(key) + 1) for c in combinations(key, k)}
+    return sorted(cps, key=lambda cp: (-len(cp), sorted(cp)))
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("max_entries", [100_000, 8])
+def test_pi_cache_matches_calculate_pi(compact, max_entries):
+    ds = synthetic(0, columnar=True)
+    _, chash, _ = run_pipeline(ds, MIN_DIST, 0.0, schema="ids", compact=compact)
+    counts = ds.feature_counts()
+    cache = PICache(chash, counts, max_entries=max_entries)
+    for cp in lattice_top_down(chash):
+        assert cache.pi(cp) == calculate_pi(cp, chash, counts)
+    assert cache.hits > 0
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("compact", [False, True])
+def test_patterns_match_reference(seed, make, compact):
+    ds = make(seed, columnar=True)
+    table = reference.chash_table(reference.ids_cliques(make(seed), MIN_DIST))
+    for min_prev in MIN_PREVS:
+        _, _, patterns = run_pipeline(ds, MIN_DIST, min_prev, schema="ids", stream=True, compact=compact)
+        assert patterns == reference.prevalent(make(seed), table, min_prev)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("min_prev", MIN_PREVS)
+def test_level_queue_matches_original_order(seed, min_prev):
+    ds = synthetic(seed, columnar=True)
+    _, chash, _ = run_pipeline(ds, MIN_DIST, 0.0, schema="nds", stream=True)
+    level_stats = {}
+    patterns = mine_prevalent_patterns(ds, chash, min_prev, level_stats=level_stats)
+    # cùng pattern, cùng PI và cùng thứ tự chèn như bản pop(0) + sort
+    assert list(patterns.items()) == list(reference.filter_original(ds, chash, min_prev).items())
+    for stats in level_stats.values():
+        assert isinstance(stats, LevelStats)
+        assert stats.evaluated == stats.prevalent + stats.non_prevalent
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("schema", ["ids", "nds"])
+@pytest.mark.parametrize("compact", [False, True])
+def test_sweep_min_prev_matches_independent_runs(seed, schema, compact):
+    ds = synthetic(seed, columnar=True)
+    thresholds = [0.5, 0.1, 0.8, 0.3]
+    _, chash, _ = run_pipeline(ds, MIN_DIST, 1.0, schema=schema, compact=compact)
+    sweep, lattice = sweep_min_prev(ds, chash, thresholds)
+    assert sorted(sweep) == sorted(thresholds)
+    for t in thresholds:
+        assert sweep[t] == run_pipeline(ds, MIN_DIST, t, schema=schema, compact=compact)[2]
+    with pytest.raises(ValueError):
+        lattice.prevalent(0.05)
+
+    _, full = sweep_min_prev(ds, chash, [0.9], floor=0.0)
+    assert full.prevalent(0.05) == run_pipeline(ds, MIN_DIST, 0.05, schema=schema, compact=compact)[2]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("min_prev", MIN_PREVS)
+def test_maximal_patterns(seed, compact, min_prev):
+    ds = synthetic(seed, columnar=True)
+    _, chash, full = run_pipeline(ds, MIN_DIST, min_prev, schema="ids", compact=compact)
+    result = mine_maximal_patterns(ds, chash, min_prev)
+
+    expected_maximal = {cp for cp in full if not any(cp < other for other in full)}
+    assert set(result.maximal) == expected_maximal
+    assert all(v >= min_prev for v in result.maximal.values())
+    for cp, v in full.items():
+        assert cp in result
+        assert result[cp] == v
+    # subset của key nhưng không prevalent -> không thuộc kết quả
+    for cp in lattice_top_down(chash):
+        if cp not in full:
+            assert cp not in result
+            with pytest.raises(KeyError):
+                result[cp]
+    assert list(result.to_dict().items()) == list(full.items())
+
+    _, _, lazy = run_pipeline(ds, MIN_DIST, min_prev, schema="ids", compact=compact, maximal=True)
+    assert set(lazy.maximal) == expected_maximal
+    assert lazy.to_dict() == full
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("maximal", [False, True])
+def test_parallel_levels_match_sequential(monkeypatch, compact, maximal):
+    # batch nào cũng đi qua pool
+    monkeypatch.setattr(prevalence, "_PARALLEL_MIN_BATCH", 1)
+    ds = synthetic(0, columnar=True)
+    cliques, chash, _ = run_pipeline(ds, MIN_DIST, 1.0, schema="ids", compact=compact)
+    if compact:
+        # id còn nằm trong buffer của CompactCHash khi tạo pool
+        chash = CompactCHash(ds)
+        for c in cliques:
+            chash.add_clique(c)
+    mine = mine_maximal_patterns if maximal else mine_prevalent_patterns
+    for min_prev in MIN_PREVS:
+        runs = []
+        # chạy pool trước, khi buffer chưa được flush
+        for workers in (2, 1):
+            pi_cache = PICache(chash, ds.feature_counts())
+            level_stats = {}
+            out = mine(ds, chash, min_prev, pi_cache=pi_cache, level_stats=level_stats, workers=workers)
+            if maximal:
+                out = out.to_dict()
+            runs.append((list(out.items()), level_stats, pi_cache.calls))
+        assert runs[1] == runs[0]
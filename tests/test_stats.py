@@ -0,0 +1,62 @@
+import tracemalloc
+
+import pytest
+
+from cliquecoloc._init_ import PipelineStats, run_pipeline
+
+from helpers import MIN_DIST, MIN_PREV, synthetic
+
+
+@pytest.mark.parametrize("schema", ["ids", "nds"])
+@pytest.mark.parametrize("trace_memory", [False, True])
+def test_stats_record_stages_and_counters(schema, trace_memory):
+    ds = synthetic(0, columnar=True)
+    events = []
+    stats = PipelineStats(trace_memory=trace_memory, hooks=[lambda event, payload: events.append((event, payload))])
+    cliques, _, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema, stats=stats)
+    # đo không làm đổi kết quả
+    assert patterns == run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema)[2]
+
+    assert list(stats.stages) == ["neighborhoods", "cliques", "chash", "prevalence"]
+    for st in stats.stages.values():
+        assert st.wall >= 0
+        assert (st.peak_traced is not None) == trace_memory
+    assert stats.counters["cliques"] == len(cliques)
+    assert sum(stats.histograms["clique_size"].values()) == len(cliques)
+    assert stats.counters["patterns"] == len(patterns)
+    assert stats.counters["neighbor_pairs"] > 0
+    assert not tracemalloc.is_tracing()
+
+    assert [e for e, _ in events] == ["stage"] * 4 + ["done"]
+    assert events[-1][1] == stats.to_dict()
+    assert "prevalence" in stats.report()
+
+
+def test_stream_measures_one_stage():
+    stats = PipelineStats(trace_memory=False)
+    run_pipeline(synthetic(0, columnar=True), MIN_DIST, MIN_PREV, stream=True, stats=stats)
+    assert list(stats.stages) == ["neighborhoods", "cliques+chash", "prevalence"]
+
+
+def test_finish_runs_when_a_stage_fails(monkeypatch):
+    def boom(*args, **kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr("cliquecoloc._init_.mine_prevalent_patterns", boom)
+    events = []
+    stats = PipelineStats(trace_memory=True, hooks=[lambda event, payload: events.append(event)])
+    with pytest.raises(RuntimeError):
+        run_pipeline(synthetic(0, columnar=True), MIN_DIST, MIN_PREV, stats=stats)
+    assert not tracemalloc.is_tracing()
+    assert events[-1] == "done"
+    assert "neighborhoods" in stats.stages
+
+
+def test_defaults():
+    stats = PipelineStats()
+    assert not stats.trace_memory
+    run_pipeline(synthetic(0, columnar=True), MIN_DIST, MIN_PREV, stats=stats)
+    assert all(st.peak_traced is None for st in stats.stages.values())
+    # high-water mark của cả process, ghi một lần khi xong
+    assert stats.rss_high_water is None or stats.rss_high_water > 2**20
+    assert stats.to_dict()["rss_high_water"] == stats.rss_high_water
@@ -0,0 +1,39 @@
+import pytest
+
+from cliquecoloc._init_ import run_pipeline
+
+from helpers import MIN_DIST, MIN_PREV, SEEDS, baseline, chash_table, clique_set, gridded, synthetic
+
+TILE_SIZE = 100.0
+
+# (columnar, compact)
+LAYOUTS = [(False, False), (True, False), (True, True)]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("schema", ["ids", "nds"])
+@pytest.mark.parametrize("columnar,compact", LAYOUTS)
+def test_tiled_matches_untiled(seed, make, schema, columnar, compact):
+    ds = make(seed, columnar=columnar)
+    cliques, chash, patterns = run_pipeline(ds, MIN_DIST, MIN_PREV, schema=schema, compact=compact)
+    tiled, tiled_chash, tiled_patterns = run_pipeline(
+        ds, MIN_DIST, MIN_PREV, schema=schema, compact=compact, tile_size=TILE_SIZE,
+    )
+    assert len(tiled) == len(cliques)
+    assert clique_set(ds, tiled) == clique_set(ds, cliques)
+    assert chash_table(ds, tiled_chash) == chash_table(ds, chash)
+    assert tiled_patterns == patterns
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("columnar,compact", LAYOUTS)
+def test_tiled_matches_baseline(seed, columnar, compact):
+    spatial, cliques, chash, patterns = baseline(synthetic(seed))
+    ds = synthetic(seed, columnar=columnar)
+    tiled, tiled_chash, tiled_patterns = run_pipeline(
+        ds, MIN_DIST, MIN_PREV, schema="ids", compact=compact, tile_size=TILE_SIZE,
+    )
+    assert clique_set(ds, tiled) == clique_set(spatial, cliques)
+    assert chash_table(ds, tiled_chash) == chash_table(spatial, chash)
+    assert tiled_patterns == patterns
@@ -0,0 +1,45 @@
+import pytest
+
+from cliquecoloc._init_ import CHash, CompactCHash, mine_top_k_patterns, run_pipeline
+
+import reference
+from helpers import MIN_DIST, SEEDS, gridded, synthetic
+
+
+def _ranked(dataset):
+    """
+    Toàn bộ lattice tham chiếu, cùng thứ tự với mine_top_k_patterns.
+    """
+    table = reference.chash_table(reference.ids_cliques(dataset, MIN_DIST))
+    return sorted(
+        reference.prevalent(dataset, table, 0.0).items(),
+        key=lambda t: (-t[1], -len(t[0]), sorted(t[0])),
+    )
+
+
+def _top(ranked, k, min_size, min_prev):
+    return [(cp, v) for cp, v in ranked if len(cp) >= min_size and v >= min_prev][:k]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("make", [synthetic, gridded])
+@pytest.mark.parametrize("compact", [False, True])
+def test_top_k_matches_lattice(seed, make, compact):
+    ds = make(seed, columnar=True)
+    _, chash, _ = run_pipeline(ds, MIN_DIST, 0.0, schema="ids", compact=compact)
+    assert isinstance(chash, CompactCHash if compact else CHash)
+    ranked = _ranked(make(seed))
+    for k, min_size, min_prev in [(1, 2, 0.0), (5, 2, 0.0), (10, 3, 0.0), (50, 2, 0.2), (1000, 2, 0.0)]:
+        got = mine_top_k_patterns(ds, chash, k, min_size, min_prev)
+        assert list(got.items()) == _top(ranked, k, min_size, min_prev)
+
+
+def test_run_pipeline_top_k():
+    ds = synthetic(0, columnar=True)
+    _, _, got = run_pipeline(ds, MIN_DIST, 0.0, schema="nds", compact=True, top_k=5, min_size=3)
+    assert list(got.items()) == _top(_ranked(synthetic(0)), 5, 3, 0.0)
+
+
+def test_top_k_excludes_maximal():
+    with pytest.raises(ValueError):
+        run_pipeline(synthetic(0, columnar=True), MIN_DIST, 0.0, top_k=5, maximal=True)